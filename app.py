@@ -5,34 +5,43 @@ Main Application & API Server
 主要功能:
 1. 提供 RESTful API 端點 (`/api/jobs`)，以 JSON 格式回傳所有職缺資料。
 2. 處理跨來源資源共用，允許前端網頁進行 API 請求。
-3. 使用 APScheduler 在背景中定時執行爬蟲任務，實現資料的自動化更新。
+3. 使用 APScheduler 在背景中定時執行爬蟲任務，實現資料的自動化更新（需明確啟用）。
+
+應用程式透過 create_app() 建立，模組層級的 app 在第一次讀取時才建立；匯入本模組時不會連線資料庫、
+建立資料表或啟動排程器。資料庫在第一次查詢時才初始化，LLM 與履歷解析套件也在第一次使用時才載入。
+啟動方式：
+    python app.py                         # 開發伺服器，並啟動排程器
+    flask --app app run                   # 不啟動排程器
+    ENABLE_SCHEDULER=1 gunicorn app:app   # 由環境變數啟用排程器（也可用 "app:create_app()"）
+AI 分析工作的狀態存放在資料庫中，可以用多個 gunicorn worker 行程執行（排程器只應在其中一個啟用）。
 """
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, jsonify, Response, request, render_template
+from flask import Flask, Blueprint, jsonify, Response, request, render_template
 from flask_cors import CORS
-from apscheduler.schedulers.background import BackgroundScheduler
 import database
-import scraper
 import atexit
+import os
+import threading
 import json
+import csv
+import io
+import zlib
 from datetime import datetime
 import math 
 import resume_parser
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 import llm_service
+import match_queue
+import skill_taxonomy
+import read_model
+import saved_searches
 
 
-# --- Flask 應用程式設定 ---
-app = Flask(__name__)
-CORS(app) 
-
-# 設定 JSON 編碼
-app.config['JSON_AS_ASCII'] = False 
-app.config['JSONIFY_MIMETYPE'] = 'application/json; charset=utf-8' 
-
-print("--- Flask app 已初始化，CORS 已設定 ---")
+# 所有路由註冊在 Blueprint 上，由 create_app() 掛載到應用程式
+bp = Blueprint('main', __name__)
 
 def datetime_handler(obj):
     """處理 datetime 物件的 JSON 序列化"""
@@ -40,33 +49,155 @@ def datetime_handler(obj):
         return obj.strftime('%Y-%m-%d %H:%M:%S')
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
+def _job_filters_from_request():
+    """從查詢參數取出職缺篩選條件，供 /api/jobs 與 /api/jobs/export 共用"""
+    return {
+        'keyword': request.args.get('keyword', ''),
+        'status': request.args.get('status', ''),
+        'dedupe': request.args.get('dedupe', 0, type=int) == 1,
+        # 薪資為換算後的月薪（新台幣），經歷為年資
+        'salary_min': request.args.get('salary_min', type=int),
+        'salary_max': request.args.get('salary_max', type=int),
+        'salary_period': request.args.get('salary_period', ''),
+        'exp_min': request.args.get('exp_min', type=int),
+        'exp_max': request.args.get('exp_max', type=int),
+        'county': request.args.get('county', ''),
+        'industry': request.args.get('industry', ''),
+        'experience': request.args.get('experience', ''),
+        'source_website': request.args.get('source_website', ''),
+        # 以逗號分隔的技能標準名稱，職缺須同時具備
+        'skills': [skill.strip() for skill in request.args.get('skills', '').split(',') if skill.strip()],
+    }
+
 # --- API 路由 ---
-@app.route('/api/jobs')
+@bp.route('/api/jobs')
 def get_jobs():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
-    keyword = request.args.get('keyword', '')
-    status = request.args.get('status', '')
+    filters = _job_filters_from_request()
     
-    print(f"[DEBUG app.py] /api/jobs 收到請求，參數：page={page}, limit={limit}, keyword='{keyword}', status='{status}'")
+    print(f"[DEBUG app.py] /api/jobs 收到請求，參數：page={page}, limit={limit}, filters={filters}")
 
-    jobs, total = database.get_all_jobs(page=page, limit=limit, keyword=keyword, status=status)
+    jobs, total = None, 0
+    if read_model.enabled():
+        # 記憶體讀取模型回應列表（不含 job_description）；無法使用時退回 SQL
+        jobs, total = read_model.get_all_jobs(page=page, limit=limit, **filters)
+    if jobs is None:
+        jobs, total = database.get_all_jobs(page=page, limit=limit, **filters)
     
     print(f"[DEBUG app.py] database.get_all_jobs 返回：獲取到職缺數量：{len(jobs) if jobs else 0}, 總數：{total}")
     if jobs is None:
         print("[ERROR app.py] 從資料庫獲取職缺列表失敗，返回 500 錯誤。")
         return jsonify({'error': '獲取職缺列表失敗'}), 500
-        
+
     response_data = {
         'jobs': jobs,
         'page': page,
         'limit': limit,
         'total_jobs_count': total,
-        'total_pages': (total + limit - 1) // limit
+        'total_pages': (total + limit - 1) // limit,
+        'facets': _facet_counts(filters)
     }
     return jsonify(response_data)
 
-@app.route('/api/jobs/<int:job_id>/status', methods=['POST'])
+def _facet_counts(filters, count=None):
+    """
+    facet 計數以原始職缺數計算（不受去重影響），每個 facet 套用除了自己以外的所有條件：
+    選了某個縣市後，縣市下拉選單仍列出其他縣市的數字，狀態分頁按鈕的數字在切換分頁時也保持一致。
+    未被選取的 facet 共用同一次計數，只有已選取的 facet 需要各自再計數一次。
+    count 以篩選條件字典回傳 facet 計數，預設為 _count_facets（讀取模型或 SQL），效能測試可傳入其他來源。
+    """
+    count = count or _count_facets
+    base_filters = {key: value for key, value in filters.items() if key != 'dedupe'}
+    facets = count(base_filters)
+    if facets is None:
+        return None
+    # 讀取模型回傳的是快取中的物件，替換個別 facet 前先複製
+    facets = dict(facets)
+    for facet in database.FACET_COLUMNS:
+        selected = base_filters.get(facet)
+        if not selected or (facet == 'status' and selected == 'all'):
+            continue
+        others = count({key: value for key, value in base_filters.items() if key != facet})
+        if others is None:
+            return None
+        facets[facet] = others[facet]
+    return facets
+
+def _count_facets(filters):
+    facets = read_model.get_facet_counts(**filters) if read_model.enabled() else None
+    return facets if facets is not None else database.get_facet_counts(**filters)
+
+EXPORT_CHUNK_SIZE = 500
+
+def _export_ndjson(chunks):
+    """每筆職缺輸出為一行 JSON"""
+    for rows in chunks:
+        yield "".join(
+            json.dumps(row, ensure_ascii=False, default=datetime_handler) + "\n" for row in rows
+        )
+
+def _export_csv(chunks):
+    """第一批資料決定 CSV 欄位，之後逐批寫出"""
+    buffer = io.StringIO()
+    writer = None
+    for rows in chunks:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()), extrasaction='ignore')
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                key: datetime_handler(value) if isinstance(value, datetime) else value
+                for key, value in row.items()
+            })
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _gzip_stream(text_chunks):
+    """以串流方式 gzip 壓縮，不需先取得完整內容"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for text in text_chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _prepend(first, chunks):
+    """在串流最前面補上一段內容"""
+    yield first
+    yield from chunks
+
+@bp.route('/api/jobs/export')
+def export_jobs():
+    """
+    以 NDJSON 或 CSV 串流匯出所有符合條件的職缺（篩選參數與 /api/jobs 相同）。
+    資料由伺服器端游標分批讀取並立即寫出，記憶體用量不隨匯出筆數增加。
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    use_gzip = request.args.get('gzip', 0, type=int) == 1
+    filters = _job_filters_from_request()
+
+    if export_format == 'ndjson':
+        serializer, mimetype = _export_ndjson, 'application/x-ndjson'
+    elif export_format == 'csv':
+        serializer, mimetype = _export_csv, 'text/csv'
+    else:
+        return jsonify({'error': f'不支援的匯出格式: {export_format}'}), 400
+
+    body = serializer(database.iter_jobs(chunk_size=EXPORT_CHUNK_SIZE, **filters))
+    if export_format == 'csv':
+        # 加上 BOM，讓 Excel 能正確辨識 UTF-8 中文
+        body = _prepend('\ufeff', body)
+
+    filename = f"jobs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{'ndjson' if export_format == 'ndjson' else 'csv'}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if use_gzip:
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, content_type=f'{mimetype}; charset=utf-8', headers=headers)
+
+@bp.route('/api/jobs/<int:job_id>/status', methods=['POST'])
 def api_update_job_status(job_id):
     """
     更新指定職缺的狀態。
@@ -79,6 +210,7 @@ def api_update_job_status(job_id):
             return jsonify({"error": "缺少新的狀態參數"}), 400
 
         if database.update_job_status(job_id, new_status):
+            read_model.mark_stale()
             return jsonify({"message": "職缺狀態更新成功"}), 200
         else:
             return jsonify({"error": "職缺狀態更新失敗或未找到職缺"}), 404
@@ -86,7 +218,7 @@ def api_update_job_status(job_id):
         print(f"處理 /api/jobs/{job_id}/status 請求時發生錯誤: {e}")
         return jsonify({"error": f"伺服器發生未知錯誤: {str(e)}"}), 500
 
-@app.route('/api/last-update', methods=['GET'])
+@bp.route('/api/last-update', methods=['GET'])
 def get_last_update():
     try:
         last_update = database.get_last_update_time()
@@ -101,20 +233,70 @@ def get_last_update():
         }), 500
 
 
+# --- 儲存的搜尋 ---
+@bp.route('/api/saved-searches', methods=['GET'])
+def list_saved_searches():
+    searches = database.get_saved_searches()
+    if searches is None:
+        return jsonify({'error': '獲取儲存的搜尋失敗'}), 500
+    return jsonify({'saved_searches': searches})
+
+@bp.route('/api/saved-searches', methods=['POST'])
+def create_saved_search():
+    """
+    儲存一組篩選條件，請求格式：{"name": "...", "filters": {"keyword": "...", "county": "...", ...}}
+    篩選條件的鍵與 /api/jobs 的查詢參數相同（不含 page、limit、dedupe）。
+    """
+    data = request.get_json(silent=True) or {}
+    name = (data.get('name') or '').strip()
+    if not name:
+        return jsonify({'error': '缺少搜尋名稱'}), 400
+    try:
+        search_id = saved_searches.create(name[:100], data.get('filters') or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if search_id is None:
+        return jsonify({'error': '儲存搜尋失敗'}), 500
+    return jsonify({'id': search_id, 'message': '搜尋已儲存'}), 201
+
+@bp.route('/api/saved-searches/<int:search_id>', methods=['DELETE'])
+def delete_saved_search(search_id):
+    if database.delete_saved_search(search_id):
+        return jsonify({'message': '搜尋已刪除'})
+    return jsonify({'error': '找不到此搜尋'}), 404
+
+@bp.route('/api/saved-searches/<int:search_id>/inbox', methods=['GET'])
+def saved_search_inbox(search_id):
+    """新符合的職缺；all=1 時包含已讀的職缺"""
+    if database.get_saved_search(search_id) is None:
+        return jsonify({'error': '找不到此搜尋'}), 404
+    include_seen = request.args.get('all', 0, type=int) == 1
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    jobs = database.get_saved_search_inbox(search_id, include_seen, limit)
+    if jobs is None:
+        return jsonify({'error': '獲取收件匣失敗'}), 500
+    return jsonify({'search_id': search_id, 'jobs': jobs})
+
+@bp.route('/api/saved-searches/<int:search_id>/inbox/seen', methods=['POST'])
+def mark_saved_search_seen(search_id):
+    """將收件匣標記為已讀，請求可帶 {"job_ids": [...]}，未提供時標記全部"""
+    if database.get_saved_search(search_id) is None:
+        return jsonify({'error': '找不到此搜尋'}), 404
+    data = request.get_json(silent=True) or {}
+    job_ids = data.get('job_ids')
+    if job_ids is not None:
+        if not isinstance(job_ids, list) or not all(isinstance(job_id, int) for job_id in job_ids):
+            return jsonify({'error': 'job_ids 必須是整數列表'}), 400
+    updated = database.mark_saved_search_seen(search_id, job_ids)
+    if updated is None:
+        return jsonify({'error': '標記已讀失敗'}), 500
+    return jsonify({'updated': updated})
+
+
 # 詳情頁面
-@app.route('/jobs/<int:job_id>')
+@bp.route('/jobs/<int:job_id>')
 def job_detail(job_id):
-    job_data = None
-    try:
-        conn = database._db_instance.pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
-        job_data = cursor.fetchone()
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        print(f"查詢職缺 {job_id} 詳情時發生錯誤: {e}")
-        return "找不到該職缺", 404
+    job_data = database.get_job_by_id(job_id)
 
     if not job_data:
         return "找不到該職缺", 404
@@ -123,54 +305,149 @@ def job_detail(job_id):
     return render_template('job_detail.html', job=job_data)
 
     
-# AI 履歷匹配 
-@app.route('/api/jobs/<int:job_id>/match', methods=['POST'])
-def match_resume_with_job(job_id):
+# --- AI 履歷匹配 ---
+# LLM 分析在有上限的背景佇列中執行，避免佔用處理一般請求的伺服器執行緒
+# 同步 /match 最多等待的秒數：超過就回傳 202，不讓 LLM 分析長時間占住伺服器執行緒
+MATCH_SYNC_TIMEOUT_MAX = 10
+MATCH_SYNC_TIMEOUT = min(float(os.getenv('MATCH_SYNC_TIMEOUT', '5')), MATCH_SYNC_TIMEOUT_MAX)
+
+_match_queue = None
+_match_queue_lock = threading.Lock()
+
+def get_match_queue():
+    """取得共用的分析佇列（第一次使用時才建立）"""
+    global _match_queue
+    with _match_queue_lock:
+        if _match_queue is None:
+            _match_queue = match_queue.MatchQueue(
+                llm_service.get_match_analysis,
+                workers=int(os.getenv('MATCH_WORKERS', '2')),
+                max_queue=int(os.getenv('MATCH_QUEUE_SIZE', '20')),
+                per_client_limit=int(os.getenv('MATCH_PER_CLIENT', '2')),
+            )
+        return _match_queue
+
+def _client_id():
+    """
+    以來源 IP 識別用戶端，作為分析額度的依據（用戶端自行帶的標頭可任意更換，不能用來計算額度）。
+    部署在反向代理之後時，設定 TRUSTED_PROXIES 讓 remote_addr 取自代理加上的 X-Forwarded-For。
+    """
+    return request.remote_addr or 'unknown'
+
+def _load_match_inputs(job_id):
+    """
+    驗證並解析上傳的履歷、從資料庫取得職缺描述。
+    成功時回傳 ((job_description, resume_text), None)，失敗時回傳 (None, 錯誤回應)。
+    """
     # 1. 驗證並解析上傳的履歷檔案
     if 'resume' not in request.files:
-        return jsonify({'error': '請求中缺少檔案部分'}), 400
+        return None, (jsonify({'error': '請求中缺少檔案部分'}), 400)
     resume_file = request.files['resume']
     if resume_file.filename == '':
-        return jsonify({'error': '未選擇任何檔案'}), 400
+        return None, (jsonify({'error': '未選擇任何檔案'}), 400)
 
     try:
         resume_text = resume_parser.parse_resume(resume_file.stream, resume_file.filename)
         if not resume_text:
-            return jsonify({'error': '無法從履歷中提取文字內容。'}), 500
+            return None, (jsonify({'error': '無法從履歷中提取文字內容。'}), 500)
     except Exception as e:
-        return jsonify({'error': f'解析履歷時發生錯誤: {str(e)}'}), 500
+        return None, (jsonify({'error': f'解析履歷時發生錯誤: {str(e)}'}), 500)
 
     # 2. 從資料庫獲取職缺描述
+    job = database.get_job_by_id(job_id)
+    if not job or not job['job_description']:
+        return None, (jsonify({'error': f'在資料庫中找不到 ID 為 {job_id} 的職缺描述。'}), 404)
+    return (job['job_description'], resume_text), None
+
+def _local_skill_gap(job_id, resume_text):
+    """以技能標籤在本機即時比對，不需呼叫 LLM"""
+    return skill_taxonomy.skill_gap(resume_text, database.get_job_skills(job_id))
+
+def _submit_match(job_id, priority):
+    """提交分析工作，回傳 (工作快照, None) 或 (None, 錯誤回應)"""
+    inputs, error = _load_match_inputs(job_id)
+    if error:
+        return None, error
+    job_description, resume_text = inputs
+    local_gap = _local_skill_gap(job_id, resume_text)
     try:
-        # 假設 database.py 中有一個 get_job_by_id 的函式
-        # 如果沒有，我們直接在這邊查詢
-        conn = database._db_instance.pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT job_description FROM jobs WHERE id = %s", (job_id,))
-        job = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not job or not job['job_description']:
-            return jsonify({'error': f'在資料庫中找不到 ID 為 {job_id} 的職缺描述。'}), 404
-        job_description = job['job_description']
-    except Exception as e:
-        return jsonify({'error': f'查詢資料庫時發生錯誤: {str(e)}'}), 500
+        task = get_match_queue().submit(_client_id(), job_id, job_description, resume_text, priority)
+    except match_queue.AdmissionRejected as e:
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after, 'local_skill_gap': local_gap})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return None, (response, 429)
+    print(f"--- 已將職缺 {job_id} 的 AI 分析排入佇列 (task {task['task_id']}) ---")
+    # 本機技能差距報告立即可用，不必等 LLM 分析完成
+    task['local_skill_gap'] = local_gap
+    return task, None
+
+def _task_response(task):
+    """工作尚未完成時回傳 202 與查詢網址，完成時回傳分析結果"""
+    if task['status'] in ('queued', 'running'):
+        response = jsonify(task)
+        response.headers['Location'] = f"/api/match-tasks/{task['task_id']}"
+        return response, 202
+    return jsonify(task), 200
+
+@bp.route('/api/jobs/<int:job_id>/match/tasks', methods=['POST'])
+def submit_match_task(job_id):
+    """非同步提交 AI 分析，立即回傳 task_id，之後以 GET /api/match-tasks/<task_id> 查詢結果"""
+    priority = request.form.get('priority', match_queue.PRIORITY_NORMAL, type=int)
+    priority = min(max(priority, match_queue.PRIORITY_HIGH), match_queue.PRIORITY_LOW)
+    task, error = _submit_match(job_id, priority)
+    if error:
+        return error
+    return _task_response(task)
 
-    # 3. 呼叫 LLM 服務進行分析
-    print("--- 正在呼叫 LLM 進行分析 ---")
-    analysis_result = llm_service.get_match_analysis(job_description, resume_text)
-    print("--- LLM 分析完成 ---")
+@bp.route('/api/jobs/<int:job_id>/skill-gap', methods=['POST'])
+def job_skill_gap(job_id):
+    """本機技能差距報告：以技能字典比對履歷與職缺的技能標籤，即時回傳且不呼叫 LLM"""
+    inputs, error = _load_match_inputs(job_id)
+    if error:
+        return error
+    _, resume_text = inputs
+    return jsonify(_local_skill_gap(job_id, resume_text)), 200
 
-    # 4. 回傳分析結果給前端
-    if "error" in analysis_result:
+@bp.route('/api/match-tasks/<task_id>', methods=['GET'])
+def get_match_task(task_id):
+    task = get_match_queue().get(task_id)
+    if task is None:
+        return jsonify({'error': '找不到該分析工作，可能已過期。'}), 404
+    return _task_response(task)
+
+@bp.route('/api/match-queue/metrics', methods=['GET'])
+def get_match_queue_metrics():
+    metrics = get_match_queue().metrics()
+    if metrics is None:
+        return jsonify({'error': '獲取分析佇列指標失敗'}), 500
+    return jsonify(metrics)
+
+@bp.route('/api/jobs/<int:job_id>/match', methods=['POST'])
+def match_resume_with_job(job_id):
+    """
+    同步版本的 AI 履歷匹配（保留給既有的用戶端）。
+    工作同樣經過分析佇列，請求最多等待 MATCH_SYNC_TIMEOUT 秒（預設 5 秒，上限 10 秒），
+    仍未完成時回傳 202 與 Location 查詢網址，由用戶端輪詢 /api/match-tasks/<task_id>。
+    """
+    task, error = _submit_match(job_id, match_queue.PRIORITY_HIGH)
+    if error:
+        return error
+
+    task = get_match_queue().wait(task['task_id'], timeout=MATCH_SYNC_TIMEOUT)
+    if task is None:
+        return jsonify({'error': '查詢分析工作失敗'}), 500
+    if task['status'] in ('queued', 'running'):
+        return _task_response(task)
+
+    # 回傳分析結果給前端
+    analysis_result = task['result']
+    if task['status'] == 'failed':
         return jsonify(analysis_result), 500
-    
     return jsonify(analysis_result), 200
 
 '''
 # 測試履歷解析功能的 API 端點
-@app.route('/api/resume/parse', methods=['POST'])
+@bp.route('/api/resume/parse', methods=['POST'])
 def parse_resume_endpoint():
     if 'resume' not in request.files:
         return jsonify({'error': '請求中缺少檔案部分'}), 400
@@ -201,25 +478,92 @@ def parse_resume_endpoint():
         return jsonify({'error': f'處理檔案時發生未知錯誤: {e}'}), 500
 '''
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
 # --- 自動化排程設定 ---
 def scheduled_job():
-    """定義排程需要執行的任務。"""
+    """
+    定義排程需要執行的任務。
+    CRAWL_FRONTIER=1 時改為建立爬取佇列任務並一起消化，其他節點的 crawl_frontier worker 可同時加入。
+    兩種方式在爬取結束時都會以本次新增 / 變動的職缺比對儲存的搜尋。
+    """
     print("\n--- 排程任務觸發：開始執行每日爬蟲任務 ---")
-    scraper.scrape_all_jobs() # 使用 scraper.py 中定義的預設參數
+    # 爬蟲相依套件只在排程觸發時才載入
+    if os.getenv('CRAWL_FRONTIER', '0') == '1':
+        import crawl_frontier
+        crawl_frontier.crawl()
+    else:
+        import scraper
+        scraper.scrape_all_jobs() # 使用 scraper.py 中定義的預設參數
     print("--- 每日爬蟲任務執行完畢 ---\n")
 
-scheduler = BackgroundScheduler(daemon=True)
-# 設定排程器：每天的凌晨 2:00 執行一次 scheduled_job 函式
-scheduler.add_job(scheduled_job, 'cron', hour=2, minute=0)
-scheduler.start()
-print("--- 背景排程器已啟動，將於每日凌晨 2:00 執行爬蟲 ---")
+_scheduler = None
+_scheduler_lock = threading.Lock()
 
-# 確保應用程式關閉時，排程器也會一併關閉
-atexit.register(lambda: scheduler.shutdown())
+def start_scheduler():
+    """啟動背景排程器（每個行程只會啟動一次）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        _scheduler = BackgroundScheduler(daemon=True)
+        # 設定排程器：每天的凌晨 2:00 執行一次 scheduled_job 函式
+        _scheduler.add_job(scheduled_job, 'cron', hour=2, minute=0)
+        # 每小時全量校正一次 facet 計數表，修正增量更新可能累積的誤差
+        _scheduler.add_job(database.reconcile_facet_counts, 'interval', hours=1)
+        _scheduler.start()
+        print("--- 背景排程器已啟動，將於每日凌晨 2:00 執行爬蟲 ---")
+
+        # 確保應用程式關閉時，排程器也會一併關閉
+        atexit.register(lambda: _scheduler.shutdown())
+        return _scheduler
+
+# --- 應用程式工廠 ---
+def create_app(enable_scheduler=None):
+    """
+    建立 Flask 應用程式。
+    enable_scheduler 為 None 時依環境變數 ENABLE_SCHEDULER 決定是否啟動排程器（預設不啟動），
+    多個 worker 行程時應只在其中一個啟用，避免爬蟲重複執行。
+    """
+    app = Flask(__name__)
+    CORS(app)
+
+    # 部署在反向代理之後時，以代理加上的 X-Forwarded-For 取得用戶端 IP（數值為代理層數）
+    trusted_proxies = int(os.getenv('TRUSTED_PROXIES', '0'))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
+    # 設定 JSON 編碼
+    app.config['JSON_AS_ASCII'] = False
+    app.config['JSONIFY_MIMETYPE'] = 'application/json; charset=utf-8'
+    app.register_blueprint(bp)
+    print("--- Flask app 已初始化，CORS 已設定 ---")
+
+    if enable_scheduler is None:
+        enable_scheduler = os.getenv('ENABLE_SCHEDULER', '0') == '1'
+    if enable_scheduler:
+        start_scheduler()
+    return app
+
+
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """
+    模組層級的 app 在第一次讀取時才以 create_app() 建立（排程器依 ENABLE_SCHEDULER 決定），
+    讓 gunicorn app:app 與 flask --app app run 照常運作，只匯入本模組的程式（例如效能測試）則不會建立應用程式。
+    """
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if 'app' not in globals():
+            globals()['app'] = create_app()
+    return globals()['app']
 
 # --- 主程式執行入口 ---
 if __name__ == '__main__':
@@ -235,5 +579,6 @@ if __name__ == '__main__':
     print("\n請在瀏覽器中訪問：http://127.0.0.1:5000/api/jobs")
     print("\n" + "="*50 + "\n")
     
+    app = create_app(enable_scheduler=True)
     app.run(debug=True, use_reloader=False, host='0.0.0.0', port=5000)
 
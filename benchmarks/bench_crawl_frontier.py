@@ -0,0 +1,237 @@
+"""
+分散式爬取佇列測試
+
+在本機假 104 伺服器（每個請求固定延遲，模擬網路往返）上，以不同數量的 worker 行程
+消化同一份爬取任務：
+1. 擴展性：比較 1 / 2 / 4 個 worker 的耗時與加速比，確認每個職缺頁只被抓取一次，
+   且所有職缺都經由 database.add_job 寫入（包含並行寫入新職缺時的鎖與熱點計數列）；
+   加速比須達到 worker 數倍數的 --min-efficiency（預設五成），例如 4 個 worker 至少 2 倍。
+2. worker 當掉：租約設為數秒，強制結束其中一個 worker，確認剩餘 worker 會收回過期租約並完成所有任務。
+3. 共用速率預算：4 個 worker 共用較低的速率上限，確認假伺服器收到的總請求速率不超過上限。
+4. 清除舊輪次：只有已結束且超過保留天數的輪次會被 purge_finished_runs 刪除。
+
+需要可連線的 MySQL，請使用測試用的資料庫（DB_NAME）。測試結束後刪除本次的任務，
+以及寫入 jobs 表的假職缺（網址指向本機假伺服器）與其簽章、技能標籤，並重算 facet 計數。
+加上 --discard 時不寫入 jobs 表，只測量佇列本身的開銷。
+
+執行方式：
+    python benchmarks/bench_crawl_frontier.py
+    python benchmarks/bench_crawl_frontier.py --pages 10 --jobs-per-page 20 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl_frontier
+import database
+import scraper
+from fake_104 import Fake104Server
+
+# 本機假伺服器不節流，放寬速率上限讓耗時取決於請求延遲與 worker 數
+RATE_OPTIONS = {'initial_rate': 500.0, 'max_rate': 500.0}
+# 情境 3 的共用速率上限（所有 worker 合計）
+SHARED_RATE = 20.0
+
+
+def _discard_job(job_data):
+    return True
+
+
+def _worker(config, run_id, lease_seconds, store_jobs, rate_options, ready, start):
+    """子行程：先建立連接池再等待開始訊號，讓計時不包含行程啟動與模組載入"""
+    database.get_db()
+    ready.release()
+    start.wait()
+    crawl_frontier.run_worker(
+        config=config, run_id=run_id, lease_seconds=lease_seconds,
+        store=None if store_jobs else _discard_job, rate_options=rate_options,
+    )
+
+
+def start_workers(n, config, run_id, lease_seconds, store_jobs, rate_options=RATE_OPTIONS):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Semaphore(0)
+    start = context.Event()
+    workers = [
+        context.Process(target=_worker, args=(config, run_id, lease_seconds, store_jobs, rate_options, ready, start))
+        for _ in range(n)
+    ]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+    return workers, start
+
+
+def check_fetches(server):
+    """回傳 (不同職缺頁數, 重複抓取次數)"""
+    duplicates = sum(count - 1 for count in server.job_fetches.values() if count > 1)
+    return len(server.job_fetches), duplicates
+
+
+def _run_sql(query, params=()):
+    conn = database.get_db().pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if cursor.with_rows else None
+        conn.commit()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def count_stored(server):
+    """jobs 表中來自該假伺服器的職缺數"""
+    return _run_sql("SELECT COUNT(*) FROM jobs WHERE job_url LIKE %s", (f"{server.base_url}/%",))[0][0]
+
+
+def cleanup(server, run_id):
+    """刪除本次的任務、共用速率預算，以及寫入 jobs 表的假職缺與相關資料"""
+    crawl_frontier.get_frontier().delete_run(run_id)
+    _run_sql("DELETE FROM crawl_rate_budget WHERE host = %s", (f"127.0.0.1:{server.port}",))
+    pattern = f"{server.base_url}/%"
+    for table in ('job_skills', 'job_lsh_bands', 'job_signatures', 'saved_search_matches'):
+        _run_sql(f"DELETE FROM {table} WHERE job_id IN (SELECT id FROM jobs WHERE job_url LIKE %s)", (pattern,))
+    _run_sql("DELETE FROM jobs WHERE job_url LIKE %s", (pattern,))
+    database.reconcile_facet_counts()
+
+
+def scenario_scaling(args):
+    expected = args.pages * args.jobs_per_page
+    print(f"\n[情境 1] {args.pages} 頁 × {args.jobs_per_page} 個職缺，每個請求延遲 {args.latency * 1000:.0f} ms")
+    baseline = None
+    for n in args.workers:
+        server = Fake104Server(pages=args.pages, jobs_per_page=args.jobs_per_page, latency=args.latency).start()
+        config = server.target_config(scraper.TARGET_CONFIG['104'])
+        run_id = f"bench-{uuid.uuid4().hex[:12]}"
+        crawl_frontier.seed('AI 工程師', args.pages, run_id)
+
+        workers, start = start_workers(n, config, run_id, crawl_frontier.LEASE_SECONDS, not args.discard)
+        started = time.perf_counter()
+        start.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        fetched, duplicates = check_fetches(server)
+        status = crawl_frontier.get_frontier().get_status(run_id).get(run_id, {})
+        stored = expected if args.discard else count_stored(server)
+        cleanup(server, run_id)
+        server.stop()
+
+        # 以第一個設定（預設為 1 個 worker）的耗時作為加速比的基準
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        required = args.min_efficiency * n / args.workers[0]
+        print(f"  {n} 個 worker：{elapsed:6.2f}s，{expected / elapsed:7.1f} 職缺/s，"
+              f"加速比 {speedup:4.2f}x（至少 {required:4.2f}x），抓取 {fetched}/{expected} 頁，重複 {duplicates} 次，"
+              f"寫入 {stored} 筆，任務狀態 {status}")
+        assert fetched == expected, "所有職缺頁都應被抓取"
+        assert duplicates == 0, "沒有 worker 當掉時不應重複抓取"
+        assert stored == expected, "並行寫入時所有職缺都應成功寫入（不應因死結而遺失）"
+        assert status.get('done', 0) == sum(status.values()), "所有任務都應完成"
+        assert n == args.workers[0] or speedup >= required, f"{n} 個 worker 的加速比 {speedup:.2f}x 低於 {required:.2f}x"
+
+
+def scenario_crash(args):
+    expected = args.pages * args.jobs_per_page
+    lease_seconds = 3
+    print(f"\n[情境 2] 2 個 worker，租約 {lease_seconds}s，啟動後強制結束其中一個")
+    server = Fake104Server(pages=args.pages, jobs_per_page=args.jobs_per_page, latency=args.latency).start()
+    config = server.target_config(scraper.TARGET_CONFIG['104'])
+    run_id = f"bench-{uuid.uuid4().hex[:12]}"
+    crawl_frontier.seed('AI 工程師', args.pages, run_id)
+
+    workers, start = start_workers(2, config, run_id, lease_seconds, not args.discard)
+    started = time.perf_counter()
+    start.set()
+    time.sleep(max(0.5, args.latency * 10))
+    workers[0].kill()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    fetched, duplicates = check_fetches(server)
+    status = crawl_frontier.get_frontier().get_status(run_id).get(run_id, {})
+    cleanup(server, run_id)
+    server.stop()
+    print(f"  {elapsed:6.2f}s 完成，抓取 {fetched}/{expected} 頁，"
+          f"被收回的租約造成重複 {duplicates} 次，任務狀態 {status}")
+    assert fetched == expected, "被當掉 worker 持有的任務應在租約到期後由其他 worker 完成"
+    assert status.get('done', 0) == sum(status.values()), "所有任務都應完成"
+
+
+def scenario_shared_rate(args, workers=4):
+    print(f"\n[情境 3] {workers} 個 worker 共用 {SHARED_RATE:.0f} req/s 的速率預算")
+    server = Fake104Server(pages=args.pages, jobs_per_page=args.jobs_per_page, latency=args.latency).start()
+    config = server.target_config(scraper.TARGET_CONFIG['104'])
+    run_id = f"bench-{uuid.uuid4().hex[:12]}"
+    crawl_frontier.seed('AI 工程師', args.pages, run_id)
+
+    rate_options = {'initial_rate': SHARED_RATE, 'max_rate': SHARED_RATE}
+    procs, start = start_workers(workers, config, run_id, crawl_frontier.LEASE_SECONDS, False, rate_options)
+    started = time.perf_counter()
+    start.set()
+    for worker in procs:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    requests_sent = server.counters['requests']
+    cleanup(server, run_id)
+    server.stop()
+    observed = requests_sent / elapsed
+    print(f"  {requests_sent} 個請求，{elapsed:6.2f}s，合計 {observed:5.1f} req/s"
+          f"（各 worker 獨立限速時約為 {min(workers * SHARED_RATE, workers / args.latency):.0f} req/s）")
+    # 第一個請求不需等待，允許少量誤差
+    assert observed <= SHARED_RATE * 1.1, "所有 worker 的總請求速率不應超過共用的上限"
+
+
+def scenario_purge(days=crawl_frontier.RUN_RETENTION_DAYS):
+    print(f"\n[情境 4] 清除已結束超過 {days} 天的輪次")
+    frontier = crawl_frontier.get_frontier()
+    runs = {name: f"bench-{uuid.uuid4().hex[:12]}" for name in ('old_done', 'old_pending', 'recent_done')}
+    for run_id in runs.values():
+        crawl_frontier.seed('AI 工程師', 2, run_id)
+    # 明確指定 updated_at 時不會被 ON UPDATE 覆蓋
+    _run_sql("UPDATE crawl_frontier SET state = 'done', updated_at = NOW() - INTERVAL %s DAY WHERE run_id = %s",
+             (days + 1, runs['old_done']))
+    _run_sql("UPDATE crawl_frontier SET updated_at = NOW() - INTERVAL %s DAY WHERE run_id = %s",
+             (days + 1, runs['old_pending']))
+    _run_sql("UPDATE crawl_frontier SET state = 'done' WHERE run_id = %s", (runs['recent_done'],))
+    try:
+        frontier.purge_finished_runs(days)
+        remaining = {name: sum(frontier.get_status(run_id).get(run_id, {}).values()) for name, run_id in runs.items()}
+        print(f"  清除後各輪剩餘任務數 {remaining}")
+        assert remaining['old_done'] == 0, "已結束且超過保留天數的輪次應被刪除"
+        assert remaining['old_pending'] == 2, "仍有未完成任務的輪次不應被刪除"
+        assert remaining['recent_done'] == 2, "保留天數內結束的輪次不應被刪除"
+    finally:
+        for run_id in runs.values():
+            frontier.delete_run(run_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='分散式爬取佇列測試')
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--jobs-per-page', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='假伺服器每個請求的延遲（秒）')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--discard', action='store_true', help='不寫入 jobs 表，只測量佇列本身')
+    parser.add_argument('--min-efficiency', type=float, default=0.5,
+                        help='加速比至少為 worker 數倍數的這個比例')
+    args = parser.parse_args()
+
+    print("--- 分散式爬取佇列測試（本機假 104 伺服器）---")
+    database.get_db()
+    scenario_scaling(args)
+    scenario_crash(args)
+    scenario_shared_rate(args)
+    scenario_purge()
+    print("\n所有情境皆通過。")
@@ -0,0 +1,157 @@
+"""
+近似重複分群效能測試
+
+以合成的 JD 資料（約兩成為改寫過的重複刊登）經由 database.add_job 寫入 MySQL，
+測量正式寫入路徑（含 _assign_cluster 的 LSH band 查詢）的每筆成本：
+
+- 依序寫入各個數量級，每段分別計時，確認後段的每筆平均時間不超過第一段的 SCALING_LIMIT 倍，
+  也就是候選查詢只看共用 band 的職缺，總時間約與職缺數成線性關係。
+- 寫入後讀回 cluster_id，確認改寫過的重複刊登與原始職缺落在同一群的比例達 MIN_RECALL，
+  且互不相關的 JD 不會被併在一起。
+
+測試職缺的網址皆以 BENCH_URL 開頭，結束時連同簽章、band 與技能標籤一併刪除。需要可連線的 MySQL。
+
+執行方式：
+    python benchmarks/bench_dedupe.py            # 預設依序寫到 1,000 / 5,000 / 20,000 筆
+    python benchmarks/bench_dedupe.py 2000 50000
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+BENCH_URL = 'https://bench.invalid/dedupe/'
+# 後段每筆平均時間相對第一段的上限；LSH 候選數與資料量無關，超過代表查詢退化成掃描
+SCALING_LIMIT = 3.0
+# 重複刊登與原始職缺被分到同一群的最低比例（0.8 門檻下改寫幅度很小，應幾乎全數命中）
+MIN_RECALL = 0.95
+# 互不相關的 JD 被併入其他群的最高比例
+MAX_FALSE_MERGE = 0.01
+
+SKILLS = ['Python', 'PyTorch', 'TensorFlow', 'Kubernetes', 'Docker', 'SQL', 'Spark', 'LLM',
+          'MLOps', 'NLP', 'Computer Vision', 'AWS', 'GCP', 'Linux', 'Go', 'Java']
+# 以常用中文字組成隨機詞彙，模擬不同公司撰寫風格各異的 JD
+CHARS = "資料模型系統服務平台開發設計維護優化分析產品團隊客戶需求流程架構效能測試部署訓練推論演算法影像語音文字雲端網路安全金融醫療製造零售電商遊戲硬體晶片半導體自動化"
+VOCAB = None
+
+
+def _vocab(rng):
+    global VOCAB
+    if VOCAB is None:
+        VOCAB = ["".join(rng.sample(CHARS, rng.randint(2, 4))) for _ in range(3000)]
+    return VOCAB
+
+
+def make_jd(rng):
+    words = rng.sample(_vocab(rng), 60)
+    skills = rng.sample(SKILLS, 5)
+    return ("工作內容：" + "、".join(words) +
+            "。必備技能：" + "、".join(skills) +
+            f"。具備 {rng.randint(1, 10)} 年以上相關經驗，薪資 {rng.randint(40, 120)},000 元起。")
+
+
+def make_variant(jd, rng):
+    """模擬重新刊登：增減少量文字"""
+    return jd.replace("工作內容", "職務說明", 1) + rng.choice(["歡迎應屆畢業生。", "可遠端工作。", ""])
+
+
+def generate(n, seed=42):
+    """回傳 [(JD, 原始職缺的索引或 None)]，重複刊登記錄其改寫來源"""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        if docs and rng.random() < 0.2:
+            source = rng.randrange(max(0, i - 1000), i)
+            docs.append((make_variant(docs[source][0], rng), source))
+        else:
+            docs.append((make_jd(rng), None))
+    return docs
+
+
+def insert(docs, start, end):
+    """以 add_job 寫入 docs[start:end]，回傳耗時（add_job 每筆的輸出不顯示）"""
+    begin = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(start, end):
+            ok = database.add_job({
+                'job_url': f"{BENCH_URL}{i}",
+                'title': f"測試職缺 {i}",
+                'company': f"測試公司 {i % 500}",
+                'job_description': docs[i][0],
+                'source_website': 'bench',
+            })
+            assert ok, f"寫入第 {i} 筆失敗"
+    return time.perf_counter() - begin
+
+
+def _query(query, params=()):
+    conn = database.get_db().pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if cursor.with_rows else None
+        conn.commit()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def cleanup():
+    pattern = f"{BENCH_URL}%"
+    for table in ('job_skills', 'job_lsh_bands', 'job_signatures', 'saved_search_matches'):
+        _query(f"DELETE FROM {table} WHERE job_id IN (SELECT id FROM jobs WHERE job_url LIKE %s)", (pattern,))
+    _query("DELETE FROM jobs WHERE job_url LIKE %s", (pattern,))
+    database.reconcile_facet_counts()
+
+
+def verify_clusters(docs):
+    """重複刊登須與來源同群；互不相關的 JD 須各自成群"""
+    rows = _query("SELECT job_url, id, cluster_id FROM jobs WHERE job_url LIKE %s", (f"{BENCH_URL}%",))
+    clusters = {}
+    for job_url, job_id, cluster_id in rows:
+        clusters[int(job_url[len(BENCH_URL):])] = (job_id, cluster_id)
+    assert len(clusters) == len(docs), f"讀回 {len(clusters)} 筆，預期 {len(docs)} 筆"
+
+    variants = [(i, source) for i, (_, source) in enumerate(docs) if source is not None]
+    hits = sum(1 for i, source in variants if clusters[i][1] == clusters[source][1])
+    recall = hits / len(variants) if variants else 1.0
+    originals = [i for i, (_, source) in enumerate(docs) if source is None]
+    merged = sum(1 for i in originals if clusters[i][1] != clusters[i][0])
+    false_merge = merged / len(originals) if originals else 0.0
+    print(f"重複刊登同群比例 {recall:.1%}（{hits}/{len(variants)}）| 原始職缺被併入他群 {false_merge:.2%}")
+    assert recall >= MIN_RECALL, f"重複刊登同群比例 {recall:.1%} 低於 {MIN_RECALL:.0%}"
+    assert false_merge <= MAX_FALSE_MERGE, f"原始職缺被併入他群的比例 {false_merge:.2%} 超過 {MAX_FALSE_MERGE:.0%}"
+
+
+def run(sizes):
+    docs = generate(sizes[-1])
+    per_job = []
+    done = 0
+    for size in sizes:
+        elapsed = insert(docs, done, size)
+        per_job.append(elapsed / (size - done))
+        print(f"{done + 1:>8,} ~ {size:>8,} 筆 | 本段 {elapsed:8.2f}s | 每筆 {per_job[-1] * 1e3:7.2f}ms")
+        done = size
+
+    ratio = per_job[-1] / per_job[0]
+    print(f"最後一段每筆成本為第一段的 {ratio:.2f} 倍")
+    assert ratio <= SCALING_LIMIT, f"每筆成本隨資料量成長 {ratio:.2f} 倍，超過 {SCALING_LIMIT} 倍"
+    verify_clusters(docs)
+
+
+if __name__ == '__main__':
+    sizes = sorted(int(arg) for arg in sys.argv[1:]) or [1_000, 5_000, 20_000]
+    print("--- MinHash LSH 近似重複分群效能測試（database.add_job） ---")
+    cleanup()
+    try:
+        run(sizes)
+    finally:
+        cleanup()
+    print("所有檢查通過。")
@@ -0,0 +1,165 @@
+"""
+AI 分析壓力測試
+
+以假的 LLM（固定延遲後回傳結果）取代 Gemini，在執行緒數有限的 WSGI 伺服器上
+（模擬 gunicorn --threads N）同時送出大量 AI 分析請求，並持續測量 /api/jobs 的延遲：
+
+- async 模式：使用 POST /api/jobs/<id>/match/tasks 提交並輪詢，伺服器執行緒不會被 LLM 佔用。
+- sync 模式：使用舊的 POST /api/jobs/<id>/match（仍經過佇列，請求最多等待 MATCH_SYNC_TIMEOUT 秒，
+  之後與 async 模式相同改為輪詢）。
+
+除了列表延遲，也統計分析請求與輪詢中非預期的錯誤回應（例如連接池用完造成的 500），正常情況應為 0。
+
+需要可連線的 MySQL，且資料庫中至少有一筆含職缺描述的職缺（分析工作存放在 match_tasks 表）。
+額度以來源 IP 計算：測試以 TRUSTED_PROXIES=1 啟動，每個模擬用戶端帶不同的 X-Forwarded-For。
+
+執行方式：
+    python benchmarks/bench_match_load.py --mode async
+    python benchmarks/bench_match_load.py --mode sync --clients 16 --model-latency 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import BaseWSGIServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import database
+import match_queue
+
+
+class BoundedWSGIServer(BaseWSGIServer):
+    """以固定大小的執行緒池處理請求，模擬正式環境中有限的 worker 執行緒"""
+    def __init__(self, host, port, wsgi_app, threads):
+        super().__init__(host, port, wsgi_app)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def fake_model(latency):
+    def analyze(job_description, resume_text):
+        time.sleep(latency)
+        return {'match_score': 75, 'strengths_analysis': [], 'skill_gaps': [],
+                'interview_questions': [], 'overall_suggestion': '（假模型）'}
+    return analyze
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def measure_list_latency(base_url, stop_event, samples, stats):
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        response = requests.get(f"{base_url}/api/jobs", params={'limit': 10}, timeout=60)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            stats['list_errors'] += 1
+        time.sleep(0.05)
+
+
+def match_client(base_url, job_id, mode, client_no, stop_event, stats):
+    headers = {'X-Forwarded-For': f'10.0.{client_no // 250}.{client_no % 250 + 1}'}
+    files = {'resume': ('resume.txt', '熟悉 Python 與機器學習。'.encode('utf-8'))}
+    while not stop_event.is_set():
+        path = f"/api/jobs/{job_id}/match/tasks" if mode == 'async' else f"/api/jobs/{job_id}/match"
+        response = requests.post(base_url + path, files=files, headers=headers, timeout=300)
+        if response.status_code not in (200, 202, 429):
+            stats['errors'] += 1
+            time.sleep(0.5)
+            continue
+        if response.status_code == 429:
+            stats['rejected'] += 1
+            time.sleep(min(float(response.headers.get('Retry-After', 1)), 2))
+            continue
+        if response.status_code == 202:
+            task_id = response.json()['task_id']
+            while not stop_event.is_set():
+                time.sleep(0.5)
+                poll = requests.get(f"{base_url}/api/match-tasks/{task_id}", timeout=60)
+                if poll.status_code != 202:
+                    if poll.status_code != 200:
+                        stats['errors'] += 1
+                    break
+        stats['completed'] += 1
+
+
+def run(args):
+    os.environ['TRUSTED_PROXIES'] = '1'
+    flask_app = app_module.create_app(enable_scheduler=False)
+    app_module._match_queue = match_queue.MatchQueue(
+        fake_model(args.model_latency), workers=args.workers,
+        max_queue=args.queue_size, per_client_limit=args.per_client
+    )
+
+    job_id = args.job_id
+    if job_id is None:
+        jobs, _ = database.get_all_jobs(limit=1)
+        if not jobs:
+            sys.exit("資料庫中沒有職缺，無法進行測試。")
+        job_id = jobs[0]['id']
+
+    server = BoundedWSGIServer('127.0.0.1', 0, flask_app, threads=args.server_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # 1. 基準：沒有分析負載時的列表延遲
+    baseline = []
+    stop = threading.Event()
+    timer = threading.Timer(args.duration / 2, stop.set)
+    timer.start()
+    measure_list_latency(base_url, stop, baseline, {'list_errors': 0})
+
+    # 2. 分析風暴期間的列表延遲
+    storm = []
+    stats = {'completed': 0, 'rejected': 0, 'errors': 0, 'list_errors': 0}
+    stop = threading.Event()
+    threads = [threading.Thread(target=match_client, args=(base_url, job_id, args.mode, i, stop, stats), daemon=True)
+               for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    timer = threading.Timer(args.duration, stop.set)
+    timer.start()
+    measure_list_latency(base_url, stop, storm, stats)
+    server.shutdown()
+
+    print(f"--- AI 分析壓力測試（模式 {args.mode}，伺服器執行緒 {args.server_threads}，並行用戶端 {args.clients}）---")
+    for label, values in (('無負載', baseline), ('分析風暴', storm)):
+        print(f"{label:<6} /api/jobs 延遲：p50 {statistics.median(values) * 1000:8.1f} ms | "
+              f"p99 {percentile(values, 0.99) * 1000:8.1f} ms | 樣本 {len(values)}")
+    print(f"完成分析 {stats['completed']} 筆，被拒絕 (429) {stats['rejected']} 次，錯誤回應 {stats['errors']} 次，"
+          f"列表錯誤回應 {stats['list_errors']} 次")
+    print(f"佇列指標：{app_module.get_match_queue().metrics()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='AI 分析佇列壓力測試')
+    parser.add_argument('--mode', choices=['async', 'sync'], default='async')
+    parser.add_argument('--clients', type=int, default=12, help='並行送出分析的用戶端數')
+    parser.add_argument('--server-threads', type=int, default=8, help='WSGI 伺服器執行緒數')
+    parser.add_argument('--workers', type=int, default=2, help='分析佇列 worker 數')
+    parser.add_argument('--queue-size', type=int, default=10)
+    parser.add_argument('--per-client', type=int, default=1)
+    parser.add_argument('--model-latency', type=float, default=2.0, help='假模型每次分析的秒數')
+    parser.add_argument('--duration', type=float, default=20.0, help='分析風暴持續秒數')
+    parser.add_argument('--job-id', type=int, default=None)
+    run(parser.parse_args())
@@ -0,0 +1,159 @@
+"""
+自適應速率控制測試
+
+對本機假 104 伺服器（以 token bucket 節流，超過即回應 429 + Retry-After）進行四個情境：
+1. 節流：比較固定 sleep 與 AIMD 控制器的吞吐量、429 次數與最終速率。
+2. 少量隨機 5xx：確認重試後所有請求都能成功取得。
+3. 單頁故障：只有第 1 頁列表持續回應 503，確認該請求重試用盡後斷路器仍關閉，第 2 頁照常抓取。
+4. 伺服器故障：確認斷路器在連續多個請求失敗後開啟，並停止送出請求。
+
+執行方式：
+    python benchmarks/bench_rate_control.py
+"""
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_control
+import scraper
+from fake_104 import Fake104Server
+
+
+def fetch_all(server, codes, controller, breaker, threads=4):
+    """多執行緒抓取職缺頁面，回傳 (成功數, 耗時)"""
+    session = requests.Session()
+    ok = [0]
+    lock = threading.Lock()
+    pending = list(codes)
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                code = pending.pop()
+            response = rate_control.request(session, 'GET', f"{server.base_url}/job/{code}",
+                                            controller=controller, breaker=breaker,
+                                            max_retries=6, backoff_base=0.2)
+            if response.status_code == 200:
+                with lock:
+                    ok[0] += 1
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return ok[0], time.perf_counter() - start
+
+
+def fixed_sleep(server, codes, delay):
+    """舊做法：每個請求之間固定等待"""
+    session = requests.Session()
+    ok = 0
+    start = time.perf_counter()
+    for code in codes:
+        response = session.get(f"{server.base_url}/job/{code}")
+        ok += response.status_code == 200
+        time.sleep(delay)
+    return ok, time.perf_counter() - start
+
+
+def scenario_throttle(n=120, limit=10):
+    print(f"\n[情境 1] 伺服器限制 {limit} req/s，抓取 {n} 個職缺頁")
+    codes = [f"t{i}" for i in range(n)]
+
+    server = Fake104Server(rate_limit=limit, burst=limit).start()
+    ok, elapsed = fixed_sleep(server, codes[:10], 1.5)
+    print(f"  固定 sleep 1.5s：{ok}/10 成功，{10 / elapsed:5.2f} req/s（僅測 10 筆）")
+    server.stop()
+
+    server = Fake104Server(rate_limit=limit, burst=limit).start()
+    controller = rate_control.AdaptiveRateController(initial_rate=1.0, max_rate=50, increase_step=0.5)
+    breaker = rate_control.CircuitBreaker()
+    ok, elapsed = fetch_all(server, codes, controller, breaker)
+    print(f"  AIMD 控制器  ：{ok}/{n} 成功，{n / elapsed:5.2f} req/s，"
+          f"429 共 {server.counters['429']} 次，最終速率 {controller.snapshot()['rate']} req/s")
+    server.stop()
+    assert ok == n, "所有請求在重試後都應成功"
+
+    # 多個執行緒同時收到同一波 429 時只降速一次
+    controller = rate_control.AdaptiveRateController(initial_rate=8.0, max_rate=50)
+    for _ in range(4):
+        controller.on_throttle()
+    print(f"  同時 4 個節流回應後速率 {controller.snapshot()['rate']} req/s")
+    assert controller.snapshot()['rate'] == 4.0, "冷卻時間內應只降速一次"
+
+
+def scenario_errors(n=60, error_rate=0.05):
+    print(f"\n[情境 2] {error_rate:.0%} 隨機 503，抓取 {n} 個職缺頁")
+    server = Fake104Server(error_rate=error_rate).start()
+    controller = rate_control.AdaptiveRateController(initial_rate=5.0, max_rate=50, increase_step=0.5)
+    breaker = rate_control.CircuitBreaker(failure_threshold=10)
+    ok, elapsed = fetch_all(server, [f"e{i}" for i in range(n)], controller, breaker)
+    print(f"  {ok}/{n} 成功，503 共 {server.counters['503']} 次，耗時 {elapsed:.1f}s")
+    server.stop()
+    assert ok == n, "隨機錯誤應由重試吸收"
+
+
+def scenario_single_page():
+    print("\n[情境 3] 只有第 1 頁列表持續回應 503，確認不會開啟斷路器")
+    server = Fake104Server(pages=2).start()
+    server.fail_pages = {1}
+    config = server.target_config(scraper.TARGET_CONFIG['104'])
+    rate_control.configure(config['api_url'], initial_rate=20.0, max_rate=50)
+    session = requests.Session()
+    try:
+        scraper.fetch_104_list_page(session, config, 'AI 工程師', 1)
+        raise AssertionError("第 1 頁應在重試用盡後失敗")
+    except requests.HTTPError as e:
+        print(f"  第 1 頁重試用盡：{e}")
+    jobs = scraper.fetch_104_list_page(session, config, 'AI 工程師', 2)
+    _, breaker = rate_control.get_controller(config['api_url'])
+    print(f"  第 2 頁取得 {len(jobs)} 個職缺，斷路器狀態 {breaker.state}")
+    server.stop()
+    assert jobs and breaker.state == 'closed'
+
+
+def scenario_outage(threshold=3):
+    print(f"\n[情境 4] 伺服器全部回應 503，確認斷路器在 {threshold} 個請求失敗後開啟")
+    server = Fake104Server().start()
+    server.fail_all = True
+    controller = rate_control.AdaptiveRateController(initial_rate=20.0, max_rate=50)
+    breaker = rate_control.CircuitBreaker(failure_threshold=threshold, reset_timeout=1.0)
+    session = requests.Session()
+    failed = 0
+    try:
+        for _ in range(threshold + 1):
+            response = rate_control.request(session, 'GET', f"{server.base_url}/job/x", controller=controller,
+                                            breaker=breaker, max_retries=3, backoff_base=0.05)
+            assert response.status_code == 503
+            failed += 1
+        raise AssertionError("斷路器應在連續失敗後開啟")
+    except rate_control.CircuitOpenError as e:
+        print(f"  {failed} 個請求失敗後斷路器開啟（{e}），伺服器共收到 {server.counters['requests']} 個請求")
+    assert failed == threshold
+
+    # 伺服器恢復後，reset_timeout 過後的試探請求成功即關閉斷路器
+    server.fail_all = False
+    time.sleep(1.1)
+    response = rate_control.request(session, 'GET', f"{server.base_url}/job/x",
+                                    controller=controller, breaker=breaker)
+    print(f"  伺服器恢復後試探請求狀態 {response.status_code}，斷路器狀態 {breaker.state}")
+    server.stop()
+    assert breaker.state == 'closed'
+
+
+if __name__ == '__main__':
+    print("--- 爬蟲自適應速率控制測試（本機假 104 伺服器）---")
+    scenario_throttle()
+    scenario_errors()
+    scenario_single_page()
+    scenario_outage()
+    print("\n所有情境皆通過。")
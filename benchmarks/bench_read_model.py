@@ -0,0 +1,383 @@
+"""
+記憶體讀取模型效能測試
+
+以一組常見的列表查詢（無條件、關鍵字、狀態、縣市、薪資與年資範圍、技能、翻頁、去重）
+測量 /api/jobs 需要的「職缺列表 + facet 計數」：
+
+- 預設：以合成資料建立快照，先和逐列比對的參考實作核對列表與 facet 計數，確認增量更新產生的新快照與全量重建相同、
+  且不會改動查詢中的舊快照，再以多執行緒測量 p50 / p99 與每秒請求數
+  （分別測量每次都重新比對，以及相同條件使用快取的情況）。
+- --sql：使用資料庫中的真實資料，比較讀取模型與 SQL 路徑（database.get_all_jobs + get_facet_counts）
+  的結果是否一致，以及兩者的延遲與吞吐量。需要可連線的 MySQL。
+
+執行方式：
+    python benchmarks/bench_read_model.py --rows 30000
+    python benchmarks/bench_read_model.py --sql --threads 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import database
+import read_model
+
+COUNTIES = ['台北市', '新北市', '桃園市', '新竹市', '新竹縣', '台中市', '台南市', '高雄市', None]
+INDUSTRIES = ['電腦軟體服務業', '半導體製造業', '網際網路相關業', '金融機構及其相關業', '電子零組件相關業']
+EXPERIENCES = ['無經驗', '1年以下', '1-3年', '3-5年', '5-10年', '經歷不拘']
+STATUSES = ['unfollowed'] * 8 + ['followed', 'applied', 'rejected']
+SKILLS = ['Python', 'PyTorch', 'Docker', 'SQL', 'Kubernetes', 'AWS', '機器學習', '深度學習', '大型語言模型']
+WORDS = ['模型', '資料', '平台', '部署', '推論', '訓練', '影像', '語音', '推薦', '搜尋', '雲端', '產品',
+         'python', 'pytorch', 'docker', 'llm', 'mlops', 'kubernetes', 'spark', 'sql', 'node_js', '100%', 'Café']
+
+QUERIES = [
+    {},
+    {'keyword': 'python'},
+    {'keyword': '工程師', 'page': 3},
+    {'status': 'followed'},
+    {'county': '台北市'},
+    {'salary_min': 60000, 'exp_max': 3},
+    {'keyword': 'llm', 'county': '新竹市'},
+    {'skills': ['Python', 'Docker']},
+    {'dedupe': True},
+    {'industry': '半導體製造業', 'page': 2},
+]
+
+# 只用來核對結果：大小寫、重音與 LIKE 萬用字元（SQL 依定序比較，% 與 _ 已跳脫為一般字元）
+COLLATION_QUERIES = [
+    {'keyword': 'PyTorch'},
+    {'keyword': 'CAFE'},
+    {'keyword': '100%'},
+    {'keyword': 'node_js'},
+    {'keyword': '_'},
+    {'status': 'Followed'},
+    {'county': '台北市', 'industry': '半導體製造業'},
+    {'skills': ['python', 'DOCKER']},
+    {'skills': ['Python', 'python']},
+]
+
+# --sql 時寫入的職缺，確保資料庫中一定有需要依定序與跳脫比較的資料（結束後刪除）
+FIXTURE_URL = 'https://bench.invalid/read-model/'
+FIXTURES = [
+    {'title': 'PyTorch 工程師', 'company': 'Bench 公司', 'location': '台北市信義區',
+     'job_description': '熟悉 Python 與 Docker，補助 100% 課程費用。'},
+    {'title': 'node_js 後端工程師', 'company': 'Bench 公司', 'location': '新竹市東區',
+     'job_description': 'Node.js 與 SQL。'},
+    {'title': 'nodexjs 工程師', 'company': 'Bench 公司', 'location': '新竹市東區',
+     'job_description': '底線以外的字元，不應被 node_js 命中；100 percent。'},
+    {'title': 'Café 資料工程師', 'company': 'BENCH 公司', 'location': '台中市西屯區',
+     'job_description': 'python、docker'},
+]
+
+# 只用來核對 facet 計數：每個 facet 套用除了自己以外的所有條件（包含狀態）
+FACET_QUERIES = [
+    {'status': 'applied'},
+    {'status': 'followed', 'county': '台北市'},
+    {'county': '新竹市', 'industry': '半導體製造業'},
+    {'keyword': 'python', 'status': 'rejected', 'skills': ['Docker']},
+]
+
+
+def generate(n, seed=7):
+    """合成職缺列與技能標籤"""
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    rows, skills = [], {}
+    for job_id in range(1, n + 1):
+        salary_min = rng.choice([None, rng.randrange(35000, 120000, 5000)])
+        # 部分職缺只有下限（「月薪 XX 元以上」），用來核對薪資範圍交集的比對
+        salary_max = None if salary_min is None or rng.random() < 0.3 else salary_min + 20000
+        exp_min = rng.choice([None, 0, 1, 3, 5])
+        rows.append({
+            'id': job_id,
+            'title': f"{rng.choice(['AI', '機器學習', '資料', '後端', 'MLOps'])}工程師 #{job_id}",
+            'company': f"公司{rng.randrange(2000)}",
+            'location': rng.choice(COUNTIES[:-1]) + '某區',
+            'experience': rng.choice(EXPERIENCES),
+            'education': rng.choice(['大學', '碩士', '不拘']),
+            'salary_range': ('面議' if salary_min is None else f"月薪{salary_min:,}元以上" if salary_max is None
+                             else f"月薪{salary_min:,}~{salary_max:,}元"),
+            'job_url': f"https://www.104.com.tw/job/{job_id:x}",
+            'source_website': '104人力銀行',
+            'posting_date': (base + timedelta(days=rng.randrange(120))).strftime('%Y%m%d'),
+            'industry': rng.choice(INDUSTRIES),
+            'job_description': "、".join(rng.choices(WORDS, k=80)),
+            'status': rng.choice(STATUSES),
+            'cluster_id': rng.randrange(1, n // 2) if rng.random() < 0.2 else None,
+            'salary_min': salary_min,
+            'salary_max': salary_max,
+            'salary_period': 'negotiable' if salary_min is None else 'month',
+            'exp_min_years': exp_min,
+            'exp_max_years': None,
+            'county': rng.choice(COUNTIES),
+            'created_at': base,
+            'updated_at': base,
+        })
+        skills[job_id] = set(rng.sample(SKILLS, 3))
+    return rows, skills
+
+
+def reference_ids(rows, skills, keyword='', status='', county='', industry='', salary_min=None, exp_max=None,
+                  skill_filter=None):
+    """逐列比對的參考實作（與 SQL 的 WHERE 語意相同），用來核對讀取模型的結果"""
+    matched = []
+    for row in sorted(rows, key=read_model.sort_key, reverse=True):
+        if keyword and read_model.fold(keyword) not in read_model.search_text(row):
+            continue
+        if status and read_model.fold(row['status']) != read_model.fold(status):
+            continue
+        if county and read_model.fold(row['county'] or '') != read_model.fold(county):
+            continue
+        if industry and read_model.fold(row['industry']) != read_model.fold(industry):
+            continue
+        top = row['salary_max'] if row['salary_max'] is not None else row['salary_min']
+        if salary_min is not None and (top is None or top < salary_min):
+            continue
+        if exp_max is not None and (row['exp_min_years'] is None or row['exp_min_years'] > exp_max):
+            continue
+        job_skills = {read_model.fold(skill) for skill in skills.get(row['id'], ())}
+        if skill_filter and not {read_model.fold(skill) for skill in skill_filter} <= job_skills:
+            continue
+        matched.append(row['id'])
+    return matched
+
+
+def reference_facets(rows, skills, filters):
+    """逐列計算每個 facet 的計數，每個 facet 排除自己的條件"""
+    arguments = {'keyword': 'keyword', 'status': 'status', 'county': 'county', 'industry': 'industry',
+                 'salary_min': 'salary_min', 'exp_max': 'exp_max', 'skills': 'skill_filter'}
+    by_id = {row['id']: row for row in rows}
+    facets = {}
+    for facet, column in database.FACET_COLUMNS.items():
+        others = {arguments[key]: value for key, value in filters.items() if key != facet}
+        counts = Counter(by_id[job_id][column] or '' for job_id in reference_ids(rows, skills, **others))
+        facets[facet] = dict(counts)
+    return facets
+
+
+def split(query):
+    query = dict(query)
+    return query.pop('page', 1), query
+
+
+def verify_against_reference(snapshot, rows, skills):
+    queries = QUERIES + COLLATION_QUERIES
+    for query in queries:
+        if query.get('dedupe'):
+            continue
+        page, filters = split(query)
+        expected = reference_ids(rows, skills, keyword=filters.get('keyword', ''), status=filters.get('status', ''),
+                                 county=filters.get('county', ''), industry=filters.get('industry', ''),
+                                 salary_min=filters.get('salary_min'), exp_max=filters.get('exp_max'),
+                                 skill_filter=filters.get('skills'))
+        jobs, total = snapshot.get_all_jobs(page=page, limit=10, **filters)
+        assert total == len(expected), (query, total, len(expected))
+        assert [job['id'] for job in jobs] == expected[(page - 1) * 10:page * 10], query
+    print(f"  {len(queries) - 1} 組查詢（含大小寫、重音與萬用字元）的結果與參考實作一致。")
+
+
+def verify_facets(snapshot, rows, skills):
+    """核對 /api/jobs 的 facet 計數（app._facet_counts）：狀態以外的 facet 也要套用狀態條件"""
+    for filters in FACET_QUERIES:
+        facets = app._facet_counts(dict(filters, dedupe=True), lambda f: snapshot.get_facet_counts(**f))
+        actual = {facet: {item['value']: item['count'] for item in values} for facet, values in facets.items()}
+        assert actual == reference_facets(rows, skills, filters), filters
+    print(f"  {len(FACET_QUERIES)} 組條件的 facet 計數與參考實作一致（每個 facet 只排除自己的條件）。")
+
+
+def all_results(snapshot):
+    """快照對 QUERIES 的列表、總數與 facet 計數，用來比較兩份快照"""
+    results = []
+    for query in QUERIES:
+        page, filters = split(query)
+        jobs, total = snapshot.get_all_jobs(page=page, limit=10, **filters)
+        facets = snapshot.get_facet_counts(**{k: v for k, v in filters.items() if k != 'dedupe'})
+        results.append((jobs, total, facets))
+    return results
+
+
+def verify_patch(snapshot, rows, skills, seed=11):
+    """
+    模擬一次增量更新：改狀態與薪資（原地覆寫）、改刊登日期與 JD（需重新排序）、新增職缺並改技能，
+    確認新快照與全量重建相同，且舊快照的查詢結果完全不變（copy-on-write）。
+    """
+    rng = random.Random(seed)
+    before = all_results(snapshot)
+    updated = {row['id']: dict(row) for row in rows}
+    new_skills = {job_id: set(values) for job_id, values in skills.items()}
+    changed = []
+    for row in rng.sample(rows, 300):
+        row = dict(row)
+        row['status'] = rng.choice(STATUSES)
+        row['salary_min'] = rng.choice([None, 70000])
+        changed.append(row)
+    for row in rng.sample(rows, 100):
+        row = dict(updated.get(row['id'], row))
+        row['posting_date'] = '20250601'
+        row['job_description'] += '、python'
+        changed.append(row)
+    extra, _ = generate(len(rows) + 50, seed=seed)
+    changed.extend(extra[len(rows):])
+    for row in changed:
+        updated[row['id']] = row
+        new_skills[row['id']] = set(rng.sample(SKILLS, 2))
+
+    patched = snapshot.patched(changed, {row['id']: new_skills[row['id']] for row in changed})
+    rebuilt = read_model.build_snapshot(list(updated.values()), new_skills)
+    assert all_results(snapshot) == before, "增量更新不應改動舊快照"
+    assert all_results(patched) == all_results(rebuilt), "增量更新的結果應與全量重建相同"
+    print(f"  套用 {len(changed)} 筆變動：新快照與全量重建一致，舊快照未被修改。")
+
+
+def measure(label, handler, threads, duration):
+    """多執行緒輪流送出 QUERIES，回傳延遲列表與每秒請求數"""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        local = []
+        i = offset
+        while time.perf_counter() < deadline:
+            page, filters = split(QUERIES[i % len(QUERIES)])
+            start = time.perf_counter()
+            handler(page, filters)
+            local.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"  {label:<10} {len(latencies) / elapsed:9.1f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+    return latencies
+
+
+def list_and_facets(source):
+    """模擬 /api/jobs：列表加上 facet 計數（與 app._facet_counts 相同，每個 facet 排除自己的條件）"""
+    def handler(page, filters):
+        source.get_all_jobs(page=page, limit=10, **filters)
+        app._facet_counts(filters, lambda f: source.get_facet_counts(**f))
+    return handler
+
+
+def uncached(snapshot, handler):
+    """每次查詢前清空快照的比對快取，測量查詢條件各不相同時的成本"""
+    def wrapped(page, filters):
+        snapshot._match_cache = {}
+        handler(page, filters)
+    return wrapped
+
+
+def run_synthetic(args):
+    print(f"\n[合成資料] {args.rows} 筆職缺")
+    rows, skills = generate(args.rows)
+    start = time.perf_counter()
+    snapshot = read_model.build_snapshot(rows, skills)
+    print(f"  建立快照 {time.perf_counter() - start:.2f} 秒")
+    verify_against_reference(snapshot, rows, skills)
+    verify_facets(snapshot, rows, skills)
+    verify_patch(snapshot, rows, skills)
+    measure('無快取', uncached(snapshot, list_and_facets(snapshot)), args.threads, args.duration)
+    measure('快取', list_and_facets(snapshot), args.threads, args.duration)
+
+
+def _run_sql(query, params=()):
+    conn = database.get_db().pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def add_fixtures():
+    for index, job in enumerate(FIXTURES):
+        assert database.add_job(dict(job, job_url=f"{FIXTURE_URL}{index}", source_website='bench')), job
+
+
+def remove_fixtures():
+    pattern = f"{FIXTURE_URL}%"
+    for table in ('job_skills', 'job_lsh_bands', 'job_signatures', 'saved_search_matches'):
+        _run_sql(f"DELETE FROM {table} WHERE job_id IN (SELECT id FROM jobs WHERE job_url LIKE %s)", (pattern,))
+    _run_sql("DELETE FROM jobs WHERE job_url LIKE %s", (pattern,))
+    database.reconcile_facet_counts()
+
+
+def facet_dicts(facets):
+    """
+    facet 計數轉為 {facet: {值: 數量}}。計數相同的值順序不固定，值的數量達到上限時，
+    與最後一名同分的值可能各自被截掉，比較時略過。
+    """
+    result = {}
+    for facet, values in facets.items():
+        cutoff = values[-1]['count'] if len(values) == database.FACET_VALUE_LIMIT else 0
+        result[facet] = {item['value']: item['count'] for item in values if item['count'] > cutoff}
+    return result
+
+
+def compare_with_sql(model):
+    """SQL 路徑與讀取模型的總數、分頁結果與 facet 計數必須一致"""
+    queries = QUERIES + COLLATION_QUERIES
+    for query in queries:
+        page, filters = split(query)
+        sql_jobs, sql_total = database.get_all_jobs(page=page, limit=10, **filters)
+        model_jobs, model_total = model.get_all_jobs(page=page, limit=10, **filters)
+        assert sql_total == model_total, (query, sql_total, model_total)
+        assert [job['id'] for job in sql_jobs] == [job['id'] for job in model_jobs], query
+        facet_filters = {k: v for k, v in filters.items() if k != 'dedupe'}
+        assert (facet_dicts(database.get_facet_counts(**facet_filters))
+                == facet_dicts(model.get_facet_counts(**facet_filters))), query
+    # node_js 只命中字面上有底線的職缺，不會把 _ 當成任意字元
+    jobs, _ = database.get_all_jobs(keyword='node_js', limit=100)
+    assert f"{FIXTURE_URL}2" not in {job['job_url'] for job in jobs}, "LIKE 的 _ 應已跳脫"
+    print(f"  {len(queries)} 組查詢（含大小寫、重音與萬用字元）的總數、分頁結果與 facet 計數一致。")
+
+
+def run_sql(args):
+    print("\n[資料庫資料] 比較讀取模型與 SQL 路徑")
+    add_fixtures()
+    try:
+        model = read_model.ReadModel()
+        model.rebuild()
+        compare_with_sql(model)
+    finally:
+        remove_fixtures()
+    model.rebuild()
+
+    measure('SQL', list_and_facets(database), args.threads, args.duration)
+    measure('讀取模型', list_and_facets(model), args.threads, args.duration)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='記憶體讀取模型效能測試')
+    parser.add_argument('--rows', type=int, default=30000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='每種路徑的測量秒數')
+    parser.add_argument('--sql', action='store_true', help='使用資料庫資料並與 SQL 路徑比較')
+    args = parser.parse_args()
+
+    print("--- 記憶體讀取模型效能測試 ---")
+    if args.sql:
+        run_sql(args)
+    else:
+        run_synthetic(args)
@@ -0,0 +1,65 @@
+"""
+冷啟動效能測試
+
+在全新的 Python 行程中測量：
+1. 匯入 app 模組所需時間
+2. create_app() 所需時間
+3. 第一個請求的回應時間（time-to-first-response，包含第一次使用時才初始化的資源）
+
+每次測量都另開子行程，避免模組快取影響結果。
+
+執行方式：
+    python benchmarks/bench_startup.py                 # 預設請求首頁 /
+    python benchmarks/bench_startup.py --path /api/jobs --runs 3   # 包含資料庫初始化（需可連線的 MySQL）
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子行程中執行的測量程式
+_PROBE = r"""
+import contextlib, io, json, sys, time
+path = sys.argv[1]
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    t1 = time.perf_counter()
+    flask_app = app.create_app(enable_scheduler=False)
+    t2 = time.perf_counter()
+    response = flask_app.test_client().get(path)
+    t3 = time.perf_counter()
+print(json.dumps({
+    'import': t1 - t0,
+    'create_app': t2 - t1,
+    'first_response': t3 - t2,
+    'total': t3 - t0,
+    'status': response.status_code,
+}))
+"""
+
+
+def probe(path):
+    result = subprocess.run(
+        [sys.executable, '-c', _PROBE, path],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='測量 app 冷啟動時間')
+    parser.add_argument('--path', default='/', help='第一個請求的路徑')
+    parser.add_argument('--runs', type=int, default=5, help='重複次數（取中位數）')
+    args = parser.parse_args()
+
+    samples = [probe(args.path) for _ in range(args.runs)]
+    print(f"--- 冷啟動效能測試（{args.runs} 次，路徑 {args.path}，狀態碼 {samples[-1]['status']}）---")
+    for key, label in (('import', '匯入 app 模組'), ('create_app', 'create_app()'),
+                       ('first_response', '第一個請求'), ('total', '合計')):
+        values = [sample[key] * 1000 for sample in samples]
+        print(f"{label:<16} 中位數 {statistics.median(values):8.1f} ms | 最大 {max(values):8.1f} ms")
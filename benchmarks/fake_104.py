@@ -0,0 +1,159 @@
+"""
+本機假 104 伺服器
+
+提供與 104 相同路徑的職缺列表 API、職缺頁面與職缺內容 API，供爬蟲測試使用：
+- 以 token bucket 模擬 104 的節流：超過 rate_limit 的請求回應 429 與 Retry-After。
+- 可注入隨機 5xx 錯誤、固定延遲，讓指定的列表頁持續失敗，或讓所有請求失敗（測試斷路器）。
+- 記錄每個職缺頁被抓取的次數，用來檢查是否有重複抓取。
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class Fake104Server:
+    def __init__(self, pages=5, jobs_per_page=20, rate_limit=None, burst=None,
+                 error_rate=0.0, latency=0.0, retry_after=1):
+        self.pages = pages
+        self.jobs_per_page = jobs_per_page
+        self.rate_limit = rate_limit
+        self.burst = burst or (rate_limit or 1)
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self.fail_all = False
+        self.fail_pages = set()
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self.counters = Counter()
+        self.job_fetches = Counter()
+        self._server = None
+
+    # --- 節流與錯誤注入 ---
+    def _admit(self):
+        """回傳 None 代表放行，否則回傳要回應的狀態碼"""
+        if self.fail_all:
+            return 503
+        if self.error_rate and random.random() < self.error_rate:
+            return 503
+        if self.rate_limit is None:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return 429
+
+    # --- 假資料 ---
+    def job_code(self, page, index):
+        return f"p{page}j{index}"
+
+    def list_payload(self, page):
+        if page > self.pages:
+            return {'data': {'list': [], 'totalPage': self.pages}}
+        host = f"127.0.0.1:{self.port}"
+        jobs = []
+        for index in range(self.jobs_per_page):
+            code = self.job_code(page, index)
+            jobs.append({
+                'jobName': f'AI 工程師 {code}',
+                'custName': f'測試公司 {index % 7}',
+                'jobAddrNoDesc': '台北市大安區',
+                'jobAddress': '',
+                'period': '03',
+                'optionEdu': '大學',
+                'salaryDesc': '月薪50,000~70,000元',
+                'appearDate': '20250101',
+                'coIndustryDesc': '電腦軟體服務業',
+                'link': {'job': f'//{host}/job/{code}'},
+            })
+        return {'data': {'list': jobs, 'totalPage': self.pages}}
+
+    def description(self, code):
+        return f"職缺 {code}：負責機器學習模型開發與部署，熟悉 Python 與 PyTorch。"
+
+    # --- 伺服器 ---
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                status = server._admit()
+                with server._lock:
+                    server.counters['requests'] += 1
+                    if status:
+                        server.counters[str(status)] += 1
+                if status == 429:
+                    return self._send(429, headers={'Retry-After': str(server.retry_after)})
+                if status:
+                    return self._send(status)
+
+                if url.path == '/jobs/search/list':
+                    page = int(parse_qs(url.query).get('page', ['1'])[0])
+                    if page in server.fail_pages:
+                        return self._send(503)
+                    body = json.dumps(server.list_payload(page), ensure_ascii=False).encode('utf-8')
+                    return self._send(200, body)
+                if url.path.startswith('/job/ajax/content/'):
+                    code = url.path.rsplit('/', 1)[-1]
+                    with server._lock:
+                        server.job_fetches[code] += 1
+                    payload = {'data': {'jobDetail': {'jobDescription': server.description(code)}}}
+                    return self._send(200, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+                if url.path.startswith('/job/'):
+                    code = url.path.rsplit('/', 1)[-1]
+                    with server._lock:
+                        server.job_fetches[code] += 1
+                    html = f'<html><body><div data-qa-id="jobDescription">{server.description(code)}</div></body></html>'
+                    return self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+                return self._send(404)
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def target_config(self, base_config):
+        """以 scraper.TARGET_CONFIG['104'] 為範本，將網址改為指向本機假伺服器"""
+        config = dict(base_config)
+        config['api_url'] = f"{self.base_url}/jobs/search/list"
+        config['content_api_url'] = f"{self.base_url}/job/ajax/content/{{job_id}}"
+        config['job_url_scheme'] = 'http'
+        return config
@@ -0,0 +1,661 @@
+"""
+分散式爬取佇列模組 (Crawl Frontier)
+
+將爬取工作拆成資料庫中的任務，任何節點上的任意數量 worker 行程都能一起消化：
+1. 列表頁任務 (list)：抓取一頁 104 職缺列表，為每個職缺新增一個職缺頁任務。
+2. 職缺頁任務 (detail)：抓取 JD 並寫入 jobs 表。
+
+每個任務有優先權、嘗試次數與租約到期時間。worker 以 SELECT ... FOR UPDATE SKIP LOCKED
+一次租用一批任務，彼此不會等待也不會拿到同一筆任務；worker 中途當掉時，
+租約到期的任務會被其他 worker 收回重新執行。任務以 (run_id, 類型, 網址) 去重，
+同一輪爬取中重複出現的職缺只會抓取一次。建立新一輪任務時，刪除已結束超過 RUN_RETENTION_DAYS 天的輪次，
+避免 crawl_frontier 表無限成長。
+
+所有 worker 對同一主機共用 crawl_rate_budget 表中的 AIMD 速率（SharedRateController），
+增加 worker 只會讓共用的速率預算被用滿，不會讓對 104 的總請求速率變成 N 倍。
+
+使用方式：
+    python crawl_frontier.py seed --keyword "AI 工程師" --pages 10
+    python crawl_frontier.py work --processes 4          # 可在多台機器上同時執行
+    python crawl_frontier.py status
+    python crawl_frontier.py purge --days 7
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import time
+from datetime import date
+from urllib.parse import urlparse
+
+import requests
+from mysql.connector import Error
+
+import database
+import rate_control
+import saved_searches
+import scraper
+
+TASK_LIST = 'list'
+TASK_DETAIL = 'detail'
+
+# 列表頁優先，讓職缺頁任務盡早進入佇列，所有 worker 都有事可做
+PRIORITY_LIST = 10
+PRIORITY_DETAIL = 5
+
+LEASE_SECONDS = int(os.getenv('CRAWL_LEASE_SECONDS', '120'))
+MAX_ATTEMPTS = 5
+RECLAIM_INTERVAL = 30
+POLL_INTERVAL = 1.0
+# 所有任務都已結束（done / failed）超過這麼多天的爬取輪次會被刪除
+RUN_RETENTION_DAYS = int(os.getenv('CRAWL_RETENTION_DAYS', '7'))
+
+
+def _task_key(run_id, task_type, identity):
+    """同一輪爬取中相同任務的去重鍵"""
+    return hashlib.sha1(f"{run_id}|{task_type}|{identity}".encode('utf-8')).hexdigest()
+
+
+def _load_payload(payload):
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode('utf-8')
+    return json.loads(payload) if isinstance(payload, str) else payload
+
+
+class _Frontier:
+    """
+    爬取佇列的資料庫操作，共用 database 模組的連接池（資料表由 database 初始化）。
+    """
+    def __init__(self, pool):
+        self.pool = pool
+
+    def enqueue(self, run_id, tasks):
+        """
+        新增任務，tasks 為 (task_type, identity, payload, priority) 的列表。
+        已存在的任務以 INSERT IGNORE 略過，回傳實際新增的數量。
+        """
+        if not tasks:
+            return 0
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                INSERT IGNORE INTO crawl_frontier (task_key, run_id, task_type, payload, priority, max_attempts)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                [
+                    (_task_key(run_id, task_type, identity), run_id, task_type,
+                     json.dumps(payload, ensure_ascii=False), priority, MAX_ATTEMPTS)
+                    for task_type, identity, payload, priority in tasks
+                ]
+            )
+            inserted = cursor.rowcount
+            conn.commit()
+            return inserted
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"新增爬取任務時發生錯誤: {e}")
+            return 0
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def claim_batch(self, worker_id, batch_size=5, lease_seconds=LEASE_SECONDS, run_id=None):
+        """
+        租用一批可執行的任務。SKIP LOCKED 讓多個 worker 同時租用時直接略過彼此鎖住的列，
+        READ COMMITTED 則避免鎖住不符合條件的索引間隙。回傳任務列表（payload 已解析）。
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            conn.start_transaction(isolation_level='READ COMMITTED')
+            cursor = conn.cursor(dictionary=True)
+
+            query = "SELECT id FROM crawl_frontier WHERE state = 'pending' AND available_at <= NOW(3)"
+            params = []
+            if run_id:
+                query += " AND run_id = %s"
+                params.append(run_id)
+            query += " ORDER BY priority DESC, id LIMIT %s FOR UPDATE SKIP LOCKED"
+            params.append(batch_size)
+            cursor.execute(query, tuple(params))
+            task_ids = [row['id'] for row in cursor.fetchall()]
+            if not task_ids:
+                conn.commit()
+                return []
+
+            placeholders = ", ".join(["%s"] * len(task_ids))
+            cursor.execute(
+                f"""
+                UPDATE crawl_frontier
+                SET state = 'leased', lease_owner = %s, attempts = attempts + 1,
+                    lease_expires_at = NOW(3) + INTERVAL %s SECOND
+                WHERE id IN ({placeholders})
+                """,
+                (worker_id, lease_seconds, *task_ids)
+            )
+            cursor.execute(
+                f"""
+                SELECT id, run_id, task_type, payload, attempts, max_attempts
+                FROM crawl_frontier WHERE id IN ({placeholders})
+                ORDER BY priority DESC, id
+                """,
+                tuple(task_ids)
+            )
+            tasks = cursor.fetchall()
+            conn.commit()
+            for task in tasks:
+                task['payload'] = _load_payload(task['payload'])
+            return tasks
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"租用爬取任務時發生錯誤: {e}")
+            return []
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def renew_leases(self, worker_id, task_ids, lease_seconds=LEASE_SECONDS):
+        """延長仍持有的租約，避免處理較慢的批次被其他 worker 收回重複執行"""
+        if not task_ids:
+            return 0
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            placeholders = ", ".join(["%s"] * len(task_ids))
+            cursor.execute(
+                f"""
+                UPDATE crawl_frontier SET lease_expires_at = NOW(3) + INTERVAL %s SECOND
+                WHERE id IN ({placeholders}) AND state = 'leased' AND lease_owner = %s
+                """,
+                (lease_seconds, *task_ids, worker_id)
+            )
+            renewed = cursor.rowcount
+            conn.commit()
+            return renewed
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"延長爬取任務租約時發生錯誤: {e}")
+            return 0
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def complete(self, worker_id, task_id):
+        """標記任務完成；租約已被收回時回傳 False"""
+        return self._finish(
+            """
+            UPDATE crawl_frontier
+            SET state = 'done', lease_owner = NULL, lease_expires_at = NULL, last_error = NULL
+            WHERE id = %s AND state = 'leased' AND lease_owner = %s
+            """,
+            (task_id, worker_id)
+        )
+
+    def fail(self, worker_id, task_id, error, retry_delay):
+        """任務失敗：嘗試次數未用完時延後重新排入佇列，否則標記為 failed"""
+        return self._finish(
+            """
+            UPDATE crawl_frontier
+            SET state = IF(attempts >= max_attempts, 'failed', 'pending'),
+                available_at = NOW(3) + INTERVAL %s SECOND,
+                lease_owner = NULL, lease_expires_at = NULL, last_error = %s
+            WHERE id = %s AND state = 'leased' AND lease_owner = %s
+            """,
+            (retry_delay, str(error)[:500], task_id, worker_id)
+        )
+
+    def release(self, worker_id, task_id, delay):
+        """歸還任務且不計入嘗試次數（例如目標網站的斷路器開啟中）"""
+        return self._finish(
+            """
+            UPDATE crawl_frontier
+            SET state = 'pending', attempts = GREATEST(attempts, 1) - 1,
+                available_at = NOW(3) + INTERVAL %s SECOND,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = %s AND state = 'leased' AND lease_owner = %s
+            """,
+            (delay, task_id, worker_id)
+        )
+
+    def _finish(self, query, params):
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            updated = cursor.rowcount == 1
+            conn.commit()
+            return updated
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"更新爬取任務狀態時發生錯誤: {e}")
+            return False
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def reclaim_expired_leases(self):
+        """收回租約已到期的任務（worker 當掉或失聯），嘗試次數用完的標記為 failed"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE crawl_frontier
+                SET state = IF(attempts >= max_attempts, 'failed', 'pending'),
+                    last_error = 'lease expired', lease_owner = NULL, lease_expires_at = NULL
+                WHERE state = 'leased' AND lease_expires_at < NOW(3)
+            """)
+            reclaimed = cursor.rowcount
+            conn.commit()
+            if reclaimed:
+                print(f"[frontier] 收回 {reclaimed} 個租約已到期的任務。")
+            return reclaimed
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"收回過期租約時發生錯誤: {e}")
+            return 0
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_status(self, run_id=None):
+        """回傳 {run_id: {state: 任務數}}"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            query = "SELECT run_id, state, COUNT(*) FROM crawl_frontier"
+            params = ()
+            if run_id:
+                query += " WHERE run_id = %s"
+                params = (run_id,)
+            cursor.execute(query + " GROUP BY run_id, state ORDER BY run_id", params)
+            status = {}
+            for run, state, count in cursor.fetchall():
+                status.setdefault(run, {})[state] = count
+            return status
+        except Error as e:
+            print(f"查詢爬取佇列狀態時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def count_unfinished(self, run_id=None):
+        """尚未完成（pending 或 leased）的任務數，查詢失敗時回傳 None"""
+        status = self.get_status(run_id)
+        if status is None:
+            return None
+        return sum(states.get('pending', 0) + states.get('leased', 0) for states in status.values())
+
+    def delete_run(self, run_id):
+        """刪除某一輪爬取的所有任務"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM crawl_frontier WHERE run_id = %s", (run_id,))
+            deleted = cursor.rowcount
+            conn.commit()
+            return deleted
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"刪除爬取任務時發生錯誤: {e}")
+            return 0
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+
+    def purge_finished_runs(self, days=RUN_RETENTION_DAYS):
+        """
+        刪除沒有未完成任務（pending / leased）、且最後一次變動在 days 天前的爬取輪次，回傳刪除的任務數。
+        逐輪以 delete_run 刪除，每輪一個交易，不會長時間鎖住仍在進行的輪次。
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT run_id FROM crawl_frontier
+                GROUP BY run_id
+                HAVING SUM(state IN ('pending', 'leased')) = 0 AND MAX(updated_at) < NOW() - INTERVAL %s DAY
+            """, (days,))
+            run_ids = [row[0] for row in cursor.fetchall()]
+        except Error as e:
+            print(f"查詢已結束的爬取輪次時發生錯誤: {e}")
+            return 0
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+        deleted = sum(self.delete_run(run_id) for run_id in run_ids)
+        if run_ids:
+            print(f"[frontier] 刪除 {len(run_ids)} 輪已結束超過 {days} 天的爬取任務，共 {deleted} 筆。")
+        return deleted
+
+
+class SharedRateController(rate_control.AdaptiveRateController):
+    """
+    跨行程共用的 AIMD 速率控制器。速率與下一個可送出請求的時間點存放在 crawl_rate_budget 表，
+    每個請求以一個短交易預約時間點，所有節點上的 worker 對同一主機的請求合計不超過共用的速率；
+    時間以資料庫的 NOW(6) 為準，不受各機器時鐘誤差影響。錯誤率仍由各行程自行統計。
+    資料庫暫時無法使用時，退回本行程的速率控制。
+    """
+    def __init__(self, host, pool, **options):
+        super().__init__(**options)
+        self.host = host
+        self.pool = pool
+        self._transaction(lambda cursor: cursor.execute(
+            "INSERT IGNORE INTO crawl_rate_budget (host, rate) VALUES (%s, %s)", (host, self.rate)
+        ))
+
+    def _transaction(self, work):
+        """在交易中執行 work(cursor) 並回傳其結果；資料庫錯誤時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            result = work(cursor)
+            conn.commit()
+            return True if result is None else result
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"[frontier] 共用速率預算無法使用，改用本行程的速率控制: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def acquire(self):
+        """向共用預算預約下一個時間點並等待；預約只鎖住該主機的一列，時間很短"""
+        def reserve(cursor):
+            cursor.execute("""
+                SELECT rate, TIMESTAMPDIFF(MICROSECOND, NOW(6), GREATEST(next_slot, blocked_until, NOW(6)))
+                FROM crawl_rate_budget WHERE host = %s FOR UPDATE
+            """, (self.host,))
+            rows = cursor.fetchall()
+            if not rows:
+                return False
+            rate = min(self.max_rate, max(self.min_rate, rows[0][0]))
+            wait_us = rows[0][1]
+            cursor.execute(
+                "UPDATE crawl_rate_budget SET next_slot = NOW(6) + INTERVAL %s MICROSECOND WHERE host = %s",
+                (int(wait_us + 1000000 / rate), self.host)
+            )
+            return rate, wait_us / 1000000
+
+        reserved = self._transaction(reserve)
+        if not reserved:
+            return super().acquire()
+        rate, delay = reserved
+        with self._lock:
+            self.rate = rate
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self, latency):
+        """請求成功：延遲與本行程的錯誤率都健康時，線性提高共用速率"""
+        with self._lock:
+            self._outcomes.append(False)
+            healthy = latency <= self.latency_target and self._error_rate() <= self.error_threshold
+        if healthy and self._transaction(lambda cursor: cursor.execute(
+            "UPDATE crawl_rate_budget SET rate = LEAST(%s, rate + %s) WHERE host = %s",
+            (self.max_rate, self.increase_step, self.host)
+        )) is None:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after=None):
+        """
+        遇到節流：乘法降低共用速率（decrease_cooldown 秒內只降一次，避免多個 worker 對同一波節流重複降速），
+        並讓所有 worker 在 Retry-After 期間暫停。
+        """
+        def decrease(cursor):
+            # UPDATE 的賦值由左至右進行，next_slot 先以降速後的速率計算，再更新 rate
+            cursor.execute("""
+                UPDATE crawl_rate_budget
+                SET next_slot = GREATEST(next_slot, NOW(6) + INTERVAL ROUND(1000000 / GREATEST(%s, rate * %s)) MICROSECOND),
+                    rate = GREATEST(%s, rate * %s),
+                    last_decrease = NOW(6)
+                WHERE host = %s AND (last_decrease IS NULL OR last_decrease < NOW(6) - INTERVAL %s MICROSECOND)
+            """, (self.min_rate, self.decrease_factor, self.min_rate, self.decrease_factor,
+                  self.host, int(self.decrease_cooldown * 1000000)))
+            if retry_after:
+                cursor.execute("""
+                    UPDATE crawl_rate_budget
+                    SET blocked_until = GREATEST(blocked_until, NOW(6) + INTERVAL %s MICROSECOND)
+                    WHERE host = %s
+                """, (int(retry_after * 1000000), self.host))
+
+        if self._transaction(decrease) is None:
+            super().on_throttle(retry_after)
+            return
+        with self._lock:
+            self._outcomes.append(True)
+
+
+_frontier = None
+
+
+def get_frontier() -> _Frontier:
+    global _frontier
+    if _frontier is None:
+        _frontier = _Frontier(database.get_db().pool)
+    return _frontier
+
+
+# --- 任務建立 ---
+def default_run_id():
+    """預設每天一輪：同一天重複 seed 不會重複抓取，隔天則重新爬取"""
+    return date.today().isoformat()
+
+
+def seed(keyword='AI 工程師', page_limit=2, run_id=None):
+    """
+    為關鍵字的每一頁列表建立任務（各頁可由不同 worker 同時抓取），回傳新增的任務數。
+    建立前先刪除已結束超過 RUN_RETENTION_DAYS 天的輪次。
+    """
+    run_id = run_id or default_run_id()
+    get_frontier().purge_finished_runs()
+    tasks = [
+        (TASK_LIST, f"{keyword}|{page}", {'keyword': keyword, 'page': page}, PRIORITY_LIST)
+        for page in range(1, page_limit + 1)
+    ]
+    inserted = get_frontier().enqueue(run_id, tasks)
+    print(f"[frontier] 第 {run_id} 輪：關鍵字「{keyword}」新增 {inserted} 個列表頁任務。")
+    return inserted
+
+
+# --- worker ---
+def _process_task(task, session, config, store):
+    """執行單一任務；失敗時拋出例外，由呼叫端決定重試"""
+    payload = task['payload']
+    if task['task_type'] == TASK_LIST:
+        jobs = scraper.fetch_104_list_page(session, config, payload['keyword'], payload['page'])
+        detail_tasks = []
+        for job in jobs:
+            job_url = scraper.job_url_from_listing(job, config)
+            detail_tasks.append((TASK_DETAIL, job_url, {'job': job, 'job_url': job_url}, PRIORITY_DETAIL))
+        inserted = get_frontier().enqueue(task['run_id'], detail_tasks)
+        print(f"[frontier] 列表第 {payload['page']} 頁找到 {len(jobs)} 個職缺，新增 {inserted} 個職缺頁任務。")
+    elif task['task_type'] == TASK_DETAIL:
+        job_description = scraper.fetch_104_description(session, config, payload['job_url'])
+        job_data = scraper.build_104_job_data(payload['job'], payload['job_url'], job_description)
+        if not store(job_data):
+            raise RuntimeError(f"寫入職缺 {payload['job_url']} 失敗")
+    else:
+        raise ValueError(f"未知的任務類型: {task['task_type']}")
+
+
+def run_worker(worker_id=None, config=None, batch_size=5, lease_seconds=LEASE_SECONDS,
+               forever=False, run_id=None, store=None, rate_options=None):
+    """
+    持續租用並執行任務。forever 為 False 時，佇列中沒有未完成的任務就結束。
+    store 預設為 database.add_job；rate_options 用來調整目標主機的速率控制參數
+    （速率本身存放在資料庫中，由所有 worker 共用）。
+    佇列中暫時沒有可租用的任務、且本 worker 在上次比對後又完成了任務時，以新變動的職缺比對儲存的搜尋；
+    完成最後一個任務的 worker 一定會比對到該輪所有的變動。
+    回傳本 worker 完成的任務數。
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    config = config or scraper.TARGET_CONFIG['104']
+    store = store or database.add_job
+
+    frontier = get_frontier()
+    # 列表 API 與職缺頁在同一個主機上，共用同一份跨行程的速率預算
+    host = urlparse(config['api_url']).netloc
+    rate_control.configure(
+        config['api_url'], controller=SharedRateController(host, frontier.pool, **(rate_options or {}))
+    )
+    session = requests.Session()
+    completed = 0
+    evaluated = 0
+    last_reclaim = 0.0
+    print(f"[frontier] worker {worker_id} 啟動。")
+
+    while True:
+        now = time.monotonic()
+        if now - last_reclaim >= RECLAIM_INTERVAL:
+            frontier.reclaim_expired_leases()
+            last_reclaim = now
+
+        tasks = frontier.claim_batch(worker_id, batch_size, lease_seconds, run_id)
+        if not tasks:
+            if completed > evaluated:
+                _evaluate_saved_searches()
+                evaluated = completed
+            unfinished = frontier.count_unfinished(run_id)
+            if not forever and unfinished == 0:
+                break
+            if unfinished:
+                # 其他 worker 持有的租約可能已過期，等待時順便檢查
+                frontier.reclaim_expired_leases()
+                last_reclaim = time.monotonic()
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        lease_deadline = time.monotonic() + lease_seconds
+        for index, task in enumerate(tasks):
+            if lease_deadline - time.monotonic() < lease_seconds / 2:
+                frontier.renew_leases(worker_id, [t['id'] for t in tasks[index:]], lease_seconds)
+                lease_deadline = time.monotonic() + lease_seconds
+            try:
+                _process_task(task, session, config, store)
+            except rate_control.CircuitOpenError as e:
+                # 目標網站持續錯誤：歸還剩餘任務，等斷路器冷卻後再繼續
+                _, breaker = rate_control.get_controller(config['api_url'])
+                print(f"[frontier] 104 持續回應錯誤，暫停 {breaker.reset_timeout} 秒: {e}")
+                for pending in tasks[index:]:
+                    frontier.release(worker_id, pending['id'], breaker.reset_timeout)
+                time.sleep(breaker.reset_timeout)
+                break
+            except Exception as e:
+                retry_delay = rate_control.backoff_delay(task['attempts'], base=5.0, cap=300.0)
+                print(f"[frontier] 任務 {task['id']} ({task['task_type']}) 第 {task['attempts']} 次執行失敗: {e}")
+                frontier.fail(worker_id, task['id'], e, retry_delay)
+                continue
+            if frontier.complete(worker_id, task['id']):
+                completed += 1
+
+    print(f"[frontier] worker {worker_id} 結束，共完成 {completed} 個任務。")
+    return completed
+
+
+def _evaluate_saved_searches():
+    """以新變動的職缺比對儲存的搜尋（失敗只記錄，不中斷 worker）"""
+    try:
+        saved_searches.evaluate()
+    except Exception as e:
+        print(f"[frontier] 比對儲存的搜尋時發生錯誤: {e}")
+
+
+def run_workers(processes=2, **worker_options):
+    """在本機啟動多個 worker 行程並等待結束（以 spawn 啟動，各行程建立自己的連接池）"""
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=run_worker, kwargs=worker_options, name=f"crawl-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def crawl(keyword='AI 工程師', page_limit=2, run_id=None, **worker_options):
+    """建立本輪任務並以目前行程一起消化佇列（其他節點的 worker 可同時加入）"""
+    seed(keyword, page_limit, run_id)
+    return run_worker(**worker_options)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='分散式爬取佇列')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='建立列表頁任務')
+    seed_parser.add_argument('--keyword', default='AI 工程師')
+    seed_parser.add_argument('--pages', type=int, default=2)
+    seed_parser.add_argument('--run-id')
+
+    work_parser = subparsers.add_parser('work', help='啟動 worker 行程')
+    work_parser.add_argument('--processes', type=int, default=1)
+    work_parser.add_argument('--batch-size', type=int, default=5)
+    work_parser.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS)
+    work_parser.add_argument('--forever', action='store_true', help='佇列清空後繼續等待新任務')
+
+    status_parser = subparsers.add_parser('status', help='顯示各輪任務狀態')
+    status_parser.add_argument('--run-id')
+
+    purge_parser = subparsers.add_parser('purge', help='刪除已結束超過指定天數的爬取輪次')
+    purge_parser.add_argument('--days', type=int, default=RUN_RETENTION_DAYS)
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.keyword, args.pages, args.run_id)
+    elif args.command == 'work':
+        options = {'batch_size': args.batch_size, 'lease_seconds': args.lease_seconds, 'forever': args.forever}
+        if args.processes > 1:
+            run_workers(args.processes, **options)
+        else:
+            run_worker(**options)
+    elif args.command == 'purge':
+        get_frontier().purge_finished_runs(args.days)
+    else:
+        for run, states in (get_frontier().get_status(args.run_id) or {}).items():
+            print(run, ', '.join(f"{state}={count}" for state, count in sorted(states.items())))
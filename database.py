@@ -3,7 +3,7 @@
 
 本模組負責處理所有與 MySQL 資料庫的互動。
 功能包括：
-1. 管理資料庫連接池，提供穩定高效的連線。
+1. 管理資料庫連接池，提供穩定高效的連線（第一次使用時才建立，匯入本模組不會連線）。
 2. 初始化資料庫，確保 'jobs' 資料表存在且結構完整。
 3. 封裝所有對 'jobs' 資料表的 CRUD 操作，並提供模組級別的函式供外部調用。
 """
@@ -12,12 +12,61 @@ import mysql.connector
 from mysql.connector import Error
 from mysql.connector.pooling import MySQLConnectionPool
 import os
+import json
+import threading
+import unicodedata
 from dotenv import load_dotenv
 from datetime import datetime
+import minhash_lsh
+import job_fields
+import skill_taxonomy
 
 # 載入環境變數
 load_dotenv()
 
+# 篩選介面提供計數的分類 (facet)：facet 名稱 -> jobs 資料表欄位
+FACET_COLUMNS = {
+    'status': 'status',
+    'county': 'county',
+    'industry': 'industry',
+    'experience': 'experience',
+    'source_website': 'source_website',
+}
+# 每個 facet 最多回傳的值數量（依計數排序）
+FACET_VALUE_LIMIT = 30
+# add_job 遇到死結 (1213) 或鎖等待逾時 (1205) 時的最多嘗試次數
+RETRYABLE_LOCK_ERRORS = {1205, 1213}
+ADD_JOB_RETRIES = 3
+DUPLICATE_KEY_ERROR = 1062
+# metadata 中記錄已入庫職缺是以哪一版技能字典標記的
+SKILL_TAXONOMY_KEY = 'skill_taxonomy_version'
+
+
+def collation_key(value: str) -> str:
+    """
+    近似 MySQL utf8mb4_0900_ai_ci 定序的比較鍵：不分大小寫、不分重音，全形英數字與半形相同。
+    記憶體中的比對（讀取模型、技能條件去重）以此模擬 SQL 的 = 與 LIKE。
+    """
+    if unicodedata.is_normalized('NFKD', value):
+        # 大部分的 JD（中文與不含重音的英文）不需要分解，直接 casefold
+        return value.casefold()
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def escape_like(value: str) -> str:
+    """跳脫 LIKE 的萬用字元，讓關鍵字中的 %、_ 與 \\ 當成一般字元比對"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def unique_skills(skills):
+    """依定序去除重複的技能條件（'Python' 與 'python' 在資料表中相等，只算一個），回傳排序後的列表"""
+    unique = {}
+    for skill in skills:
+        unique.setdefault(collation_key(skill), skill)
+    return sorted(unique.values())
+
+
 class _Database:
     """
     私有類別，管理資料庫底層連線與操作。
@@ -33,6 +82,8 @@ class _Database:
         self.pool = None
         self._init_pool()
         self._init_table()
+        self._check_skill_taxonomy()
+        self._check_job_clusters()
         print("資料庫模組初始化完成。")
 
     def _init_pool(self):
@@ -71,11 +122,163 @@ class _Database:
                     industry VARCHAR(255),
                     job_description TEXT,
                     status VARCHAR(20) DEFAULT 'unfollowed',
+                    cluster_id INT,
+                    salary_min INT,
+                    salary_max INT,
+                    salary_period VARCHAR(16),
+                    exp_min_years TINYINT UNSIGNED,
+                    exp_max_years TINYINT UNSIGNED,
+                    county VARCHAR(10),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    INDEX idx_cluster_id (cluster_id),
+                    INDEX idx_salary_min (salary_min),
+                    INDEX idx_salary_max (salary_max),
+                    INDEX idx_exp_min_years (exp_min_years),
+                    INDEX idx_county (county),
+                    INDEX idx_updated_at (updated_at)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             """)
-            
+
+            # 舊版資料表沒有 cluster_id 欄位，在此補上
+            self._ensure_column(cursor, 'jobs', 'cluster_id', 'INT')
+            self._ensure_index(cursor, 'jobs', 'idx_cluster_id', 'cluster_id')
+
+            # 結構化的薪資（月薪，新台幣）與經歷年資欄位，供範圍篩選使用
+            for column, definition in (('salary_min', 'INT'), ('salary_max', 'INT'),
+                                       ('salary_period', 'VARCHAR(16)'),
+                                       ('exp_min_years', 'TINYINT UNSIGNED'),
+                                       ('exp_max_years', 'TINYINT UNSIGNED'),
+                                       ('county', 'VARCHAR(10)')):
+                self._ensure_column(cursor, 'jobs', column, definition)
+            self._ensure_index(cursor, 'jobs', 'idx_salary_min', 'salary_min')
+            self._ensure_index(cursor, 'jobs', 'idx_salary_max', 'salary_max')
+            self._ensure_index(cursor, 'jobs', 'idx_exp_min_years', 'exp_min_years')
+            self._ensure_index(cursor, 'jobs', 'idx_county', 'county')
+            # 讀取模型與儲存搜尋以 updated_at 增量讀取變動的職缺
+            self._ensure_index(cursor, 'jobs', 'idx_updated_at', 'updated_at')
+            self._backfill_structured_fields(cursor)
+
+            # 篩選 facet 的計數表，由 add_job / update_job_status 增量維護，並定期全量校正
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_facet_counts (
+                    facet VARCHAR(32) NOT NULL,
+                    facet_value VARCHAR(255) NOT NULL,
+                    job_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (facet, facet_value)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            cursor.execute("SELECT COUNT(*) FROM job_facet_counts")
+            if cursor.fetchall()[0][0] == 0:
+                self._rebuild_facet_counts(cursor)
+
+            # 近似重複偵測：每筆職缺的 MinHash 簽章與 LSH band 雜湊值
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_signatures (
+                    job_id INT PRIMARY KEY,
+                    signature VARBINARY(1024) NOT NULL
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_lsh_bands (
+                    band TINYINT UNSIGNED NOT NULL,
+                    band_hash INT UNSIGNED NOT NULL,
+                    job_id INT NOT NULL,
+                    PRIMARY KEY (band, band_hash, job_id),
+                    INDEX idx_lsh_job_id (job_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
+            # 技能標籤：由 skill_taxonomy 在寫入時從職稱與 JD 擷取
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_skills (
+                    job_id INT NOT NULL,
+                    skill VARCHAR(64) NOT NULL,
+                    PRIMARY KEY (job_id, skill),
+                    INDEX idx_skill_job (skill, job_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
+            # 爬取佇列：列表頁與職缺頁任務，由 crawl_frontier 的 worker 以 SKIP LOCKED 租用
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    task_key CHAR(40) NOT NULL,
+                    run_id VARCHAR(32) NOT NULL,
+                    task_type VARCHAR(10) NOT NULL,
+                    payload JSON NOT NULL,
+                    priority SMALLINT NOT NULL DEFAULT 0,
+                    state VARCHAR(10) NOT NULL DEFAULT 'pending',
+                    attempts TINYINT UNSIGNED NOT NULL DEFAULT 0,
+                    max_attempts TINYINT UNSIGNED NOT NULL DEFAULT 5,
+                    available_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+                    lease_owner VARCHAR(64),
+                    lease_expires_at DATETIME(3),
+                    last_error VARCHAR(500),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uk_task_key (task_key),
+                    INDEX idx_claim (state, priority DESC, id),
+                    INDEX idx_lease (state, lease_expires_at),
+                    INDEX idx_run_state (run_id, state)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            # 爬取速率預算：所有節點的 worker 對同一主機共用一個 AIMD 速率與下一個可送出請求的時間點
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_rate_budget (
+                    host VARCHAR(255) PRIMARY KEY,
+                    rate DOUBLE NOT NULL,
+                    next_slot DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+                    blocked_until DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+                    last_decrease DATETIME(6)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
+            # AI 分析工作佇列：由 match_queue 使用，讓多個 Web 行程共用工作狀態、額度與佇列上限
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS match_tasks (
+                    task_id CHAR(32) PRIMARY KEY,
+                    job_id INT NOT NULL,
+                    client_id VARCHAR(64) NOT NULL,
+                    priority TINYINT NOT NULL,
+                    status VARCHAR(10) NOT NULL,
+                    attempts TINYINT UNSIGNED NOT NULL DEFAULT 0,
+                    job_description MEDIUMTEXT,
+                    resume_text MEDIUMTEXT,
+                    result JSON,
+                    worker VARCHAR(100),
+                    submitted_at DATETIME(3) NOT NULL,
+                    started_at DATETIME(3),
+                    finished_at DATETIME(3),
+                    lease_expires_at DATETIME(3),
+                    INDEX idx_match_claim (status, priority, submitted_at),
+                    INDEX idx_match_client (client_id, status),
+                    INDEX idx_match_finished (finished_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            # 租約到期的工作重新排隊時，以執行次數限制重試
+            self._ensure_column(cursor, 'match_tasks', 'attempts', 'TINYINT UNSIGNED NOT NULL DEFAULT 0')
+
+            # 儲存的搜尋（篩選條件與 get_all_jobs 相同）與每個搜尋的新符合職缺收件匣
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS saved_searches (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL,
+                    filters JSON NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS saved_search_matches (
+                    search_id INT NOT NULL,
+                    job_id INT NOT NULL,
+                    matched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    seen TINYINT(1) NOT NULL DEFAULT 0,
+                    PRIMARY KEY (search_id, job_id),
+                    INDEX idx_inbox (search_id, seen, matched_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """)
+
             # 創建 metadata 表來儲存最後更新時間
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS metadata (
@@ -94,6 +297,83 @@ class _Database:
                 cursor.close()
                 conn.close()
 
+    def _ensure_column(self, cursor, table, column, definition):
+        """內部函式，欄位不存在時才以 ALTER TABLE 新增（讓舊資料表也能升級）"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (table, column))
+        if cursor.fetchall()[0][0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _ensure_index(self, cursor, table, index, columns):
+        """內部函式，索引不存在時才建立"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (table, index))
+        if cursor.fetchall()[0][0] == 0:
+            cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+
+    def _backfill_structured_fields(self, cursor):
+        """
+        內部函式，為尚未解析的舊職缺補上薪資、經歷與縣市欄位。
+        salary_period 或 county 為 NULL 代表該筆尚未解析（解析後一律為非 NULL 值）。
+        """
+        cursor.execute("""
+            SELECT id, salary_range, experience, location FROM jobs
+            WHERE salary_period IS NULL OR county IS NULL
+        """)
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        updates = []
+        for job_id, salary_range, experience, location in rows:
+            fields = job_fields.structured_fields(
+                {'salary_range': salary_range, 'experience': experience, 'location': location}
+            )
+            updates.append((
+                fields['salary_min'], fields['salary_max'], fields['salary_period'],
+                fields['exp_min_years'], fields['exp_max_years'], fields['county'], job_id
+            ))
+        cursor.executemany("""
+            UPDATE jobs SET salary_min = %s, salary_max = %s, salary_period = %s,
+                exp_min_years = %s, exp_max_years = %s, county = %s
+            WHERE id = %s
+        """, updates)
+        print(f"已為 {len(updates)} 筆舊職缺補上薪資、經歷與縣市欄位。")
+
+    def _rebuild_facet_counts(self, cursor):
+        """內部函式，以 GROUP BY 全量重算 facet 計數表"""
+        cursor.execute("DELETE FROM job_facet_counts")
+        selects = " UNION ALL ".join(
+            f"SELECT '{facet}', COALESCE({column}, ''), COUNT(*) FROM jobs GROUP BY COALESCE({column}, '')"
+            for facet, column in FACET_COLUMNS.items()
+        )
+        cursor.execute(f"INSERT INTO job_facet_counts (facet, facet_value, job_count) {selects}")
+
+    def _apply_facet_delta(self, cursor, old_values, new_values):
+        """
+        內部函式，依職缺新舊的 facet 值增減計數。
+        old_values 為 None 代表新職缺；兩者皆為 {facet: value} 字典。
+        """
+        deltas = {}
+        for facet in FACET_COLUMNS:
+            old = (old_values or {}).get(facet) or ''
+            new = new_values.get(facet) or ''
+            if old_values is not None and old == new:
+                continue
+            if old_values is not None:
+                deltas[(facet, old)] = deltas.get((facet, old), 0) - 1
+            deltas[(facet, new)] = deltas.get((facet, new), 0) + 1
+        if not deltas:
+            return
+        # 依主鍵排序後更新，所有交易以相同順序鎖定計數列，避免互相死結
+        cursor.executemany("""
+            INSERT INTO job_facet_counts (facet, facet_value, job_count) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE job_count = job_count + VALUES(job_count)
+        """, [(facet, value, delta) for (facet, value), delta in sorted(deltas.items()) if delta])
+
     def _update_last_update_time(self, cursor):
         """內部函式，用於更新最後更新時間"""
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -103,107 +383,502 @@ class _Database:
             ON DUPLICATE KEY UPDATE meta_value = %s
         """, (now, now))
 
+    def _bump_data_version(self, cursor):
+        """內部函式，職缺資料變動時遞增資料版本，讓記憶體中的讀取模型知道需要更新"""
+        cursor.execute("""
+            INSERT INTO metadata (meta_key, meta_value)
+            VALUES ('data_version', '1')
+            ON DUPLICATE KEY UPDATE meta_value = CAST(meta_value AS UNSIGNED) + 1
+        """)
+
     def add_job(self, job_data: dict):
         """
-        【重構後】使用 INSERT ... ON DUPLICATE KEY UPDATE 新增或更新職缺。
-        這種方式更簡潔、高效，且能保證資料的原子性。
+        新增或更新職缺（以 job_url 判斷是否已存在）。
+        交易以 READ COMMITTED 執行：查不到的 job_url 不會留下間隙鎖，多個爬蟲行程同時寫入
+        不同的新職缺時不會互相死結。已存在的職缺才以 FOR UPDATE 鎖定該列並比對 facet 的新舊值；
+        計數表與 metadata 這些所有寫入共用的熱點列放在交易最後才更新，縮短持有鎖的時間。
+        偶發的死結或鎖等待逾時會重試數次。
         """
+        # 寫入前先將薪資與經歷文字解析為數值欄位
+        fields = job_fields.structured_fields(job_data)
+        values = {
+            'title': job_data.get('title'),
+            'company': job_data.get('company'),
+            'location': job_data.get('location'),
+            'experience': job_data.get('experience'),
+            'education': job_data.get('education'),
+            'salary_range': job_data.get('salary_range'),
+            'source_website': job_data.get('source_website'),
+            'posting_date': job_data.get('posting_date'),
+            'industry': job_data.get('industry'),
+            'job_description': job_data.get('job_description'),
+            **fields,
+        }
+
+        for attempt in range(ADD_JOB_RETRIES):
+            try:
+                return self._add_job_once(job_data, values, fields)
+            except Error as e:
+                if e.errno in RETRYABLE_LOCK_ERRORS and attempt < ADD_JOB_RETRIES - 1:
+                    print(f"寫入職缺 '{job_data.get('title', 'N/A')}' 時發生鎖衝突 ({e.errno})，重試中...")
+                    continue
+                print(f"處理職缺 '{job_data.get('title', 'N/A')}' 時發生錯誤: {e}")
+                return False
+        return False
+
+    def _add_job_once(self, job_data, values, fields):
+        """內部函式，執行一次 add_job 的交易；資料庫錯誤會回滾後拋出，由 add_job 決定是否重試"""
         conn = None
         cursor = None
-        
-        # SQL 語句：如果 job_url 已存在，則更新指定欄位；否則，插入新的一筆。
-        # 這樣就不用先 SELECT 再決定要 INSERT 或 UPDATE，一次搞定。
-        query = """
-            INSERT INTO jobs (
-                job_url, title, company, location, experience, education,
-                salary_range, source_website, posting_date, industry, job_description
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                title = VALUES(title),
-                company = VALUES(company),
-                location = VALUES(location),
-                experience = VALUES(experience),
-                education = VALUES(education),
-                salary_range = VALUES(salary_range),
-                source_website = VALUES(source_website),
-                posting_date = VALUES(posting_date),
-                industry = VALUES(industry),
-                job_description = VALUES(job_description),
-                updated_at = CURRENT_TIMESTAMP;
-        """
-        
-        # 準備要插入/更新的資料元組 (tuple)，順序必須與 INSERT 的欄位完全對應
-        params = (
-            job_data.get('job_url'),
-            job_data.get('title'),
-            job_data.get('company'),
-            job_data.get('location'),
-            job_data.get('experience'),
-            job_data.get('education'),
-            job_data.get('salary_range'),
-            job_data.get('source_website'),
-            job_data.get('posting_date'),
-            job_data.get('industry'),
-            job_data.get('job_description')
-        )
-        
+        job_url = job_data.get('job_url')
+        facet_select = ", ".join(FACET_COLUMNS.values())
+        job_id = None
         try:
             conn = self.pool.get_connection()
+            conn.start_transaction(isolation_level='READ COMMITTED')
             cursor = conn.cursor()
+
+            # 已存在的職缺：鎖定該列並讀取舊的 facet 值，以便增量更新計數
+            cursor.execute(f"SELECT id, {facet_select} FROM jobs WHERE job_url = %s FOR UPDATE", (job_url,))
+            existing = cursor.fetchall()
+            if not existing:
+                columns = ['job_url'] + list(values)
+                try:
+                    cursor.execute(
+                        f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                        (job_url, *values.values())
+                    )
+                    job_id = cursor.lastrowid
+                    old_facets = None
+                    print(f"成功 新增 職缺: {job_data.get('title', 'N/A')}")
+                except Error as e:
+                    if e.errno != DUPLICATE_KEY_ERROR:
+                        raise
+                    # 另一個行程剛好先寫入同一個 job_url，改走更新流程
+                    cursor.execute(f"SELECT id, {facet_select} FROM jobs WHERE job_url = %s FOR UPDATE", (job_url,))
+                    existing = cursor.fetchall()
+
+            if existing:
+                job_id = existing[0][0]
+                old_facets = dict(zip(FACET_COLUMNS, existing[0][1:]))
+                assignments = ", ".join(f"{column} = %s" for column in values)
+                cursor.execute(
+                    f"UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                    (*values.values(), job_id)
+                )
+                print(f"成功 更新 職缺: {job_data.get('title', 'N/A')}")
+
+            if job_id is None:
+                # 插入時重複但又讀不到該列（例如同時被刪除），本次不寫入
+                conn.rollback()
+                return False
+
+            self._assign_cluster(cursor, job_id, minhash_lsh.dedupe_text(job_data))
+            self._tag_skills(cursor, job_id, job_data)
+
+            new_facets = {
+                'status': old_facets['status'] if old_facets else 'unfollowed',
+                'county': fields['county'],
+                'industry': job_data.get('industry'),
+                'experience': job_data.get('experience'),
+                'source_website': job_data.get('source_website'),
+            }
+            self._apply_facet_delta(cursor, old_facets, new_facets)
             
-            cursor.execute(query, params)
-            
-            # cursor.rowcount 在 INSERT 時返回 1，在 UPDATE 時返回 2，在未變動時返回 0
-            if cursor.rowcount > 0:
-                action = "新增" if cursor.rowcount == 1 else "更新"
-                print(f"成功 {action} 職缺: {job_data.get('title', 'N/A')}")
-            
-            # 不論是新增還是更新，都更新最後操作時間
+            # 不論是新增還是更新，都更新最後操作時間與資料版本
             self._update_last_update_time(cursor)
+            self._bump_data_version(cursor)
             conn.commit()
             return True
 
+        except Error:
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def _assign_cluster(self, cursor, job_id, text):
+        """
+        內部函式，以 MinHash + LSH 為職缺指定 cluster_id。
+        只與共用任一 LSH band 的候選職缺比對，不需掃描整張表。
+        """
+        sig = minhash_lsh.signature(text)
+        sig_bytes = minhash_lsh.signature_to_bytes(sig)
+
+        cursor.execute("SELECT signature FROM job_signatures WHERE job_id = %s", (job_id,))
+        rows = cursor.fetchall()
+        if rows and bytes(rows[0][0]) == sig_bytes:
+            return  # 內容未變動，沿用原本的分群結果
+
+        cursor.execute("DELETE FROM job_lsh_bands WHERE job_id = %s", (job_id,))
+        cursor.execute(
+            "REPLACE INTO job_signatures (job_id, signature) VALUES (%s, %s)",
+            (job_id, sig_bytes)
+        )
+
+        cluster_id = job_id
+        if not minhash_lsh.is_empty_signature(sig):
+            hashes = minhash_lsh.band_hashes(sig)
+            band_conditions = " OR ".join(["(b.band = %s AND b.band_hash = %s)"] * len(hashes))
+            band_params = [value for band, h in enumerate(hashes) for value in (band, h)]
+            cursor.execute(f"""
+                SELECT DISTINCT b.job_id, s.signature, j.cluster_id
+                FROM job_lsh_bands b
+                JOIN job_signatures s ON s.job_id = b.job_id
+                JOIN jobs j ON j.id = b.job_id
+                WHERE ({band_conditions}) AND b.job_id <> %s
+            """, tuple(band_params) + (job_id,))
+
+            candidates = [
+                (other_cluster or other_id, minhash_lsh.signature_from_bytes(bytes(other_sig)))
+                for other_id, other_sig, other_cluster in cursor.fetchall()
+            ]
+            cluster_id = minhash_lsh.best_cluster(sig, candidates) or job_id
+
+            cursor.executemany(
+                "INSERT IGNORE INTO job_lsh_bands (band, band_hash, job_id) VALUES (%s, %s, %s)",
+                [(band, h, job_id) for band, h in enumerate(hashes)]
+            )
+
+        cursor.execute("UPDATE jobs SET cluster_id = %s WHERE id = %s", (cluster_id, job_id))
+
+    def _tag_skills(self, cursor, job_id, job_data):
+        """內部函式，以技能字典標記職缺，並取代原有的技能標籤"""
+        skills = skill_taxonomy.extract_skills(
+            f"{job_data.get('title') or ''}\n{job_data.get('job_description') or ''}"
+        )
+        cursor.execute("DELETE FROM job_skills WHERE job_id = %s", (job_id,))
+        if skills:
+            cursor.executemany(
+                "INSERT INTO job_skills (job_id, skill) VALUES (%s, %s)",
+                [(job_id, skill) for skill in skills]
+            )
+
+    def backfill_job_skills(self, batch_size=500):
+        """
+        以目前的技能字典重新標記所有職缺（技能字典修改後以 python database.py backfill-skills 執行）。
+        依 id 分批處理，每批各自取得連線並提交，不會長時間占用連接池中的連線。
+        只有標籤實際改變的職缺才會改寫 job_skills 並更新 updated_at，讓讀取模型與儲存的搜尋增量讀到。
+        全部完成後記錄字典版本，回傳標籤有變動的職缺數，發生錯誤時回傳 None。
+        """
+        version = skill_taxonomy.dictionary_version()
+        last_id = 0
+        checked = 0
+        retagged = 0
+        while True:
+            result = self._retag_batch(last_id, batch_size)
+            if result is None:
+                return None
+            last_id, batch_checked, batch_retagged = result
+            if not batch_checked:
+                break
+            checked += batch_checked
+            retagged += batch_retagged
+            print(f"已檢查 {checked} 筆職缺的技能標記，{retagged} 筆有變動。")
+        if not self.set_metadata(SKILL_TAXONOMY_KEY, version):
+            return None
+        return retagged
+
+    def _retag_batch(self, after_id, batch_size):
+        """內部函式，重新標記 id 大於 after_id 的下一批職缺，回傳 (最後的 id, 檢查數, 變動數)，錯誤時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT id, title, job_description FROM jobs WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return after_id, 0, 0
+            placeholders = ", ".join(["%s"] * len(rows))
+            cursor.execute(
+                f"SELECT job_id, skill FROM job_skills WHERE job_id IN ({placeholders})",
+                tuple(row['id'] for row in rows)
+            )
+            current = {}
+            for row in cursor.fetchall():
+                current.setdefault(row['job_id'], set()).add(row['skill'])
+
+            changed = []
+            plain_cursor = conn.cursor()
+            for row in rows:
+                skills = skill_taxonomy.extract_skills(f"{row['title'] or ''}\n{row['job_description'] or ''}")
+                if set(skills) != current.get(row['id'], set()):
+                    self._tag_skills(plain_cursor, row['id'], row)
+                    changed.append(row['id'])
+            if changed:
+                placeholders = ", ".join(["%s"] * len(changed))
+                plain_cursor.execute(
+                    f"UPDATE jobs SET updated_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
+                    tuple(changed)
+                )
+                self._bump_data_version(plain_cursor)
+            plain_cursor.close()
+            conn.commit()
+            return rows[-1]['id'], len(rows), len(changed)
         except Error as e:
             if conn:
                 conn.rollback()
-            print(f"處理職缺 '{job_data.get('title', 'N/A')}' 時發生錯誤: {e}")
-            return False
+            print(f"重新標記職缺技能時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def _check_skill_taxonomy(self):
+        """
+        內部函式，技能字典與已入庫職缺標記時的版本不同時提示重新標記。
+        重新標記需要掃描整張表，不在初始化時執行，避免第一個請求阻塞所有請求；
+        資料表中還沒有職缺時直接記錄目前的版本。
+        """
+        try:
+            version = skill_taxonomy.dictionary_version()
+        except (OSError, ValueError) as e:
+            print(f"讀取技能字典時發生錯誤，略過版本檢查: {e}")
+            return
+        if self.get_metadata(SKILL_TAXONOMY_KEY) == version:
+            return
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM jobs)")
+            has_jobs = cursor.fetchall()[0][0]
+        except Error as e:
+            print(f"檢查技能字典版本時發生錯誤: {e}")
+            return
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+        if has_jobs:
+            print("技能字典已變更，已入庫職缺的技能標籤可能過時，請執行 python database.py backfill-skills 重新標記。")
+        else:
+            self.set_metadata(SKILL_TAXONOMY_KEY, version)
+
+    def get_job_skills(self, job_id):
+        """獲取單一職缺的技能標籤"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT skill FROM job_skills WHERE job_id = %s ORDER BY skill", (job_id,))
+            return [row[0] for row in cursor.fetchall()]
+        except Error as e:
+            print(f"獲取職缺 {job_id} 技能標籤時發生錯誤: {e}")
+            return []
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def backfill_job_clusters(self, batch_size=500):
+        """
+        為尚未計算簽章的舊職缺補上 cluster_id（以 python database.py backfill-clusters 執行）。
+        依 id 由小到大分批處理，較早的職缺先成為群代表；每批各自取得連線並提交，
+        並更新 updated_at 讓讀取模型增量讀到新的 cluster_id。回傳處理的職缺數，發生錯誤時回傳 None。
+        """
+        last_id = 0
+        processed = 0
+        while True:
+            result = self._cluster_batch(last_id, batch_size)
+            if result is None:
+                return None
+            last_id, batch_processed = result
+            if not batch_processed:
+                return processed
+            processed += batch_processed
+            print(f"已完成 {processed} 筆職缺的近似重複分群。")
+
+    def _cluster_batch(self, after_id, batch_size):
+        """內部函式，為 id 大於 after_id 且沒有簽章的下一批職缺分群，回傳 (最後的 id, 處理數)，錯誤時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT j.id, j.title, j.company, j.job_description FROM jobs j
+                LEFT JOIN job_signatures s ON s.job_id = j.id
+                WHERE s.job_id IS NULL AND j.id > %s ORDER BY j.id LIMIT %s
+            """, (after_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return after_id, 0
+            plain_cursor = conn.cursor()
+            for row in rows:
+                self._assign_cluster(plain_cursor, row['id'], minhash_lsh.dedupe_text(row))
+            placeholders = ", ".join(["%s"] * len(rows))
+            plain_cursor.execute(
+                f"UPDATE jobs SET updated_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
+                tuple(row['id'] for row in rows)
+            )
+            self._bump_data_version(plain_cursor)
+            plain_cursor.close()
+            conn.commit()
+            return rows[-1]['id'], len(rows)
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"補算職缺分群時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def _check_job_clusters(self):
+        """內部函式，有職缺尚未計算簽章（例如加入分群功能前入庫的資料）時提示補算，不在初始化時執行"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM jobs j LEFT JOIN job_signatures s ON s.job_id = j.id WHERE s.job_id IS NULL
+                )
+            """)
+            missing = cursor.fetchall()[0][0]
+        except Error as e:
+            print(f"檢查職缺分群時發生錯誤: {e}")
+            return
         finally:
             if conn and conn.is_connected():
                 cursor.close()
                 conn.close()
+        if missing:
+            print("部分職缺尚未進行近似重複分群（cluster_id 為空），請執行 python database.py backfill-clusters 補算。")
+
+    def _build_where(self, keyword='', status='', salary_min=None, salary_max=None,
+                     salary_period='', exp_min=None, exp_max=None,
+                     county='', industry='', experience='', source_website='', skills=None):
+        """
+        內部函式，將篩選條件轉為 WHERE 子句與參數。
+        範圍條件皆直接作用在有索引的數值欄位上：
+        - salary_min：職缺的薪資範圍與「至少 salary_min」有交集，即月薪上限（沒有上限時為下限）不低於 salary_min，
+          例如 4 萬～8 萬的職缺符合「至少 5 萬」
+        - salary_max：月薪上限不高於 salary_max
+        - exp_min / exp_max：要求的最少年資介於兩者之間
+        - skills：職缺須同時具備列表中的所有技能（透過 job_skills 的 (skill, job_id) 索引）
+        """
+        query_conditions = []
+        params = []
+
+        if keyword:
+            # 搜尋範圍包含職稱、公司、以及新的職缺描述欄位；關鍵字中的 % 與 _ 視為一般字元
+            pattern = f"%{escape_like(keyword)}%"
+            query_conditions.append("(title LIKE %s OR company LIKE %s OR job_description LIKE %s)")
+            params.extend([pattern, pattern, pattern])
+
+        if status and status != 'all':
+            query_conditions.append("status = %s")
+            params.append(status)
+
+        if salary_min is not None:
+            # 與 COALESCE(salary_max, salary_min) >= X 相同；拆開寫讓優化器仍可使用 salary_max / salary_min 的索引
+            query_conditions.append("(salary_max >= %s OR (salary_max IS NULL AND salary_min >= %s))")
+            params.extend([salary_min, salary_min])
+
+        if salary_max is not None:
+            query_conditions.append("salary_max <= %s")
+            params.append(salary_max)
 
-    def get_all_jobs(self, page=1, limit=10, keyword='', status=''):
-        """根據條件獲取職缺列表（供 API 使用）"""
+        if salary_period:
+            query_conditions.append("salary_period = %s")
+            params.append(salary_period)
+
+        if exp_min is not None:
+            query_conditions.append("exp_min_years >= %s")
+            params.append(exp_min)
+
+        if exp_max is not None:
+            query_conditions.append("exp_min_years <= %s")
+            params.append(exp_max)
+
+        # facet 分類的精確比對
+        for column, value in (('county', county), ('industry', industry),
+                              ('experience', experience), ('source_website', source_website)):
+            if value:
+                query_conditions.append(f"{column} = %s")
+                params.append(value)
+
+        if skills:
+            # 技能比較不分大小寫（資料表定序），'Python' 與 'python' 只算一個條件
+            skills = unique_skills(skills)
+            placeholders = ", ".join(["%s"] * len(skills))
+            query_conditions.append(
+                f"id IN (SELECT job_id FROM job_skills WHERE skill IN ({placeholders}) "
+                f"GROUP BY job_id HAVING COUNT(*) = %s)"
+            )
+            params.extend(skills)
+            params.append(len(skills))
+
+        where_clause = "WHERE " + " AND ".join(query_conditions) if query_conditions else ""
+        return where_clause, params
+
+    def _list_query(self, where_clause, dedupe=False):
+        """
+        內部函式，產生依 (posting_date, id) 排序的職缺查詢（不含 LIMIT）。
+        dedupe=True 時以視窗函式讓每個 cluster 只保留最新的一筆。
+        """
+        if not dedupe:
+            return f"SELECT * FROM jobs {where_clause} ORDER BY posting_date DESC, id DESC"
+        return f"""
+            SELECT * FROM (
+                SELECT jobs.*,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY COALESCE(cluster_id, id) ORDER BY posting_date DESC, id DESC
+                    ) AS cluster_rank,
+                    COUNT(*) OVER (PARTITION BY COALESCE(cluster_id, id)) AS duplicate_count
+                FROM jobs {where_clause}
+            ) ranked
+            WHERE cluster_rank = 1
+            ORDER BY posting_date DESC, id DESC
+        """
+
+    def get_all_jobs(self, page=1, limit=10, keyword='', status='', dedupe=False, **filters):
+        """
+        根據條件獲取職缺列表（供 API 使用）。
+        dedupe=True 時，同一個 cluster 只回傳最新的一筆，並附上 duplicate_count。
+        """
         conn = None
         cursor = None
         try:
             conn = self.pool.get_connection()
             cursor = conn.cursor(dictionary=True) # 回傳結果為字典
             
-            query_conditions = []
-            params = []
-            
-            if keyword:
-                # 搜尋範圍包含職稱、公司、以及新的職缺描述欄位
-                query_conditions.append("(title LIKE %s OR company LIKE %s OR job_description LIKE %s)")
-                params.extend([f"%{keyword}%", f"%{keyword}%", f"%{keyword}%"])
-            
-            if status and status != 'all':
-                query_conditions.append("status = %s")
-                params.append(status)
+            where_clause, params = self._build_where(keyword, status, **filters)
+            offset = (page - 1) * limit
 
-            where_clause = "WHERE " + " AND ".join(query_conditions) if query_conditions else ""
-            
-            cursor.execute(f"SELECT COUNT(*) as total FROM jobs {where_clause}", tuple(params))
-            total = cursor.fetchone()['total']
+            if dedupe:
+                # 舊資料可能沒有 cluster_id，此時視為自成一群
+                cursor.execute(
+                    f"SELECT COUNT(DISTINCT COALESCE(cluster_id, id)) as total FROM jobs {where_clause}",
+                    tuple(params)
+                )
+                total = cursor.fetchall()[0]['total']
+            else:
+                cursor.execute(f"SELECT COUNT(*) as total FROM jobs {where_clause}", tuple(params))
+                total = cursor.fetchone()['total']
 
-            offset = (page - 1) * limit
-            final_query = f"SELECT * FROM jobs {where_clause} ORDER BY posting_date DESC, id DESC LIMIT %s OFFSET %s"
+            final_query = self._list_query(where_clause, dedupe) + " LIMIT %s OFFSET %s"
             params.extend([limit, offset])
             
             cursor.execute(final_query, tuple(params))
             jobs = cursor.fetchall()
+            for job in jobs:
+                job.pop('cluster_rank', None)
             return jobs, total
 
         except Error as e:
@@ -214,24 +889,469 @@ class _Database:
                 cursor.close()
                 conn.close()
 
+    def iter_jobs(self, keyword='', status='', dedupe=False, chunk_size=500, **filters):
+        """
+        以伺服器端（非緩衝）游標逐批讀取符合條件的職缺，每次 yield 一批字典。
+        資料不會一次全部載入記憶體，適合大量匯出。匯出可能持續很久，因此使用不經過連接池的專用連線，
+        不會佔用 /api/jobs 等一般查詢的連線；用戶端提前中斷時直接關閉連線，不必讀完剩餘的資料列。
+        """
+        conn = None
+        cursor = None
+        finished = False
+        try:
+            conn = self._dedicated_connection()
+            cursor = conn.cursor(dictionary=True, buffered=False)
+
+            where_clause, params = self._build_where(keyword, status, **filters)
+            cursor.execute(self._list_query(where_clause, dedupe), tuple(params))
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    row.pop('cluster_rank', None)
+                yield rows
+            finished = True
+        except Error as e:
+            print(f"匯出職缺時發生錯誤: {e}")
+            raise
+        finally:
+            if conn:
+                if finished:
+                    cursor.close()
+                    conn.close()
+                else:
+                    # 提前中斷或發生錯誤時游標上還有未讀取的資料列：直接關閉 socket，
+                    # 伺服器端的查詢會隨連線中斷而結束
+                    conn.shutdown()
+
+    def _dedicated_connection(self):
+        """內部函式，建立不經過連接池的連線，供長時間的串流讀取使用"""
+        return mysql.connector.connect(**self.dbconfig)
+
+    def iter_changed_jobs(self, updated_since=None, chunk_size=1000):
+        """
+        以非緩衝游標逐批讀取職缺原始資料（updated_since 為 None 時讀取全部），
+        供讀取模型與儲存搜尋的增量比對使用。
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            if updated_since is None:
+                cursor.execute("SELECT * FROM jobs")
+            else:
+                cursor.execute("SELECT * FROM jobs WHERE updated_at >= %s", (updated_since,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except Error as e:
+            print(f"讀取職缺資料時發生錯誤: {e}")
+            raise
+        finally:
+            if conn and conn.is_connected():
+                if conn.unread_result:
+                    conn.consume_results()
+                cursor.close()
+                conn.close()
+
+    def get_skill_map(self, job_ids=None):
+        """回傳 {job_id: set(技能)}；job_ids 為 None 時讀取全部職缺"""
+        conn = None
+        cursor = None
+        skill_map = {}
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            if job_ids is None:
+                cursor.execute("SELECT job_id, skill FROM job_skills")
+                rows = cursor.fetchall()
+            else:
+                job_ids = list(job_ids)
+                rows = []
+                for start in range(0, len(job_ids), 1000):
+                    batch = job_ids[start:start + 1000]
+                    placeholders = ", ".join(["%s"] * len(batch))
+                    cursor.execute(f"SELECT job_id, skill FROM job_skills WHERE job_id IN ({placeholders})", tuple(batch))
+                    rows.extend(cursor.fetchall())
+            for job_id, skill in rows:
+                skill_map.setdefault(job_id, set()).add(skill)
+            return skill_map
+        except Error as e:
+            print(f"讀取職缺技能時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_data_version(self):
+        """目前的資料版本（尚未有任何寫入時為 0），查詢失敗時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT meta_value FROM metadata WHERE meta_key = 'data_version'")
+            rows = cursor.fetchall()
+            return int(rows[0][0]) if rows else 0
+        except Error as e:
+            print(f"獲取資料版本時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
     def update_job_status(self, job_id, new_status):
-        """更新指定 ID 的職缺狀態"""
+        """更新指定 ID 的職缺狀態，並同步調整狀態 facet 的計數"""
         conn = None
         cursor = None
         try:
             conn = self.pool.get_connection()
             cursor = conn.cursor()
+            cursor.execute("SELECT status FROM jobs WHERE id = %s FOR UPDATE", (job_id,))
+            existing = cursor.fetchall()
+            if not existing:
+                conn.rollback()
+                return False
             cursor.execute("UPDATE jobs SET status = %s WHERE id = %s", (new_status, job_id))
+            updated = cursor.rowcount > 0
+            if updated:
+                self._apply_facet_delta(cursor, {'status': existing[0][0]}, {'status': new_status})
+                self._bump_data_version(cursor)
             conn.commit()
-            return cursor.rowcount > 0
+            return updated
         except Error as e:
+            if conn:
+                conn.rollback()
             print(f"更新職缺 {job_id} 狀態時發生錯誤: {e}")
             return False
         finally:
             if conn and conn.is_connected():
                 cursor.close()
                 conn.close()
+
+    def get_facet_counts(self, **filters):
+        """
+        獲取各 facet 的職缺計數。
+        沒有任何篩選條件時直接讀取增量維護的計數表；有篩選條件時，
+        只讀取符合條件職缺的 facet 欄位，在一次掃描中同時累計所有 facet。
+        """
+        conn = None
+        cursor = None
+        counts = {facet: {} for facet in FACET_COLUMNS}
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+
+            where_clause, params = self._build_where(**filters)
+            if not where_clause:
+                cursor.execute("SELECT facet, facet_value, job_count FROM job_facet_counts WHERE job_count > 0")
+                for facet, value, count in cursor.fetchall():
+                    if facet in counts:
+                        counts[facet][value] = count
+            else:
+                cursor.execute(f"SELECT {', '.join(FACET_COLUMNS.values())} FROM jobs {where_clause}", tuple(params))
+                while True:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    for row in rows:
+                        for facet, value in zip(FACET_COLUMNS, row):
+                            value = value or ''
+                            counts[facet][value] = counts[facet].get(value, 0) + 1
+
+            return {
+                facet: [
+                    {'value': value, 'count': count}
+                    for value, count in sorted(values.items(), key=lambda item: -item[1])[:FACET_VALUE_LIMIT]
+                ]
+                for facet, values in counts.items()
+            }
+        except Error as e:
+            print(f"獲取 facet 計數時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def reconcile_facet_counts(self):
+        """全量重算 facet 計數表，修正增量更新可能累積的誤差（由排程定期執行）"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            self._rebuild_facet_counts(cursor)
+            conn.commit()
+            print("facet 計數表已完成全量校正。")
+            return True
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"校正 facet 計數表時發生錯誤: {e}")
+            return False
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
                 
+    def get_job_by_id(self, job_id):
+        """獲取單一職缺的完整資料，找不到時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+            rows = cursor.fetchall()
+            return rows[0] if rows else None
+        except Error as e:
+            print(f"查詢職缺 {job_id} 詳情時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def create_saved_search(self, name, filters):
+        """
+        新增儲存的搜尋，回傳新的 id。
+        目前已符合條件的職缺會先以已讀 (seen=1) 寫入，之後收件匣只會出現新符合的職缺。
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO saved_searches (name, filters) VALUES (%s, %s)",
+                (name, json.dumps(filters, ensure_ascii=False))
+            )
+            search_id = cursor.lastrowid
+            where_clause, params = self._build_where(**filters)
+            cursor.execute(
+                f"INSERT IGNORE INTO saved_search_matches (search_id, job_id, seen) SELECT %s, id, 1 FROM jobs {where_clause}",
+                (search_id, *params)
+            )
+            conn.commit()
+            return search_id
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"新增儲存的搜尋時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_saved_search(self, search_id):
+        """獲取單一儲存的搜尋（filters 已解析），找不到時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, name, filters, created_at FROM saved_searches WHERE id = %s", (search_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            search = rows[0]
+            filters = search['filters']
+            if isinstance(filters, (bytes, bytearray)):
+                filters = filters.decode('utf-8')
+            search['filters'] = json.loads(filters)
+            return search
+        except Error as e:
+            print(f"查詢儲存的搜尋 {search_id} 時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_saved_searches(self):
+        """回傳所有儲存的搜尋（filters 已解析），並附上未讀的新符合職缺數"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT s.id, s.name, s.filters, s.created_at, COUNT(m.job_id) AS unseen_count
+                FROM saved_searches s
+                LEFT JOIN saved_search_matches m ON m.search_id = s.id AND m.seen = 0
+                GROUP BY s.id, s.name, s.filters, s.created_at
+                ORDER BY s.id
+            """)
+            searches = cursor.fetchall()
+            for search in searches:
+                filters = search['filters']
+                if isinstance(filters, (bytes, bytearray)):
+                    filters = filters.decode('utf-8')
+                search['filters'] = json.loads(filters)
+            return searches
+        except Error as e:
+            print(f"獲取儲存的搜尋時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def delete_saved_search(self, search_id):
+        """刪除儲存的搜尋與其收件匣，找不到時回傳 False"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM saved_search_matches WHERE search_id = %s", (search_id,))
+            cursor.execute("DELETE FROM saved_searches WHERE id = %s", (search_id,))
+            deleted = cursor.rowcount > 0
+            conn.commit()
+            return deleted
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"刪除儲存的搜尋 {search_id} 時發生錯誤: {e}")
+            return False
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def add_saved_search_matches(self, matches):
+        """寫入 (search_id, job_id) 配對，已存在的配對略過，回傳新增的數量（失敗時回傳 None）"""
+        if not matches:
+            return 0
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT IGNORE INTO saved_search_matches (search_id, job_id) VALUES (%s, %s)",
+                list(matches)
+            )
+            inserted = cursor.rowcount
+            conn.commit()
+            return inserted
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"寫入儲存搜尋的符合職缺時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_saved_search_inbox(self, search_id, include_seen=False, limit=50):
+        """收件匣：儲存的搜尋新符合的職缺（由新到舊）"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            seen_clause = "" if include_seen else "AND m.seen = 0"
+            cursor.execute(
+                f"""
+                SELECT j.id, j.title, j.company, j.location, j.experience, j.education, j.salary_range,
+                    j.job_url, j.source_website, j.posting_date, j.industry, j.status,
+                    m.matched_at, m.seen
+                FROM saved_search_matches m
+                JOIN jobs j ON j.id = m.job_id
+                WHERE m.search_id = %s {seen_clause}
+                ORDER BY m.matched_at DESC, j.id DESC
+                LIMIT %s
+                """,
+                (search_id, limit)
+            )
+            return cursor.fetchall()
+        except Error as e:
+            print(f"獲取儲存搜尋 {search_id} 的收件匣時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def mark_saved_search_seen(self, search_id, job_ids=None):
+        """將收件匣中的職缺標記為已讀（job_ids 為 None 時標記全部），回傳更新的數量"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            query = "UPDATE saved_search_matches SET seen = 1 WHERE search_id = %s AND seen = 0"
+            params = [search_id]
+            if job_ids is not None:
+                if not job_ids:
+                    return 0
+                query += f" AND job_id IN ({', '.join(['%s'] * len(job_ids))})"
+                params.extend(job_ids)
+            cursor.execute(query, tuple(params))
+            updated = cursor.rowcount
+            conn.commit()
+            return updated
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"標記儲存搜尋 {search_id} 為已讀時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def get_metadata(self, key):
+        """讀取 metadata 的值，不存在時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT meta_value FROM metadata WHERE meta_key = %s", (key,))
+            rows = cursor.fetchall()
+            return rows[0][0] if rows else None
+        except Error as e:
+            print(f"讀取 metadata {key} 時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def set_metadata(self, key, value):
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO metadata (meta_key, meta_value) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE meta_value = VALUES(meta_value)
+            """, (key, value))
+            conn.commit()
+            return True
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"寫入 metadata {key} 時發生錯誤: {e}")
+            return False
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
     def get_last_update_time(self):
         """獲取最後更新時間"""
         conn = None
@@ -251,52 +1371,139 @@ class _Database:
                 conn.close()
 
 # --- 模組級別的接口 ---
-# 建立一個全域的資料庫實例，讓整個應用程式共享
-_db_instance = _Database()
+# 全域的資料庫實例在第一次使用時才建立，讓整個應用程式共享
+_db_instance = None
+_db_lock = threading.Lock()
+
+def get_db() -> _Database:
+    """取得共用的資料庫實例；第一次呼叫時建立連接池並初始化資料表"""
+    global _db_instance
+    if _db_instance is None:
+        with _db_lock:
+            if _db_instance is None:
+                _db_instance = _Database()
+    return _db_instance
 
 # 提供外部直接呼叫的函式
 def add_job(job_data: dict) -> bool:
-    return _db_instance.add_job(job_data)
+    return get_db().add_job(job_data)
 
-def get_all_jobs(page=1, limit=10, keyword='', status=''):
-    return _db_instance.get_all_jobs(page, limit, keyword, status)
+def get_all_jobs(page=1, limit=10, keyword='', status='', dedupe=False, **filters):
+    return get_db().get_all_jobs(page, limit, keyword, status, dedupe, **filters)
+
+def iter_jobs(keyword='', status='', dedupe=False, chunk_size=500, **filters):
+    return get_db().iter_jobs(keyword, status, dedupe, chunk_size, **filters)
 
 def update_job_status(job_id, new_status):
-    return _db_instance.update_job_status(job_id, new_status)
+    return get_db().update_job_status(job_id, new_status)
+
+def get_facet_counts(**filters):
+    return get_db().get_facet_counts(**filters)
+
+def reconcile_facet_counts():
+    return get_db().reconcile_facet_counts()
+
+def get_job_by_id(job_id):
+    return get_db().get_job_by_id(job_id)
 
 def get_last_update_time():
-    return _db_instance.get_last_update_time()
+    return get_db().get_last_update_time()
+
+def get_job_skills(job_id):
+    return get_db().get_job_skills(job_id)
+
+def iter_changed_jobs(updated_since=None, chunk_size=1000):
+    return get_db().iter_changed_jobs(updated_since, chunk_size)
+
+def get_skill_map(job_ids=None):
+    return get_db().get_skill_map(job_ids)
+
+def get_data_version():
+    return get_db().get_data_version()
+
+def create_saved_search(name, filters):
+    return get_db().create_saved_search(name, filters)
+
+def get_saved_search(search_id):
+    return get_db().get_saved_search(search_id)
 
-# 測試區塊
+def get_saved_searches():
+    return get_db().get_saved_searches()
+
+def delete_saved_search(search_id):
+    return get_db().delete_saved_search(search_id)
+
+def add_saved_search_matches(matches):
+    return get_db().add_saved_search_matches(matches)
+
+def get_saved_search_inbox(search_id, include_seen=False, limit=50):
+    return get_db().get_saved_search_inbox(search_id, include_seen, limit)
+
+def mark_saved_search_seen(search_id, job_ids=None):
+    return get_db().mark_saved_search_seen(search_id, job_ids)
+
+def get_metadata(key):
+    return get_db().get_metadata(key)
+
+def set_metadata(key, value):
+    return get_db().set_metadata(key, value)
+
+def backfill_job_skills(batch_size=500):
+    return get_db().backfill_job_skills(batch_size)
+
+def backfill_job_clusters(batch_size=500):
+    return get_db().backfill_job_clusters(batch_size)
+
+# 維護指令與測試區塊
 if __name__ == '__main__':
-    print("\n--- 正在測試資料庫模組 ---")
-    try:
-        # 測試 add_job (新增)
-        print("\n[測試1] 新增一筆假資料...")
-        add_job({
-            'job_url': 'https://example.com/job/1',
-            'title': '測試工程師',
-            'company': '測試公司',
-            'job_description': '這是一個詳細的職務描述。'
-        })
+    import argparse
+
+    parser = argparse.ArgumentParser(description='資料庫維護指令（未指定指令時執行模組測試）')
+    parser.add_argument('command', nargs='?', choices=['backfill-skills', 'backfill-clusters'],
+                        help='backfill-skills：技能字典修改後重新標記已入庫的職缺；'
+                             'backfill-clusters：為尚未分群的舊職缺補算 cluster_id')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == 'backfill-skills':
+        retagged = backfill_job_skills(args.batch_size)
+        if retagged is None:
+            raise SystemExit("重新標記職缺技能失敗。")
+        print(f"技能標記完成，{retagged} 筆職缺的標籤有變動。")
+    elif args.command == 'backfill-clusters':
+        processed = backfill_job_clusters(args.batch_size)
+        if processed is None:
+            raise SystemExit("補算職缺分群失敗。")
+        print(f"分群補算完成，共處理 {processed} 筆職缺。")
+    else:
+        print("\n--- 正在測試資料庫模組 ---")
+        try:
+            # 測試 add_job (新增)
+            print("\n[測試1] 新增一筆假資料...")
+            add_job({
+                'job_url': 'https://example.com/job/1',
+                'title': '測試工程師',
+                'company': '測試公司',
+                'job_description': '這是一個詳細的職務描述。'
+            })
         
-        # 測試 add_job (更新)
-        print("\n[測試2] 更新同一筆假資料...")
-        add_job({
-            'job_url': 'https://example.com/job/1',
-            'title': '資深測試工程師',
-            'company': '測試公司',
-            'job_description': '這是更新後的詳細職務描述。'
-        })
-
-        # 測試 get_all_jobs
-        print("\n[測試3] 獲取所有職缺...")
-        jobs, total = get_all_jobs(limit=5)
-        if jobs is not None:
-            print(f"獲取到 {len(jobs)} 筆職缺，總數為 {total}。")
-            # print("第一筆職缺:", jobs[0] if jobs else "無")
+            # 測試 add_job (更新)
+            print("\n[測試2] 更新同一筆假資料...")
+            add_job({
+                'job_url': 'https://example.com/job/1',
+                'title': '資深測試工程師',
+                'company': '測試公司',
+                'job_description': '這是更新後的詳細職務描述。'
+            })
+
+            # 測試 get_all_jobs
+            print("\n[測試3] 獲取所有職缺...")
+            jobs, total = get_all_jobs(limit=5)
+            if jobs is not None:
+                print(f"獲取到 {len(jobs)} 筆職缺，總數為 {total}。")
+                # print("第一筆職缺:", jobs[0] if jobs else "無")
         
-        print("\n--- 資料庫模組測試完畢 ---")
+            print("\n--- 資料庫模組測試完畢 ---")
 
-    except Exception as e:
-        print(f"測試過程中發生錯誤: {e}")
\ No newline at end of file
+        except Exception as e:
+            print(f"測試過程中發生錯誤: {e}")
\ No newline at end of file
@@ -1,8 +1,8 @@
 import requests
 import re
-import time
 import os
 import mysql.connector
+import rate_control
 from dotenv import load_dotenv
 
 # 載入 .env 檔案中的環境變數
@@ -26,11 +26,13 @@ def get_job_description(job_url: str, session: requests.Session) -> str:
     }
 
     try:
-        response = session.get(content_api_url, headers=headers)
+        response = rate_control.request(session, 'GET', content_api_url, headers=headers)
         response.raise_for_status()
         data = response.json()
         description = data.get('data', {}).get('jobDetail', {}).get('jobDescription', '')
         return description.strip()
+    except rate_control.CircuitOpenError:
+        raise
     except Exception as e:
         print(f"  [錯誤] 抓取 {content_api_url} 時發生錯誤: {e}")
         return ""
@@ -81,14 +83,13 @@ def backfill_job_descriptions():
                     print(f"  已成功將 JD 更新至資料庫 (Job ID: {job_id})。")
                 else:
                     print("  未能獲取職缺描述，跳過此筆。")
-                
-                # 暫停一下，避免請求過於頻繁
-                time.sleep(1.5)
 
         print("\n所有需要補全的職缺都已處理完畢！")
 
     except mysql.connector.Error as err:
         print(f"資料庫錯誤: {err}")
+    except rate_control.CircuitOpenError as e:
+        print(f"104 持續回應錯誤，暫停補全: {e}")
     except Exception as e:
         print(f"發生未知錯誤: {e}")
     finally:
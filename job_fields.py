@@ -0,0 +1,148 @@
+"""
+職缺欄位結構化模組 (Field Parsing)
+
+104 的薪資 (salaryDesc) 與經歷要求只以文字呈現，無法直接在資料庫中做範圍篩選。
+本模組在寫入資料庫前將它們解析成數值欄位：
+1. 薪資：上下限統一換算為「月薪（新台幣）」，並記錄原始的計薪週期。
+2. 經歷：最少與最多年資（無上限時為 None）。
+3. 地點：取出縣市，作為篩選與統計 (facet) 的分類。
+"""
+
+import re
+
+# 換算成月薪時使用的工時假設（週休二日、每日 8 小時）
+DAYS_PER_MONTH = 22
+HOURS_PER_MONTH = DAYS_PER_MONTH * 8
+
+# 計薪週期 -> 換算為月薪的乘數
+_PERIODS = (
+    ('年薪', 'year', 1 / 12),
+    ('月薪', 'month', 1),
+    ('日薪', 'day', DAYS_PER_MONTH),
+    ('時薪', 'hour', HOURS_PER_MONTH),
+)
+
+_AMOUNT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(萬)?')
+_RANGE_RE = re.compile(r'(\d+)\s*[-~～]\s*(\d+)\s*年')
+_AT_LEAST_RE = re.compile(r'(\d+)\s*年以上')
+_AT_MOST_RE = re.compile(r'(\d+)\s*年以下')
+_COUNTY_RE = re.compile(r'^(\S{2}[市縣])')
+
+
+def _amounts(text: str) -> list:
+    """取出文字中的金額（移除千分位，支援「4萬」「4.5萬」寫法）"""
+    values = []
+    for number, unit in _AMOUNT_RE.findall(text.replace(',', '')):
+        value = float(number) * (10000 if unit else 1)
+        values.append(value)
+    return values
+
+
+def parse_salary(salary_text: str) -> dict:
+    """
+    解析薪資文字，回傳 {'salary_min', 'salary_max', 'salary_period'}。
+    金額皆為月薪（新台幣）整數；「以上」或面議的職缺 salary_max 為 None。
+
+    >>> parse_salary('月薪40,000~60,000元')
+    {'salary_min': 40000, 'salary_max': 60000, 'salary_period': 'month'}
+    >>> parse_salary('待遇面議')
+    {'salary_min': None, 'salary_max': None, 'salary_period': 'negotiable'}
+    """
+    text = (salary_text or '').strip()
+    result = {'salary_min': None, 'salary_max': None, 'salary_period': 'unknown'}
+    if not text:
+        return result
+
+    if '面議' in text:
+        # 104 的「面議（經常性薪資達4萬元或以上）」仍保證了月薪下限
+        result['salary_period'] = 'negotiable'
+        amounts = _amounts(text)
+        if amounts:
+            result['salary_min'] = int(round(amounts[0]))
+        return result
+
+    if '論件' in text:
+        result['salary_period'] = 'piece'
+        return result
+
+    multiplier = None
+    for label, period, factor in _PERIODS:
+        if label in text:
+            result['salary_period'] = period
+            multiplier = factor
+            break
+    if multiplier is None:
+        return result
+
+    amounts = _amounts(text)
+    if not amounts:
+        return result
+    result['salary_min'] = int(round(amounts[0] * multiplier))
+    if len(amounts) > 1:
+        result['salary_max'] = int(round(amounts[1] * multiplier))
+    elif '以上' not in text:
+        # 單一金額且非「以上」，視為固定薪資
+        result['salary_max'] = result['salary_min']
+    return result
+
+
+def parse_experience_years(experience_text: str) -> dict:
+    """
+    解析經歷要求（convert_104_experience 產生的標籤或「N年以上」等文字），
+    回傳 {'exp_min_years', 'exp_max_years'}；無上限時 exp_max_years 為 None。
+
+    >>> parse_experience_years('3-5年')
+    {'exp_min_years': 3, 'exp_max_years': 5}
+    >>> parse_experience_years('經歷不拘')
+    {'exp_min_years': 0, 'exp_max_years': None}
+    """
+    text = (experience_text or '').strip()
+    result = {'exp_min_years': None, 'exp_max_years': None}
+    if not text:
+        return result
+
+    if '不拘' in text:
+        result['exp_min_years'] = 0
+    elif '無經驗' in text:
+        result['exp_min_years'] = 0
+        result['exp_max_years'] = 0
+    elif _RANGE_RE.search(text):
+        low, high = _RANGE_RE.search(text).groups()
+        result['exp_min_years'], result['exp_max_years'] = int(low), int(high)
+    elif _AT_LEAST_RE.search(text):
+        result['exp_min_years'] = int(_AT_LEAST_RE.search(text).group(1))
+    elif _AT_MOST_RE.search(text):
+        result['exp_min_years'] = 0
+        result['exp_max_years'] = int(_AT_MOST_RE.search(text).group(1))
+    return result
+
+
+def parse_county(location: str) -> str:
+    """
+    從地點文字取出縣市（統一使用「台」字），無法辨識時回傳空字串。
+
+    >>> parse_county('臺北市大安區敦化南路')
+    '台北市'
+    """
+    text = (location or '').strip().replace('臺', '台')
+    match = _COUNTY_RE.match(text)
+    return match.group(1) if match else ''
+
+
+def structured_fields(job_data: dict) -> dict:
+    """合併所有需在寫入時計算的結構化欄位"""
+    fields = parse_salary(job_data.get('salary_range'))
+    fields.update(parse_experience_years(job_data.get('experience')))
+    fields['county'] = parse_county(job_data.get('location'))
+    return fields
+
+
+# 測試區塊
+if __name__ == '__main__':
+    for sample in ['月薪40,000~60,000元', '月薪40,000元以上', '年薪1,200,000~1,800,000元',
+                   '時薪190元', '待遇面議', '面議（經常性薪資達4萬元或以上）', '月薪4萬~6.5萬']:
+        print(f"{sample:<30} -> {parse_salary(sample)}")
+    for sample in ['無經驗', '1年以下', '1-3年', '10年以上', '經歷不拘']:
+        print(f"{sample:<30} -> {parse_experience_years(sample)}")
+    for sample in ['台北市大安區', '新竹縣竹北市', '遠端工作']:
+        print(f"{sample:<30} -> {parse_county(sample)!r}")
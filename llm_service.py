@@ -3,8 +3,6 @@
 import os
 import json
 from dotenv import load_dotenv
-from google import genai as google_genai_sdk
-from google.genai import types as google_genai_types
 
 # 載入環境變數
 load_dotenv()
@@ -20,6 +18,9 @@ def get_match_analysis(job_description: str, resume_text: str) -> dict:
     #   return {"error": "在 .env 檔案中找不到 GEMINI_API_KEY，或 .env 未被正確載入。"}
     
     try:
+        # google-genai 載入成本高，延遲到第一次分析時才匯入
+        from google import genai as google_genai_sdk
+
         client = google_genai_sdk.Client(api_key=api_key)
         
         prompt = f"""
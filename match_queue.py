@@ -0,0 +1,451 @@
+"""
+AI 履歷匹配工作佇列模組 (Admission Control)
+
+LLM 分析一次需要數秒到數十秒，若直接在請求執行緒中呼叫，少數幾個並行分析就會佔滿
+所有伺服器執行緒，連 /api/jobs 列表請求也只能排隊等待。本模組提供：
+1. 固定數量的背景 worker 與有上限的優先權佇列，LLM 呼叫只在 worker 中執行。
+2. 每個用戶端同時進行中的分析數上限（per-client quota）。
+3. 佇列已滿或超過額度時立即拒絕，並估算建議的重試秒數 (Retry-After)。
+4. 佇列深度、等待時間與執行時間等指標。
+
+工作狀態存放在資料庫的 match_tasks 表（由 database 初始化），而不是行程的記憶體中：
+以多個 worker 行程執行（例如 gunicorn --workers 4）時，任何行程都能查詢工作狀態，
+額度與佇列上限對所有行程合計，每個行程的 worker 以 SELECT ... FOR UPDATE SKIP LOCKED
+領取工作。履歷與 JD 只保存到分析完成為止。
+
+佇列使用自己的連接池，worker 與輪詢不會用光 /api/jobs 等一般請求使用的 database 連接池；
+連接池暫時用完時會短暫等待，而不是立即失敗。執行中的行程結束後，租約到期的工作由任何行程的
+worker 收回重新排隊（超過 MAX_ATTEMPTS 次才標記為失敗），不需要等到下一次有人提交工作。
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+
+import database
+
+# 優先權數字越小越先處理
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+# 受理工作時以 MySQL 的命名鎖讓各行程依序檢查額度與佇列上限
+ADMISSION_LOCK = 'ai_job_hunter.match_admission'
+ADMISSION_LOCK_TIMEOUT = 5
+# worker 沒有工作時查詢佇列的間隔，以及 wait() 查詢工作狀態的最短與最長間隔（秒，逐次加倍）
+POLL_INTERVAL = 0.5
+WAIT_POLL_INTERVAL = 0.1
+WAIT_POLL_MAX_INTERVAL = 1.0
+# worker 檢查租約到期工作的間隔（秒，同一行程的 worker 共用）；租約到期的工作最多執行的次數
+RECLAIM_INTERVAL = 5.0
+MAX_ATTEMPTS = 2
+# 佇列連接池的大小為 worker 數加上此數（供提交與查詢使用）；連接池用完時最多等待的秒數
+POOL_EXTRA_CONNECTIONS = int(os.getenv('MATCH_POOL_EXTRA', '6'))
+POOL_WAIT = 2.0
+# mysql-connector 連接池的大小上限
+POOL_MAX_SIZE = 32
+# 計算等待與執行時間指標時讀取的最近完成工作數
+METRICS_WINDOW = 500
+
+
+class AdmissionRejected(Exception):
+    """佇列已滿或用戶端超過額度，附帶建議的重試秒數"""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _load_result(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class MatchQueue:
+    """
+    以資料庫為後端、有上限的優先權工作佇列。
+    analyze_fn(job_description, resume_text) -> dict 在本行程的 worker 執行緒中呼叫；
+    worker 在第一次使用佇列時才啟動。pool 預設為第一次使用時以 database 的連線設定建立的專用連接池。
+    執行超過 task_timeout 秒仍未完成的工作（例如執行中的行程已結束）會重新排隊，
+    已執行 MAX_ATTEMPTS 次的工作標記為失敗。
+    """
+    def __init__(self, analyze_fn, workers=2, max_queue=20, per_client_limit=2, result_ttl=600,
+                 task_timeout=300, pool=None):
+        self.analyze_fn = analyze_fn
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_client_limit = per_client_limit
+        self.result_ttl = result_ttl
+        self.task_timeout = task_timeout
+        self._pool = pool
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pool_lock = threading.Lock()
+        self._last_reclaim = 0.0
+        self._threads = []
+        self._worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+        # 受理與拒絕次數只統計本行程（其餘指標由資料庫彙總所有行程）
+        self._counters = {'submitted': 0, 'rejected': 0}
+
+    @property
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = MySQLConnectionPool(
+                    pool_name=f"match_queue_{id(self)}",
+                    pool_size=min(self.workers + POOL_EXTRA_CONNECTIONS, POOL_MAX_SIZE),
+                    **database.get_db().dbconfig
+                )
+            return self._pool
+
+    def _connection(self):
+        """從佇列的連接池取得連線；暫時用完時等待最多 POOL_WAIT 秒（逾時拋出 PoolError）"""
+        deadline = time.monotonic() + POOL_WAIT
+        while True:
+            try:
+                return self.pool.get_connection()
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.02)
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, args=(f"{self._worker_prefix}-{i}",),
+                                          name=f'match-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _estimate_retry_after(self, cursor):
+        """以最近的平均執行時間與目前的排隊數估算多久後可能有空位（秒）"""
+        cursor.execute("""
+            SELECT AVG(TIMESTAMPDIFF(MICROSECOND, started_at, finished_at)) / 1000000 FROM (
+                SELECT started_at, finished_at FROM match_tasks
+                WHERE finished_at IS NOT NULL AND started_at IS NOT NULL
+                ORDER BY finished_at DESC LIMIT 50
+            ) recent
+        """)
+        avg_run = cursor.fetchall()[0][0]
+        avg_run = float(avg_run) if avg_run is not None else 10.0
+        cursor.execute("SELECT COUNT(*) FROM match_tasks WHERE status IN ('queued', 'running')")
+        backlog = cursor.fetchall()[0][0]
+        return max(1, int(avg_run * backlog / max(self.workers, 1)))
+
+    def _purge_expired(self, cursor):
+        """
+        刪除過期的結果，並收回租約到期的工作（執行中的行程可能已結束）：
+        已執行 MAX_ATTEMPTS 次的標記為失敗，其餘重新排隊。
+        """
+        cursor.execute(
+            "DELETE FROM match_tasks WHERE finished_at < NOW(3) - INTERVAL %s SECOND",
+            (self.result_ttl,)
+        )
+        cursor.execute("""
+            UPDATE match_tasks
+            SET status = 'failed', finished_at = NOW(3), job_description = NULL, resume_text = NULL,
+                result = %s, lease_expires_at = NULL
+            WHERE status = 'running' AND lease_expires_at < NOW(3) AND attempts >= %s
+        """, (json.dumps({'error': 'AI 分析逾時，請重新提交'}, ensure_ascii=False), MAX_ATTEMPTS))
+        cursor.execute("""
+            UPDATE match_tasks
+            SET status = 'queued', worker = NULL, started_at = NULL, lease_expires_at = NULL
+            WHERE status = 'running' AND lease_expires_at < NOW(3)
+        """)
+        return cursor.rowcount
+
+    def _reclaim_expired(self):
+        """worker 定期收回租約到期的工作（每個行程每 RECLAIM_INTERVAL 秒最多一次）"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_reclaim < RECLAIM_INTERVAL:
+                return
+            self._last_reclaim = now
+        conn = None
+        cursor = None
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            requeued = self._purge_expired(cursor)
+            conn.commit()
+            if requeued:
+                print(f"已收回 {requeued} 筆租約到期的 AI 分析工作並重新排隊。")
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"收回租約到期的 AI 分析工作時發生錯誤: {e}")
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def submit(self, client_id, job_id, job_description, resume_text, priority=PRIORITY_NORMAL):
+        """提交一筆分析工作並回傳工作快照；無法受理時拋出 AdmissionRejected"""
+        self._ensure_workers()
+        conn = None
+        cursor = None
+        locked = False
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (ADMISSION_LOCK, ADMISSION_LOCK_TIMEOUT))
+            locked = cursor.fetchall()[0][0] == 1
+            if not locked:
+                raise AdmissionRejected('分析佇列忙碌中，請稍後再試', 1)
+
+            self._purge_expired(cursor)
+            cursor.execute(
+                "SELECT COUNT(*) FROM match_tasks WHERE client_id = %s AND status IN ('queued', 'running')",
+                (client_id,)
+            )
+            if cursor.fetchall()[0][0] >= self.per_client_limit:
+                raise AdmissionRejected(
+                    f'同一用戶端最多同時進行 {self.per_client_limit} 筆分析', self._estimate_retry_after(cursor)
+                )
+            cursor.execute("SELECT COUNT(*) FROM match_tasks WHERE status = 'queued'")
+            queue_depth = cursor.fetchall()[0][0]
+            if queue_depth >= self.max_queue:
+                raise AdmissionRejected('分析佇列已滿，請稍後再試', self._estimate_retry_after(cursor))
+
+            task_id = uuid.uuid4().hex
+            cursor.execute("""
+                INSERT INTO match_tasks (task_id, job_id, client_id, priority, status,
+                                         job_description, resume_text, submitted_at)
+                VALUES (%s, %s, %s, %s, 'queued', %s, %s, NOW(3))
+            """, (task_id, job_id, client_id, priority, job_description, resume_text))
+            conn.commit()
+        except AdmissionRejected:
+            conn.commit()
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"提交 AI 分析工作時發生錯誤: {e}")
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise AdmissionRejected('分析佇列暫時無法使用，請稍後再試', 5)
+        finally:
+            if conn and conn.is_connected():
+                if locked:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (ADMISSION_LOCK,))
+                    cursor.fetchall()
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+        with self._wakeup:
+            self._counters['submitted'] += 1
+            # 喚醒本行程閒置的 worker，不必等到下一次查詢佇列
+            self._wakeup.notify()
+        return {
+            'task_id': task_id,
+            'job_id': job_id,
+            'status': 'queued',
+            'priority': priority,
+            'queue_depth': queue_depth + 1,
+        }
+
+    def _claim(self, worker_name):
+        """領取優先權最高的一筆排隊中工作，沒有工作時回傳 None"""
+        conn = None
+        cursor = None
+        try:
+            conn = self._connection()
+            conn.start_transaction(isolation_level='READ COMMITTED')
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT task_id, job_description, resume_text FROM match_tasks
+                WHERE status = 'queued'
+                ORDER BY priority, submitted_at
+                LIMIT 1 FOR UPDATE SKIP LOCKED
+            """)
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                return None
+            task_id, job_description, resume_text = rows[0]
+            cursor.execute("""
+                UPDATE match_tasks
+                SET status = 'running', worker = %s, started_at = NOW(3), attempts = attempts + 1,
+                    lease_expires_at = NOW(3) + INTERVAL %s SECOND
+                WHERE task_id = %s
+            """, (worker_name, self.task_timeout, task_id))
+            conn.commit()
+            return task_id, job_description, resume_text
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"領取 AI 分析工作時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def _finish(self, worker_name, task_id, status, result):
+        """寫入分析結果並清除履歷與 JD；工作已被標記逾時（不再屬於本 worker）時不覆寫"""
+        conn = None
+        cursor = None
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE match_tasks
+                SET status = %s, result = %s, finished_at = NOW(3),
+                    job_description = NULL, resume_text = NULL, lease_expires_at = NULL
+                WHERE task_id = %s AND status = 'running' AND worker = %s
+            """, (status, json.dumps(result, ensure_ascii=False, default=str), task_id, worker_name))
+            conn.commit()
+        except Error as e:
+            if conn:
+                conn.rollback()
+            print(f"寫入 AI 分析工作 {task_id} 結果時發生錯誤: {e}")
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def _worker(self, worker_name):
+        while True:
+            self._reclaim_expired()
+            claimed = self._claim(worker_name)
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+
+            task_id, job_description, resume_text = claimed
+            try:
+                result = self.analyze_fn(job_description, resume_text)
+                failed = not isinstance(result, dict) or 'error' in result
+            except Exception as e:
+                print(f"AI 分析工作 {task_id} 執行時發生錯誤: {e}")
+                result = {'error': 'AI 分析時發生錯誤', 'details': str(e)}
+                failed = True
+            self._finish(worker_name, task_id, 'failed' if failed else 'done', result)
+
+    def get(self, task_id):
+        """查詢工作狀態，不存在（或已過期）時回傳 None"""
+        self._ensure_workers()
+        conn = None
+        cursor = None
+        try:
+            conn = self._connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT task_id, job_id, status, priority, result,
+                    TIMESTAMPDIFF(MICROSECOND, submitted_at, started_at) / 1000000 AS wait_seconds
+                FROM match_tasks WHERE task_id = %s
+            """, (task_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            task = rows[0]
+            snapshot = {
+                'task_id': task['task_id'],
+                'job_id': task['job_id'],
+                'status': task['status'],
+                'priority': task['priority'],
+            }
+            if task['status'] == 'queued':
+                cursor.execute("SELECT COUNT(*) AS depth FROM match_tasks WHERE status = 'queued'")
+                snapshot['queue_depth'] = cursor.fetchall()[0]['depth']
+            if task['wait_seconds'] is not None:
+                snapshot['wait_seconds'] = round(float(task['wait_seconds']), 3)
+            if task['status'] in ('done', 'failed'):
+                snapshot['result'] = _load_result(task['result'])
+            return snapshot
+        except Error as e:
+            print(f"查詢 AI 分析工作 {task_id} 時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+    def wait(self, task_id, timeout=None):
+        """等待工作完成並回傳快照；逾時則回傳目前狀態（工作可能由其他行程執行，因此定期查詢）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = WAIT_POLL_INTERVAL
+        while True:
+            task = self.get(task_id)
+            if task is None or task['status'] not in ('queued', 'running'):
+                return task
+            if deadline is not None and time.monotonic() >= deadline:
+                return task
+            sleep = interval if deadline is None else min(interval, max(deadline - time.monotonic(), 0))
+            time.sleep(sleep)
+            interval = min(interval * 2, WAIT_POLL_MAX_INTERVAL)
+
+    def metrics(self):
+        """回傳佇列深度、等待時間與執行時間等指標（所有行程合計；受理與拒絕次數為本行程）"""
+        def summary(values):
+            if not values:
+                return {'avg': None, 'p95': None, 'max': None}
+            ordered = sorted(values)
+            return {
+                'avg': round(sum(ordered) / len(ordered), 3),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max': round(ordered[-1], 3),
+            }
+
+        conn = None
+        cursor = None
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM match_tasks GROUP BY status")
+            counts = dict(cursor.fetchall())
+            cursor.execute(
+                "SELECT COUNT(DISTINCT client_id) FROM match_tasks WHERE status IN ('queued', 'running')"
+            )
+            active_clients = cursor.fetchall()[0][0]
+            cursor.execute("""
+                SELECT TIMESTAMPDIFF(MICROSECOND, submitted_at, started_at) / 1000000,
+                    TIMESTAMPDIFF(MICROSECOND, started_at, finished_at) / 1000000
+                FROM match_tasks WHERE finished_at IS NOT NULL AND started_at IS NOT NULL
+                ORDER BY finished_at DESC LIMIT %s
+            """, (METRICS_WINDOW,))
+            timings = cursor.fetchall()
+        except Error as e:
+            print(f"獲取 AI 分析佇列指標時發生錯誤: {e}")
+            return None
+        finally:
+            if conn and conn.is_connected():
+                if cursor:
+                    cursor.close()
+                conn.close()
+
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'queue_capacity': self.max_queue,
+            'running': counts.get('running', 0),
+            'workers': self.workers,
+            'per_client_limit': self.per_client_limit,
+            'active_clients': active_clients,
+            **counters,
+            # 完成與失敗數只包含尚未超過 result_ttl 而被刪除的工作
+            'completed': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'wait_seconds': summary([float(wait) for wait, _ in timings]),
+            'run_seconds': summary([float(run) for _, run in timings]),
+        }
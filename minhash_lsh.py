@@ -0,0 +1,134 @@
+"""
+MinHash LSH 近似重複偵測模組 (Near-Duplicate Detection)
+
+同一個職缺常以略為不同的職稱、地點或網址重複刊登。本模組以 MinHash 簽章
+搭配 LSH 分帶 (banding) 找出近似重複的職缺，避免兩兩比對所有 JD 的平方成本。
+
+功能包括：
+1. 將 JD 切成字元 shingle，並計算 One-Permutation MinHash 簽章（每筆職缺只需雜湊一次）。
+2. 將簽章切成多個 band，相同 band 雜湊值的職缺才會成為候選，再以估計的 Jaccard 相似度確認。
+3. 候選的查詢與分群結果的儲存由 database.py 的 job_lsh_bands / job_signatures 資料表負責。
+"""
+
+import re
+import zlib
+from array import array
+
+# --- MinHash / LSH 參數 ---
+# NUM_PERM = BANDS * ROWS；門檻約為 (1/BANDS) ** (1/ROWS) ≈ 0.71
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# 估計 Jaccard 相似度達此門檻才視為重複
+SIMILARITY_THRESHOLD = 0.8
+
+_EMPTY = 0xFFFFFFFF
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize(text: str) -> str:
+    """統一大小寫並壓縮空白，避免排版差異影響 shingle"""
+    return _WHITESPACE_RE.sub(' ', text or '').strip().lower()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """將文字切成長度為 size 的字元 shingle（中英文皆適用）"""
+    text = _normalize(text)
+    if not text:
+        return set()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(text: str, num_perm: int = NUM_PERM) -> array:
+    """
+    計算 One-Permutation MinHash 簽章。
+    每個 shingle 只雜湊一次：以雜湊值決定所屬的 bin，bin 內保留最小值；
+    空的 bin 以循環方式向右借用下一個非空 bin（densification），使簽章可直接逐位比較。
+    """
+    sig = array('I', [_EMPTY]) * num_perm
+    for sh in shingles(text):
+        h = zlib.crc32(sh.encode('utf-8'))
+        b = h % num_perm
+        v = h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+
+    if _EMPTY not in sig or all(v == _EMPTY for v in sig):
+        return sig
+    # 循環 densification：空 bin 借用右方第一個原本非空的 bin，並以距離作為偏移
+    original = sig[:]
+    for i in range(num_perm):
+        if original[i] != _EMPTY:
+            continue
+        for offset in range(1, num_perm):
+            j = (i + offset) % num_perm
+            if original[j] != _EMPTY:
+                sig[i] = (original[j] + offset * 0x9E3779B1) & 0x7FFFFFFF
+                break
+    return sig
+
+
+def is_empty_signature(sig: array) -> bool:
+    """沒有任何 shingle 的簽章（例如空白 JD）不參與分群"""
+    return all(v == _EMPTY for v in sig)
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """以簽章相同位置相等的比例估計 Jaccard 相似度"""
+    if len(sig_a) != len(sig_b) or not sig_a:
+        return 0.0
+    same = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+    return same / len(sig_a)
+
+
+def band_hashes(sig: array, bands: int = BANDS) -> list:
+    """將簽章切成 bands 段，回傳每段的 32 位元雜湊值（依 band 順序）"""
+    rows = len(sig) // bands
+    return [zlib.crc32(sig[i * rows:(i + 1) * rows].tobytes()) for i in range(bands)]
+
+
+def signature_to_bytes(sig: array) -> bytes:
+    return sig.tobytes()
+
+
+def signature_from_bytes(data: bytes) -> array:
+    sig = array('I')
+    sig.frombytes(data)
+    return sig
+
+
+def dedupe_text(job_data: dict) -> str:
+    """決定用來比對的文字：優先使用 JD，沒有 JD 時退回職稱與公司"""
+    description = job_data.get('job_description') or ''
+    if description.strip():
+        return description
+    return f"{job_data.get('title') or ''} {job_data.get('company') or ''}"
+
+
+def best_cluster(sig: array, candidates, threshold: float = SIMILARITY_THRESHOLD):
+    """
+    從共用 band 的候選中挑出相似度最高且達門檻者，回傳其 cluster ID；沒有符合者時回傳 None。
+    candidates 為 (cluster ID, 簽章) 的序列，由 database.py 以 job_lsh_bands 查出。
+    """
+    cluster_id = None
+    best = threshold
+    for other_cluster, other_sig in candidates:
+        score = similarity(sig, other_sig)
+        if score >= best:
+            best = score
+            cluster_id = other_cluster
+    return cluster_id
+
+
+# 示範區塊
+if __name__ == '__main__':
+    a = "負責機器學習模型開發與部署，熟悉 Python、PyTorch，具備 MLOps 經驗者佳。"
+    b = "負責機器學習模型開發與部署，熟悉 Python、PyTorch，具備 MLOps 經驗者尤佳。"
+    c = "門市銷售人員，負責商品陳列與顧客服務。"
+    sig_a, sig_b, sig_c = signature(a), signature(b), signature(c)
+    print(f"a/b 相似度: {similarity(sig_a, sig_b):.2f}")
+    print(f"a/c 相似度: {similarity(sig_a, sig_c):.2f}")
+    print('b ->', best_cluster(sig_b, [('a', sig_a), ('c', sig_c)]))
@@ -0,0 +1,256 @@
+"""
+爬蟲請求速率控制模組 (Adaptive Rate Control)
+
+所有爬蟲的 HTTP 請求都經過本模組，取代固定的 time.sleep：
+1. AdaptiveRateController：AIMD 速率控制。回應快速且錯誤率低時每次成功線性提高速率；
+   遇到 429 / 5xx / 逾時則將速率乘以遞減係數（冷卻時間內只降一次），並遵守伺服器回傳的 Retry-After。
+2. CircuitBreaker：連續多個請求在重試用盡後仍失敗（5xx / 逾時）時暫停所有請求一段時間，
+   之後只放行一個試探請求。帶 Retry-After 的 429 是節流而非故障，不計入斷路器。
+3. request()：單一請求的指數退避重試（含隨機抖動），並回報結果給上述兩者。
+
+同一個主機的所有請求共用同一組控制器，透過 get_controller(url) 取得。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+# 視為伺服器節流、需要降速的狀態碼
+THROTTLE_STATUS = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，暫停對該主機送出請求"""
+
+
+class AdaptiveRateController:
+    """
+    以 AIMD（加法增加、乘法減少）調整每秒請求數。
+    acquire() 會阻塞到下一個可送出請求的時間點，可在多執行緒間共用。
+    多個執行緒幾乎同時遇到同一波節流時，decrease_cooldown 秒內只降速一次，避免速率被連續減半。
+    """
+    def __init__(self, initial_rate=0.5, min_rate=0.1, max_rate=5.0, increase_step=0.05,
+                 decrease_factor=0.5, latency_target=2.0, error_threshold=0.1, window=20,
+                 decrease_cooldown=1.0):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.decrease_cooldown = decrease_cooldown
+
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+        self._last_decrease = None
+        self._outcomes = deque(maxlen=window)  # True 代表失敗
+
+    def acquire(self):
+        """等待直到允許送出下一個請求"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._blocked_until)
+            self._next_slot = slot + 1.0 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _error_rate(self):
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def on_success(self, latency):
+        """請求成功：延遲與錯誤率都健康時線性提高速率"""
+        with self._lock:
+            self._outcomes.append(False)
+            if latency <= self.latency_target and self._error_rate() <= self.error_threshold:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after=None):
+        """遇到節流（429 / 5xx / 逾時）：乘法降速（冷卻時間內只降一次），並在 Retry-After 期間暫停所有請求"""
+        with self._lock:
+            self._outcomes.append(True)
+            now = time.monotonic()
+            if self._last_decrease is None or now - self._last_decrease >= self.decrease_cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            # 降速後重新排定下一個時間點，避免沿用舊的較短間隔
+            self._next_slot = max(self._next_slot, now + 1.0 / self.rate)
+
+    def on_failure(self):
+        """其他失敗（例如 4xx）只記錄在錯誤率中，不調整速率"""
+        with self._lock:
+            self._outcomes.append(True)
+
+    def snapshot(self):
+        with self._lock:
+            return {'rate': round(self.rate, 3), 'error_rate': round(self._error_rate(), 3)}
+
+
+class CircuitBreaker:
+    """
+    連續 failure_threshold 個請求失敗後開啟，reset_timeout 秒後進入半開狀態放行一個試探請求。
+    失敗以「請求」為單位計算（由 request() 在重試用盡後記錄一次），單一請求的重試不會讓斷路器開啟。
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_request(self, retry=False):
+        """
+        送出請求前檢查；開啟中（或半開且已有試探請求）時拋出 CircuitOpenError。
+        retry=True 代表同一請求的重試：只在斷路器已被其他請求開啟時中止，試探請求可繼續重試。
+        """
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == 'open' or (state == 'half-open' and self._probing and not retry):
+                raise CircuitOpenError(f'斷路器開啟中，連續失敗 {self._failures} 次')
+            if state == 'half-open':
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def record_throttled(self):
+        """請求因節流 (429) 而失敗：伺服器仍在運作，不計入失敗次數，只結束試探"""
+        with self._lock:
+            self._probing = False
+
+
+# --- 每個主機共用的控制器 ---
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(url):
+    """取得該網址主機共用的 (AdaptiveRateController, CircuitBreaker)"""
+    host = urlparse(url).netloc
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = (AdaptiveRateController(), CircuitBreaker())
+        return _controllers[host]
+
+
+def configure(url, breaker_options=None, controller=None, **controller_options):
+    """
+    以自訂參數重新建立該主機的控制器（例如本機測試伺服器可放寬速率上限）。
+    controller 可傳入已建立的控制器（例如 crawl_frontier 跨行程共用速率預算的控制器）；
+    未傳入時以 controller_options 建立只在本行程內共用的 AdaptiveRateController。
+    """
+    host = urlparse(url).netloc
+    with _controllers_lock:
+        _controllers[host] = (controller or AdaptiveRateController(**controller_options),
+                              CircuitBreaker(**(breaker_options or {})))
+        return _controllers[host]
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 標頭（秒數或 HTTP 日期），無法解析時回傳 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """指數退避加上完整隨機抖動 (full jitter)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def request(session, method, url, max_retries=4, timeout=15, backoff_base=1.0,
+            controller=None, breaker=None, **kwargs):
+    """
+    經過速率控制、重試與斷路器送出 HTTP 請求。
+    重試用盡時：若有回應則回傳最後一次的回應（由呼叫端決定如何處理），否則拋出最後一次的例外。
+    斷路器只在重試用盡後記錄一次失敗；最後一次是帶 Retry-After 的 429 時不記錄。
+    """
+    if controller is None or breaker is None:
+        default_controller, default_breaker = get_controller(url)
+        controller = controller or default_controller
+        breaker = breaker or default_breaker
+
+    last_error = None
+    response = None
+    throttled = False
+    for attempt in range(max_retries + 1):
+        breaker.before_request(retry=attempt > 0)
+        controller.acquire()
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            last_error = e
+            response = None
+            throttled = False
+            controller.on_throttle()
+            if attempt < max_retries:
+                time.sleep(backoff_delay(attempt, backoff_base))
+            continue
+
+        latency = time.monotonic() - start
+        if response.status_code in THROTTLE_STATUS or response.status_code >= 500:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            throttled = response.status_code == 429 and retry_after is not None
+            controller.on_throttle(retry_after)
+            print(f"[rate_control] {url} 回應 {response.status_code}，第 {attempt + 1} 次嘗試，速率降為 {controller.snapshot()['rate']} req/s")
+            if attempt < max_retries:
+                # Retry-After 已由控制器統一暫停，這裡只需加上本次請求的退避時間
+                time.sleep(backoff_delay(attempt, backoff_base))
+            continue
+
+        if response.status_code >= 400:
+            controller.on_failure()
+        else:
+            controller.on_success(latency)
+        breaker.record_success()
+        return response
+
+    if throttled:
+        breaker.record_throttled()
+    else:
+        breaker.record_failure()
+    if response is not None:
+        return response
+    raise last_error
@@ -0,0 +1,544 @@
+"""
+記憶體讀取模型 (Read Model)
+
+職缺列表只有數萬筆，而且大多在每晚爬蟲時才變動；與其每次 /api/jobs 都對 MySQL 執行
+COUNT 與分頁兩個查詢，不如在行程內保存一份欄式 (columnar) 快照，直接在記憶體中完成
+篩選、關鍵字比對、去重、分頁與 facet 計數：
+
+1. 數值欄位存放在 array 中，重複度高的字串欄位以字典編碼（每個不同的值只存一份，列上只存代碼）。
+2. 所有列依 (posting_date, id) 由新到舊排列，分頁直接取連續的位置。
+3. 職稱、公司與 JD 經 fold 正規化（與資料表定序相同，不分大小寫與重音）後存成每列一個搜尋字串，
+   關鍵字比對在其他條件篩選之後才進行，結果與 SQL 的 LIKE '%關鍵字%' 相同（% 與 _ 在兩邊都是一般字元）；
+   縣市、產業等等值條件與技能條件同樣以 fold 比較；JD 原文不另外保留，列表回應也不包含 job_description。
+   同一份快照上重複的查詢條件會直接使用快取的比對結果。
+4. 寫入時 database 會遞增 metadata 的 data_version；讀取模型每隔 POLL_INTERVAL 秒檢查一次，
+   版本變動時只以 updated_at 讀取變動的列，在快照的副本上套用後整份替換：內容未影響排序與搜尋的列
+   在副本上原地覆寫，其餘合併後產生新的快照。每 REBUILD_INTERVAL 秒全量重建一次（涵蓋技能字典重新標記等批次作業）。
+
+以環境變數 READ_MODEL=1 啟用；未啟用或讀取模型無法建立時由 app 退回 SQL 查詢。
+"""
+
+import heapq
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import timedelta
+
+from mysql.connector import Error
+
+import database
+
+READ_MODEL_ENABLED = os.getenv('READ_MODEL', '0') == '1'
+POLL_INTERVAL = float(os.getenv('READ_MODEL_POLL_INTERVAL', '2'))
+REBUILD_INTERVAL = float(os.getenv('READ_MODEL_REBUILD_INTERVAL', '3600'))
+# updated_at 只精確到秒，且交易提交時間晚於寫入時間；增量讀取時往前多讀一段，重複讀到的列會被覆蓋
+WATERMARK_SLACK = timedelta(seconds=120)
+
+INT_COLUMNS = {'id', 'cluster_id', 'salary_min', 'salary_max', 'exp_min_years', 'exp_max_years'}
+PLAIN_COLUMNS = {'title', 'job_url', 'created_at', 'updated_at'}
+SEARCH_COLUMNS = ('title', 'company', 'job_description')
+OMITTED_COLUMNS = {'job_description'}
+FILTERS = {'salary_min', 'salary_max', 'salary_period', 'exp_min', 'exp_max',
+           'county', 'industry', 'experience', 'source_website', 'skills'}
+
+_NULL = -(2 ** 63)
+_SEP = '\x00'
+# 每份快照快取的查詢條件數量
+MATCH_CACHE_SIZE = 256
+
+
+# 等值條件、技能與關鍵字比對都先經過 fold（與資料表定序相同不分大小寫與重音），結果才會與 SQL 路徑一致
+fold = database.collation_key
+
+
+def search_text(row) -> str:
+    """列的搜尋字串：各欄位以分隔字元隔開，關鍵字不會跨欄位命中"""
+    return fold(_SEP.join(row.get(column) or '' for column in SEARCH_COLUMNS))
+
+
+def sort_key(row):
+    return (row.get('posting_date') or '', row['id'])
+
+
+class _DictColumn:
+    """字典編碼的字串欄位；folded 為 {fold(值): 代碼 tuple}，供不分大小寫與重音的等值比對"""
+    def __init__(self):
+        self.values = []
+        self.lookup = {}
+        self.folded = {}
+        self.codes = array('I')
+
+    def encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.lookup[value] = code
+            self.values.append(value)
+            if value is not None:
+                key = fold(value)
+                self.folded[key] = self.folded.get(key, ()) + (code,)
+        return code
+
+    def codes_for(self, value):
+        """與 value 相等（依 fold 比較）的所有代碼"""
+        return self.folded.get(fold(value), ())
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def set(self, pos, value):
+        self.codes[pos] = self.encode(value)
+
+    def get(self, pos):
+        return self.values[self.codes[pos]]
+
+    def copy(self):
+        clone = _DictColumn()
+        clone.values = self.values[:]
+        clone.lookup = dict(self.lookup)
+        clone.folded = dict(self.folded)
+        clone.codes = self.codes[:]
+        return clone
+
+
+class _Snapshot:
+    """
+    某一時間點的職缺快照。rows 為依 sort_key 由大到小排序的 (列, 搜尋字串)。
+    job_skills 為 {job_id: set(技能)}。快照一旦交給查詢使用就不再修改：
+    增量更新由 patched() 在副本上進行，再由 ReadModel 整份替換（copy-on-write），
+    查詢中的執行緒不會讀到只更新一半的列，或與資料不一致的快取與技能索引。
+    """
+    def __init__(self, columns, rows, job_skills):
+        self.columns = [column for column in columns if column not in OMITTED_COLUMNS]
+        self.data = {}
+        for column in self.columns:
+            if column in INT_COLUMNS:
+                self.data[column] = array('q')
+            elif column in PLAIN_COLUMNS:
+                self.data[column] = []
+            else:
+                self.data[column] = _DictColumn()
+
+        self.texts = []
+        for row, text in rows:
+            for column in self.columns:
+                self._append(column, row.get(column))
+            self.texts.append(text)
+
+        self.ids = self.data['id']
+        self.position = {job_id: pos for pos, job_id in enumerate(self.ids)}
+        self.job_skills = job_skills
+        self.skill_index = {}
+        for job_id, skills in job_skills.items():
+            for skill in skills:
+                self.skill_index.setdefault(skill, set()).add(job_id)
+        # 本快照自己擁有（可修改）的 skill_index 集合；副本在第一次修改某個技能時才複製該集合
+        self._owned_skills = set(self.skill_index)
+        self._match_cache = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _append(self, column, value):
+        values = self.data[column]
+        if column in INT_COLUMNS:
+            values.append(_NULL if value is None else value)
+        else:
+            values.append(value)
+
+    def get(self, pos, column):
+        values = self.data[column]
+        if column in INT_COLUMNS:
+            value = values[pos]
+            return None if value == _NULL else value
+        if column in PLAIN_COLUMNS:
+            return values[pos]
+        return values.get(pos)
+
+    def row(self, pos):
+        return {column: self.get(pos, column) for column in self.columns}
+
+    # --- 增量更新（只在尚未交給查詢使用的副本上進行）---
+    def copy(self):
+        """複製欄位資料；搜尋字串與位置在原地更新時不會改變，直接共用"""
+        clone = _Snapshot.__new__(_Snapshot)
+        clone.columns = self.columns
+        clone.data = {
+            column: values.copy() if isinstance(values, _DictColumn) else values[:]
+            for column, values in self.data.items()
+        }
+        clone.texts = self.texts
+        clone.ids = clone.data['id']
+        clone.position = self.position
+        clone.job_skills = dict(self.job_skills)
+        clone.skill_index = dict(self.skill_index)
+        clone._owned_skills = set()
+        clone._match_cache = {}
+        return clone
+
+    def patched(self, changed, skill_map):
+        """
+        以變動的職缺列與其 {job_id: set(技能)} 產生新快照，本快照不受影響。
+        內容未影響排序與搜尋的列在副本上原地覆寫，其餘與既有的列合併後重建。
+        """
+        snapshot = self.copy()
+        restructured = []
+        for row in changed:
+            text = search_text(row)
+            pos = snapshot.position.get(row['id'])
+            if pos is not None and snapshot.can_update_in_place(pos, row, text):
+                snapshot.update_in_place(pos, row)
+            else:
+                restructured.append((row, text))
+            snapshot.set_skills(row['id'], skill_map.get(row['id']))
+        if restructured:
+            snapshot = snapshot.merged(restructured)
+        return snapshot
+
+    def can_update_in_place(self, pos, row, text):
+        """排序鍵與搜尋字串都沒變時，只需覆寫該列的欄位值"""
+        return self.get(pos, 'posting_date') == row.get('posting_date') and self.texts[pos] == text
+
+    def update_in_place(self, pos, row):
+        for column in self.columns:
+            value = row.get(column)
+            values = self.data[column]
+            if column in INT_COLUMNS:
+                values[pos] = _NULL if value is None else value
+            elif column in PLAIN_COLUMNS:
+                values[pos] = value
+            else:
+                values.set(pos, value)
+        self._match_cache = {}
+
+    def _own_skill(self, skill):
+        """取得本快照可修改的技能集合（與原快照共用時先複製）"""
+        if skill not in self._owned_skills:
+            self.skill_index[skill] = set(self.skill_index.get(skill, ()))
+            self._owned_skills.add(skill)
+        return self.skill_index[skill]
+
+    def set_skills(self, job_id, skills):
+        for skill in self.job_skills.get(job_id, ()):
+            self._own_skill(skill).discard(job_id)
+        if skills:
+            self.job_skills[job_id] = set(skills)
+            for skill in skills:
+                self._own_skill(skill).add(job_id)
+        else:
+            self.job_skills.pop(job_id, None)
+        self._match_cache = {}
+
+    def merged(self, new_rows):
+        """以既有的列加上新增 / 排序改變的列產生新快照（既有的列已排序，只需合併）"""
+        replaced = {row['id'] for row, _ in new_rows}
+        existing = ((self.row(pos), self.texts[pos]) for pos in range(len(self)) if self.ids[pos] not in replaced)
+        new_rows = sorted(new_rows, key=lambda item: sort_key(item[0]), reverse=True)
+        rows = heapq.merge(existing, new_rows, key=lambda item: sort_key(item[0]), reverse=True)
+        return _Snapshot(self.columns, rows, self.job_skills)
+
+    # --- 查詢 ---
+    def _search(self, positions, keyword):
+        """搜尋字串包含關鍵字的列（與 LIKE '%關鍵字%' 相同，不分大小寫與重音；% 與 _ 為一般字元）"""
+        keyword = fold(keyword)
+        texts = self.texts
+        if positions is None:
+            return [pos for pos, text in enumerate(texts) if keyword in text]
+        return [pos for pos in positions if keyword in texts[pos]]
+
+    def _equals(self, positions, column, value):
+        """字串欄位等於 value（依 fold 比較，與 SQL 的 = 相同不分大小寫與重音）"""
+        values = self.data[column]
+        if column in PLAIN_COLUMNS:
+            value = fold(value)
+            source = range(len(self)) if positions is None else positions
+            return [pos for pos in source if values[pos] is not None and fold(values[pos]) == value]
+        matched = values.codes_for(value)
+        if not matched:
+            return []
+        codes = values.codes
+        if len(matched) == 1:
+            code = matched[0]
+            if positions is None:
+                return [pos for pos, c in enumerate(codes) if c == code]
+            return [pos for pos in positions if codes[pos] == code]
+        matched = set(matched)
+        if positions is None:
+            return [pos for pos, c in enumerate(codes) if c in matched]
+        return [pos for pos in positions if codes[pos] in matched]
+
+    def _with_skill(self, skill):
+        """具備該技能的職缺 id（技能名稱依 fold 比較）"""
+        key = fold(skill)
+        job_ids = set()
+        for name, ids in self.skill_index.items():
+            if fold(name) == key:
+                job_ids |= ids
+        return job_ids
+
+    def _range(self, positions, column, low=None, high=None):
+        """數值欄位介於 [low, high]，NULL 不符合（與 SQL 的比較相同）"""
+        values = self.data[column]
+        low = _NULL + 1 if low is None else low
+        high = 2 ** 63 - 1 if high is None else high
+        source = range(len(self)) if positions is None else positions
+        return [pos for pos in source if low <= values[pos] <= high]
+
+    def _salary_at_least(self, positions, low):
+        """月薪上限（沒有上限時為下限）不低於 low，即薪資範圍與「至少 low」有交集"""
+        highs, lows = self.data['salary_max'], self.data['salary_min']
+        source = range(len(self)) if positions is None else positions
+        result = []
+        for pos in source:
+            top = highs[pos] if highs[pos] != _NULL else lows[pos]
+            if top != _NULL and top >= low:
+                result.append(pos)
+        return result
+
+    def match(self, keyword='', status='', salary_min=None, salary_max=None,
+              salary_period='', exp_min=None, exp_max=None,
+              county='', industry='', experience='', source_website='', skills=None):
+        """
+        回傳符合條件的列位置（依排序），條件語意與 database._Database._build_where 相同。
+        沒有任何條件時回傳 None，代表全部的列。回傳的列表由快取共用，呼叫端不可修改。
+        """
+        cache_key = (keyword, status, salary_min, salary_max, salary_period, exp_min, exp_max,
+                     county, industry, experience, source_website, tuple(sorted(set(skills or ()))))
+        if cache_key in self._match_cache:
+            return self._match_cache[cache_key]
+
+        positions = None
+        if status and status != 'all':
+            positions = self._equals(positions, 'status', status)
+        for column, value in (('salary_period', salary_period), ('county', county), ('industry', industry),
+                              ('experience', experience), ('source_website', source_website)):
+            if value:
+                positions = self._equals(positions, column, value)
+        if salary_min is not None:
+            positions = self._salary_at_least(positions, salary_min)
+        if salary_max is not None:
+            positions = self._range(positions, 'salary_max', high=salary_max)
+        if exp_min is not None or exp_max is not None:
+            positions = self._range(positions, 'exp_min_years', low=exp_min, high=exp_max)
+        if skills:
+            job_ids = None
+            for skill in database.unique_skills(skills):
+                with_skill = self._with_skill(skill)
+                job_ids = with_skill if job_ids is None else job_ids & with_skill
+            ids = self.ids
+            source = range(len(self)) if positions is None else positions
+            positions = [pos for pos in source if ids[pos] in job_ids]
+        # 關鍵字比對成本最高，放在其他條件縮小範圍之後
+        if keyword:
+            positions = self._search(positions, keyword)
+
+        if len(self._match_cache) >= MATCH_CACHE_SIZE:
+            self._match_cache = {}
+        self._match_cache[cache_key] = positions
+        return positions
+
+    def dedupe(self, positions):
+        """每個 cluster 只保留最新的一筆（排序中第一次出現者），回傳 (位置列表, {位置: 重複數})"""
+        # positions 來自比對快取時是同一個物件，去重結果跟著快取
+        cached = self._match_cache.get(('dedupe', id(positions)))
+        if cached is not None and cached[0] is positions:
+            return cached[1]
+        source = range(len(self)) if positions is None else positions
+        ids, clusters = self.ids, self.data['cluster_id']
+        first = {}
+        counts = Counter()
+        for pos in source:
+            cluster = clusters[pos]
+            # 沒有 cluster_id 的舊資料自成一群（以負的 id 區分）
+            key = cluster if cluster != _NULL else -ids[pos]
+            counts[key] += 1
+            if key not in first:
+                first[key] = pos
+        result = list(first.values()), {pos: counts[key] for key, pos in first.items()}
+        self._match_cache[('dedupe', id(positions))] = (positions, result)
+        return result
+
+    def facet_counts(self, positions):
+        cached = self._match_cache.get(('facets', id(positions)))
+        if cached is not None and cached[0] is positions:
+            return cached[1]
+        result = {}
+        for facet, column in database.FACET_COLUMNS.items():
+            values = self.data[column]
+            codes = values.codes
+            counted = Counter(codes) if positions is None else Counter(map(codes.__getitem__, positions))
+            merged = Counter()
+            for code, count in counted.items():
+                merged[values.values[code] or ''] += count
+            result[facet] = [
+                {'value': value, 'count': count}
+                for value, count in sorted(merged.items(), key=lambda item: -item[1])[:database.FACET_VALUE_LIMIT]
+            ]
+        self._match_cache[('facets', id(positions))] = (positions, result)
+        return result
+
+
+    def get_all_jobs(self, page=1, limit=10, keyword='', status='', dedupe=False, **filters):
+        """回傳 (該頁職缺, 總數)，與 database.get_all_jobs 相同（列表不含 job_description）"""
+        positions = self.match(keyword, status, **filters)
+        duplicate_counts = None
+        if dedupe:
+            positions, duplicate_counts = self.dedupe(positions)
+        total = len(self) if positions is None else len(positions)
+
+        offset = max(page - 1, 0) * limit
+        if positions is None:
+            page_positions = range(offset, min(offset + limit, total))
+        else:
+            page_positions = positions[offset:offset + limit]
+        jobs = []
+        for pos in page_positions:
+            job = self.row(pos)
+            if duplicate_counts is not None:
+                job['duplicate_count'] = duplicate_counts[pos]
+            jobs.append(job)
+        return jobs, total
+
+    def get_facet_counts(self, **filters):
+        return self.facet_counts(self.match(**filters))
+
+
+def build_snapshot(rows, job_skills, columns=None) -> _Snapshot:
+    """以職缺列（含 job_description）與 {job_id: set(技能)} 建立快照"""
+    rows = sorted(((row, search_text(row)) for row in rows), key=lambda item: sort_key(item[0]), reverse=True)
+    if columns is None:
+        columns = list(rows[0][0].keys()) if rows else ['id', 'cluster_id'] + list(database.FACET_COLUMNS.values())
+    return _Snapshot(columns, rows, job_skills)
+
+
+class ReadModel:
+    """管理快照的建立與更新；查詢時依版本號決定是否需要更新"""
+    def __init__(self, poll_interval=POLL_INTERVAL, rebuild_interval=REBUILD_INTERVAL):
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self._snapshot = None
+        self._version = None
+        self._watermark = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def mark_stale(self):
+        """本行程剛寫入資料時呼叫，下一次查詢立即檢查版本"""
+        self._stale = True
+
+    def _needs_check(self):
+        return (self._snapshot is None or self._stale
+                or time.monotonic() - self._checked_at >= self.poll_interval)
+
+    def snapshot(self):
+        """取得最新的快照；其他執行緒正在更新時直接使用目前的快照，不等待"""
+        if not self._needs_check():
+            return self._snapshot
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return self._snapshot
+        try:
+            if self._needs_check():
+                self._stale = False
+                if self._snapshot is None or time.monotonic() - self._built_at >= self.rebuild_interval:
+                    self.rebuild()
+                else:
+                    version = database.get_data_version()
+                    if version is not None and version != self._version:
+                        self._patch(version)
+                self._checked_at = time.monotonic()
+        except Error as e:
+            print(f"更新讀取模型時發生錯誤，暫時沿用目前的快照: {e}")
+        finally:
+            self._lock.release()
+        return self._snapshot
+
+    def _advance_watermark(self, rows):
+        for row in rows:
+            updated_at = row.get('updated_at')
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+    def rebuild(self):
+        """從資料庫全量載入"""
+        start = time.perf_counter()
+        # 先讀版本再讀資料：載入期間的寫入會在下一次檢查時補上
+        version = database.get_data_version()
+        if version is None:
+            return False
+        skill_map = database.get_skill_map()
+        if skill_map is None:
+            return False
+        rows = []
+        self._watermark = None
+        for chunk in database.iter_changed_jobs():
+            self._advance_watermark(chunk)
+            rows.extend(chunk)
+        self._snapshot = build_snapshot(rows, skill_map)
+        self._version = version
+        self._built_at = time.monotonic()
+        print(f"讀取模型已載入 {len(rows)} 筆職缺，耗時 {time.perf_counter() - start:.2f} 秒。")
+        return True
+
+    def _patch(self, version):
+        """只讀取 updated_at 在水位線之後的列並套用到快照"""
+        if self._watermark is None:
+            self.rebuild()
+            return
+        changed = [row for chunk in database.iter_changed_jobs(self._watermark - WATERMARK_SLACK) for row in chunk]
+        skill_map = database.get_skill_map([row['id'] for row in changed]) if changed else {}
+        if skill_map is None:
+            return
+
+        # 在副本上套用後整份替換，查詢中的執行緒繼續使用舊快照
+        self._snapshot = self._snapshot.patched(changed, skill_map)
+        self._advance_watermark(changed)
+        self._version = version
+
+    # --- 與 database 相同介面的查詢 ---
+    def get_all_jobs(self, page=1, limit=10, keyword='', status='', dedupe=False, **filters):
+        snapshot = self.snapshot()
+        if snapshot is None or set(filters) - FILTERS:
+            return None, 0
+        return snapshot.get_all_jobs(page, limit, keyword, status, dedupe, **filters)
+
+    def get_facet_counts(self, **filters):
+        snapshot = self.snapshot()
+        if snapshot is None or set(filters) - FILTERS - {'keyword', 'status'}:
+            return None
+        return snapshot.get_facet_counts(**filters)
+
+
+# --- 模組級別的接口 ---
+_model = None
+_model_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return READ_MODEL_ENABLED
+
+
+def get_model() -> ReadModel:
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = ReadModel()
+    return _model
+
+
+def get_all_jobs(page=1, limit=10, keyword='', status='', dedupe=False, **filters):
+    """讀取模型無法使用時回傳 (None, 0)，由呼叫端退回 SQL"""
+    return get_model().get_all_jobs(page, limit, keyword, status, dedupe, **filters)
+
+
+def get_facet_counts(**filters):
+    return get_model().get_facet_counts(**filters)
+
+
+def mark_stale():
+    if _model is not None:
+        _model.mark_stale()
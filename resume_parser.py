@@ -1,9 +1,11 @@
 import os
-import docx
 from io import BytesIO
-import pdfplumber
+
+# pdfplumber 與 python-docx 載入成本高，延遲到實際解析對應格式時才匯入
 
 def _parse_pdf_with_pdfplumber(file_stream) -> str:
+    import pdfplumber
+
     text = ""
     try:
         with pdfplumber.open(file_stream) as pdf:
@@ -16,6 +18,8 @@ def _parse_pdf_with_pdfplumber(file_stream) -> str:
     return text
 
 def _parse_docx(file_stream) -> str:
+    import docx
+
     text = ""
     try:
         doc = docx.Document(file_stream)
@@ -0,0 +1,120 @@
+"""
+儲存的搜尋模組 (Saved Searches)
+
+使用者可以儲存與 /api/jobs 相同的篩選條件，不必每天重新查詢整張表來找新職缺。
+比對採 percolator 的方式反過來進行：每次爬蟲後只讀取 updated_at 在水位線之後的職缺
+（新增或內容變動的列），在記憶體中以 read_model 的比對邏輯對所有儲存的搜尋逐一比對，
+符合的職缺寫入該搜尋的收件匣。每次的成本與新變動的職缺數成正比，與資料表大小無關。
+
+建立搜尋時，當下已符合的職缺會先以已讀寫入，因此收件匣只會出現「之後才符合」的職缺；
+已在收件匣中的職缺再次被爬到時不會重複出現。
+
+手動執行比對：
+    python saved_searches.py
+"""
+
+from datetime import datetime
+
+import database
+import read_model
+
+WATERMARK_KEY = 'saved_search_watermark'
+WATERMARK_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INT_FILTERS = ('salary_min', 'salary_max', 'exp_min', 'exp_max')
+TEXT_FILTERS = ('keyword', 'status', 'salary_period', 'county', 'industry', 'experience', 'source_website')
+
+
+def normalize_filters(raw) -> dict:
+    """
+    驗證並整理篩選條件（鍵與 get_all_jobs 相同，不含分頁與去重），空值會被移除。
+    條件不合法時拋出 ValueError。
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("filters 必須是物件")
+    unknown = set(raw) - set(INT_FILTERS) - set(TEXT_FILTERS) - {'skills'}
+    if unknown:
+        raise ValueError(f"不支援的篩選條件: {', '.join(sorted(unknown))}")
+
+    filters = {}
+    for key in TEXT_FILTERS:
+        value = raw.get(key)
+        if value is None or value == '':
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f"{key} 必須是字串")
+        filters[key] = value.strip()
+    for key in INT_FILTERS:
+        value = raw.get(key)
+        if value is None or value == '':
+            continue
+        try:
+            filters[key] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} 必須是整數")
+    skills = raw.get('skills')
+    if isinstance(skills, str):
+        skills = skills.split(',')
+    if skills:
+        if not isinstance(skills, list):
+            raise ValueError("skills 必須是列表或以逗號分隔的字串")
+        skills = sorted({str(skill).strip() for skill in skills if str(skill).strip()})
+        if skills:
+            filters['skills'] = skills
+    if filters.get('status') == 'all':
+        del filters['status']
+    return filters
+
+
+def create(name, raw_filters):
+    """新增儲存的搜尋，回傳 id（資料庫錯誤時回傳 None）"""
+    return database.create_saved_search(name, normalize_filters(raw_filters))
+
+
+def _load_watermark():
+    value = database.get_metadata(WATERMARK_KEY)
+    return datetime.strptime(value, WATERMARK_FORMAT) if value else None
+
+
+def evaluate(searches=None):
+    """
+    以上次比對後變動的職缺比對所有儲存的搜尋，回傳新寫入收件匣的配對數。
+    第一次執行時從最早建立的搜尋開始（之前的職缺已在建立搜尋時寫入）。
+    """
+    searches = database.get_saved_searches() if searches is None else searches
+    if not searches:
+        return 0
+
+    watermark = _load_watermark()
+    since = watermark or min(search['created_at'] for search in searches)
+    changed = [row for chunk in database.iter_changed_jobs(since - read_model.WATERMARK_SLACK) for row in chunk]
+    if not changed:
+        return 0
+    skill_map = database.get_skill_map([row['id'] for row in changed])
+    if skill_map is None:
+        return 0
+
+    # 只包含變動列的小快照，比對語意與 /api/jobs（讀取模型與 SQL）相同
+    snapshot = read_model.build_snapshot(changed, skill_map)
+    matches = []
+    for search in searches:
+        positions = snapshot.match(**search['filters'])
+        if positions is None:
+            positions = range(len(snapshot))
+        matches.extend((search['id'], snapshot.ids[pos]) for pos in positions)
+
+    inserted = database.add_saved_search_matches(matches)
+    if inserted is None:
+        # 寫入失敗時不推進水位線，下次重新比對
+        return 0
+    # 下一次只需讀取本次看過的最新 updated_at 之後的列（往前的重疊由 INSERT IGNORE 吸收）
+    latest = max((row['updated_at'] for row in changed if row.get('updated_at')), default=None)
+    if latest and (watermark is None or latest > watermark):
+        database.set_metadata(WATERMARK_KEY, latest.strftime(WATERMARK_FORMAT))
+    print(f"儲存的搜尋比對完成：{len(changed)} 筆變動職缺 × {len(searches)} 個搜尋，新增 {inserted} 筆符合職缺。")
+    return inserted
+
+
+# 測試區塊
+if __name__ == '__main__':
+    evaluate()
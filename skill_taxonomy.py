@@ -0,0 +1,163 @@
+"""
+技能標籤模組 (Skill Taxonomy)
+
+以可編輯的技能字典（skills.json：標準名稱 -> 同義詞 / 中英文別名）為 JD 與履歷加上技能標籤。
+字典會編譯成 Aho-Corasick 自動機，每份文字只需線性掃描一次即可找出所有技能，
+與字典大小無關；不需要對資料庫做 LIKE 掃描，也不需要呼叫 LLM。
+
+功能包括：
+1. extract_skills(text)：回傳文字中出現的標準技能名稱。
+2. skill_gap(resume_text, job_skills)：本機即時的技能差距報告。
+3. reload()：字典檔修改後重新編譯。已入庫的職缺需執行 python database.py backfill-skills 重新標記；
+   資料庫模組初始化時會比對 dictionary_version()，字典改變時提示執行。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+
+SKILLS_FILE = os.getenv('SKILLS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'skills.json'))
+
+
+def _is_word_char(ch: str) -> bool:
+    """英數字元需檢查邊界，避免 'go' 命中 'google'；中文不需要"""
+    return ch.isascii() and (ch.isalnum() or ch == '_')
+
+
+class AhoCorasick:
+    """多字串比對自動機：建構成本與所有別名總長度成正比，搜尋成本與文字長度成正比"""
+    def __init__(self, patterns):
+        # patterns: {別名(小寫): 標準名稱}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for alias, skill in patterns.items():
+            self._add(alias, skill)
+        self._build_failure_links()
+
+    def _add(self, alias, skill):
+        state = 0
+        for ch in alias:
+            next_state = self.goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][ch] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(alias), skill))
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text):
+        """逐一產生 (結束位置, 別名長度, 標準名稱)"""
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for end, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, skill in output[state]:
+                yield end, length, skill
+
+
+def load_dictionary(path=SKILLS_FILE) -> dict:
+    """
+    讀取技能字典，回傳 {別名(小寫): 標準名稱}。
+    別名列表為準；列表為空時才以標準名稱本身比對（避免 'Go'、'R' 這類短名稱誤判）。
+    """
+    with open(path, encoding='utf-8') as f:
+        taxonomy = json.load(f)
+    patterns = {}
+    for skill, aliases in taxonomy.items():
+        for alias in aliases or [skill]:
+            alias = alias.strip().lower()
+            if alias:
+                patterns[alias] = skill
+    return patterns
+
+
+def dictionary_version(path=SKILLS_FILE) -> str:
+    """技能字典的指紋（編譯後的別名對照表的雜湊），字典內容改變時才會不同"""
+    patterns = json.dumps(load_dictionary(path), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(patterns.encode('utf-8')).hexdigest()
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher() -> AhoCorasick:
+    """取得編譯好的自動機（第一次使用時才讀取字典並編譯）"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = AhoCorasick(load_dictionary())
+    return _matcher
+
+
+def reload():
+    """技能字典修改後重新編譯"""
+    global _matcher
+    with _matcher_lock:
+        _matcher = AhoCorasick(load_dictionary())
+    return _matcher
+
+
+def extract_skills(text: str) -> list:
+    """回傳文字中出現的標準技能名稱（排序後的列表）"""
+    if not text:
+        return []
+    lowered = text.lower()
+    found = set()
+    for end, length, skill in get_matcher().iter_matches(lowered):
+        if skill in found:
+            continue
+        start = end - length + 1
+        # 英數別名的前後必須不是英數字元
+        if _is_word_char(lowered[start]) and start > 0 and _is_word_char(lowered[start - 1]):
+            continue
+        if _is_word_char(lowered[end]) and end + 1 < len(lowered) and _is_word_char(lowered[end + 1]):
+            continue
+        found.add(skill)
+    return sorted(found)
+
+
+def skill_gap(resume_text: str, job_skills) -> dict:
+    """比對履歷與職缺的技能標籤，回傳符合、缺少的技能與覆蓋率"""
+    job_skills = sorted(set(job_skills))
+    resume_skills = set(extract_skills(resume_text))
+    matched = [skill for skill in job_skills if skill in resume_skills]
+    missing = [skill for skill in job_skills if skill not in resume_skills]
+    return {
+        'job_skills': job_skills,
+        'matched_skills': matched,
+        'missing_skills': missing,
+        'extra_skills': sorted(resume_skills - set(job_skills)),
+        'coverage': round(len(matched) / len(job_skills), 3) if job_skills else None,
+    }
+
+
+# 測試區塊
+if __name__ == '__main__':
+    sample_jd = "熟悉 Python、PyTorch 與 Docker，具備 NLP 或大型語言模型 (LLM) 經驗，了解 Google Cloud 者佳。"
+    sample_resume = "三年 python 開發經驗，使用 pytorch 訓練影像辨識模型，熟悉 golang。"
+    print("JD 技能：", extract_skills(sample_jd))
+    print("履歷技能：", extract_skills(sample_resume))
+    print("技能差距：", skill_gap(sample_resume, extract_skills(sample_jd)))
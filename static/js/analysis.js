@@ -19,23 +19,35 @@ document.getElementById('resumeAnalysisForm').addEventListener('submit', async f
     aiResultDiv.innerHTML = '';
 
     try {
-        // 使用從 HTML 中獲取的 JOB_ID
-        const response = await fetch(`/api/jobs/${JOB_ID}/match`, {
+        // 使用從 HTML 中獲取的 JOB_ID，先提交分析工作，再輪詢結果
+        const response = await fetch(`/api/jobs/${JOB_ID}/match/tasks`, {
             method: 'POST',
             body: formData,
         });
 
-        const result = await response.json();
+        let result = await response.json();
+
+        if (response.status === 429) {
+            loader.classList.add('hidden');
+            const retryAfter = response.headers.get('Retry-After') || result.retry_after;
+            aiResultDiv.innerHTML = `<p><strong>目前分析人數較多：</strong>${result.error || ''}</p><p>請約 ${retryAfter} 秒後再試。</p>`;
+            return;
+        }
+
+        if (response.status === 202) {
+            result = await pollMatchTask(result.task_id);
+        }
 
         // 隱藏讀取動畫
         loader.classList.add('hidden');
 
-        if (response.ok) {
+        if (response.ok && result.status === 'done') {
             // 如果成功，就呼叫函式來渲染結果
-            renderAnalysisResult(result);
+            renderAnalysisResult(result.result);
         } else {
             // 如果失敗，顯示錯誤訊息
-            aiResultDiv.innerHTML = `<p><strong>分析失敗：</strong>${result.error || '未知錯誤'}</p><p>詳細資訊: ${result.details || ''}</p>`;
+            const error = result.result || result;
+            aiResultDiv.innerHTML = `<p><strong>分析失敗：</strong>${error.error || '未知錯誤'}</p><p>詳細資訊: ${error.details || ''}</p>`;
         }
 
     } catch (error) {
@@ -44,6 +56,18 @@ document.getElementById('resumeAnalysisForm').addEventListener('submit', async f
     }
 });
 
+// 輪詢分析工作，直到完成或失敗
+async function pollMatchTask(taskId, intervalMs = 2000) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const response = await fetch(`/api/match-tasks/${taskId}`);
+        const task = await response.json();
+        if (response.status !== 202) {
+            return task;
+        }
+    }
+}
+
 function renderAnalysisResult(data) {
     const aiResultDiv = document.getElementById('aiResult');
 
@@ -0,0 +1,78 @@
+console.log('[DEBUG facets.js] facets.js 已載入。');
+
+// 各 facet 下拉選單「全部」選項的文字
+const FACET_ALL_LABELS = {
+    county: '全部地區',
+    industry: '全部產業',
+    experience: '全部經歷',
+    source_website: '全部來源'
+};
+
+// 在狀態篩選按鈕旁顯示計數
+const renderStatusCounts = (statusFacet) => {
+    const counts = {};
+    let total = 0;
+    statusFacet.forEach(({ value, count }) => {
+        counts[value] = count;
+        total += count;
+    });
+
+    document.querySelectorAll('.filter-button').forEach(button => {
+        const status = button.dataset.status;
+        const count = status === 'all' ? total : (counts[status] || 0);
+        let badge = button.querySelector('.facet-count');
+        if (!badge) {
+            badge = document.createElement('span');
+            badge.className = 'facet-count';
+            button.appendChild(badge);
+        }
+        badge.textContent = `(${count})`;
+    });
+};
+
+// 重新產生 facet 下拉選單的選項，並保留目前的選擇
+const renderFacetSelect = (select, values, selected) => {
+    const facet = select.dataset.facet;
+    select.innerHTML = '';
+
+    const allOption = document.createElement('option');
+    allOption.value = '';
+    allOption.textContent = FACET_ALL_LABELS[facet] || '全部';
+    select.appendChild(allOption);
+
+    values.forEach(({ value, count }) => {
+        if (!value) return;
+        const option = document.createElement('option');
+        option.value = value;
+        option.textContent = `${value} (${count})`;
+        select.appendChild(option);
+    });
+
+    // 已選擇的值即使不在計數列表中也要保留
+    if (selected && !values.some(({ value }) => value === selected)) {
+        const option = document.createElement('option');
+        option.value = selected;
+        option.textContent = `${selected} (0)`;
+        select.appendChild(option);
+    }
+    select.value = selected || '';
+};
+
+// 依 API 回傳的 facets 更新整個篩選區
+export function renderFacets(facets, selectedFacets) {
+    if (!facets) return;
+    if (facets.status) {
+        renderStatusCounts(facets.status);
+    }
+    document.querySelectorAll('.facet-select').forEach(select => {
+        const facet = select.dataset.facet;
+        renderFacetSelect(select, facets[facet] || [], selectedFacets[facet]);
+    });
+}
+
+// 監聽 facet 下拉選單變更
+export function setupFacetSelects(onChange) {
+    document.querySelectorAll('.facet-select').forEach(select => {
+        select.addEventListener('change', () => onChange(select.dataset.facet, select.value));
+    });
+}
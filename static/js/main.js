@@ -1,5 +1,6 @@
 import { createJobCard, updateJobStatus } from './jobCard.js';
 import { renderPagination, setupPagination, changePage } from './pagination.js';
+import { renderFacets, setupFacetSelects } from './facets.js';
 
 console.log('[DEBUG main.js] main.js 已載入。');
 console.log('[DEBUG main.js] updateJobStatus 函數狀態：', typeof updateJobStatus);
@@ -9,6 +10,7 @@ let currentPage = 1;
 let currentLimit = 10;
 let currentStatus = 'all';
 let currentKeyword = '';
+let currentFacets = {};
 let totalJobs = 0;
 
 // DOM 元素
@@ -29,7 +31,16 @@ const loadJobs = async (page = 1) => {
         loadingSpinner.classList.remove('hidden');
         errorMessage.classList.add('hidden');
         
-        const response = await fetch(`${API_URL}?page=${page}&limit=${currentLimit}&status=${currentStatus}&keyword=${currentKeyword}`);
+        const params = new URLSearchParams({
+            page: page,
+            limit: currentLimit,
+            status: currentStatus,
+            keyword: currentKeyword
+        });
+        Object.entries(currentFacets).forEach(([facet, value]) => {
+            if (value) params.append(facet, value);
+        });
+        const response = await fetch(`${API_URL}?${params.toString()}`);
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -41,6 +52,7 @@ const loadJobs = async (page = 1) => {
         totalJobs = data.total_jobs_count;
         currentPage = page; // 更新當前頁碼
         renderJobs(data.jobs);
+        renderFacets(data.facets, currentFacets);
         const totalPages = Math.ceil(totalJobs / currentLimit);
         renderPagination(currentPage, totalPages);
         setupPagination(totalPages);
@@ -127,6 +139,13 @@ const setupEventListeners = () => {
         });
     });
 
+    // facet 下拉選單變更事件
+    setupFacetSelects((facet, value) => {
+        currentFacets[facet] = value;
+        currentPage = 1;
+        loadJobs();
+    });
+
     // 監聽頁面切換事件
     document.addEventListener('pageChange', (event) => {
         const newPage = event.detail.page;